@@ -1,34 +1,348 @@
 #!/usr/bin/env python3
+"""
+Delete IBM Cloud VPC virtual servers by IP address.
+
+  delete_instance_ip.py 10.240.0.4
+  delete_instance_ip.py 10.240.0.4 10.240.0.5 --file lab-ips.txt --workers 16
+  delete_instance_ip.py --file lab-ips.txt --dry-run
+  delete_instance_ip.py --sdk --vpc lab-vpc --wait --file lab-ips.txt
+
+Instances are listed once (following pagination) and indexed by every IP on
+every network interface / attachment; deletions then run concurrently.
+
+By default the `ibmcloud` CLI does the work. With --sdk the ibm_vpc SDK is
+used instead (pip install ibm-vpc; IBM_CLOUD_API_KEY, IBM_VPC_URL): one
+authenticated client and HTTP connection pool for the listing and every
+delete, with --vpc / --resource-group filtering the listing server-side.
+--wait polls each instance until it is gone (exponential backoff + jitter).
+"""
 
 from typing import Any, Literal
 from subprocess import CompletedProcess
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import random
 import subprocess
 import json
 import sys
+import time
 
-def delete_instance_ip(ip_address) -> Literal[1, 0]:
+DEFAULT_WORKERS = 8
+DEFAULT_SERVICE_URL = 'https://us-south.iaas.cloud.ibm.com/v1'
+API_VERSION = '2025-04-29'
+
+# --wait polling: first delay, cap and overall limit (seconds)
+WAIT_BASE, WAIT_CAP, WAIT_TIMEOUT = 2.0, 30.0, 900.0
+
+
+class CheckError(RuntimeError):
+    """
+    A status check that retrying will not fix (bad credentials, forbidden, ...).
+    """
+
+
+def _cli_json(args: list[str]) -> Any:
     result: CompletedProcess[str] = subprocess.run(
-        ['ibmcloud', 'is', 'instances', '--output', 'json'],
+        ['ibmcloud', 'is', *args, '--output', 'json'],
         capture_output=True,
         text=True
     )
-    
-    instances = json.loads(s=result.stdout)
-    vsi_id: Any | None = next(
-        (i['id'] for i in instances 
-         if i.get('primary_network_interface', {}).get('primary_ip', {}).get('address') == ip_address),
-        None
-    )
-    
-    if not vsi_id:
-        print(f"❌ Error: No Virtual Server found with IP Address: {ip_address}")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ibmcloud is {' '.join(args)} failed")
+    return json.loads(s=result.stdout)
+
+
+def list_instances(vpc: str | None = None, resource_group: str | None = None) -> list[dict[str, Any]]:
+    """
+    All instances in the targeted region. Follows 'next.start' when the CLI
+    returns a page object instead of a plain list.
+    """
+    instances: list[dict[str, Any]] = []
+    base = ['instances']
+    if vpc:
+        base += ['--vpc', vpc]
+    if resource_group:
+        base += ['--resource-group-id', resource_group]
+    args = base
+    while True:
+        page = _cli_json(args)
+        if isinstance(page, list):
+            return instances + page
+        instances.extend(page.get('instances', []))
+        start = (page.get('next') or {}).get('start')
+        if not start:
+            return instances
+        args = base + ['--start', start]
+
+
+def instance_ips(instance: dict[str, Any]) -> set[str]:
+    """
+    Every reserved IP of an instance: network interfaces (legacy) and
+    network attachments (virtual network interfaces), primary or not.
+    """
+    ips: set[str] = set()
+    nics = [instance.get('primary_network_interface') or {}, *instance.get('network_interfaces', [])]
+    atts = [instance.get('primary_network_attachment') or {}, *instance.get('network_attachments', [])]
+    for nic in nics + atts:
+        address = (nic.get('primary_ip') or {}).get('address') or nic.get('primary_ipv4_address')
+        if address:
+            ips.add(address)
+    return ips
+
+
+def build_ip_index(instances: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """
+    IP → instance over all interfaces of all instances.
+    """
+    return {ip: i for i in instances for ip in instance_ips(i)}
+
+
+def delete_instance(vsi_id: str) -> tuple[bool, str]:
+    result = subprocess.run(['ibmcloud', 'is', 'instance-delete', vsi_id, '--force'],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return False, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'delete failed'
+    return True, 'deletion initiated'
+
+
+def instance_exists(vsi_id: str) -> bool:
+    """
+    False only when the CLI reports the instance as not_found; any other
+    failure (login expired, wrong region, network) raises.
+    """
+    result = subprocess.run(['ibmcloud', 'is', 'instance', vsi_id, '--output', 'json'],
+                            capture_output=True, text=True)
+    if result.returncode == 0:
+        return True
+    output = f'{result.stdout}\n{result.stderr}'
+    if 'not_found' in output.lower():
+        return False
+    raise RuntimeError(result.stderr.strip() or result.stdout.strip() or f'ibmcloud is instance {vsi_id} failed')
+
+
+class CliBackend:
+    """
+    `ibmcloud is` subprocesses (uses the CLI's login and target region).
+    """
+
+    def __init__(self, vpc: str | None = None, resource_group: str | None = None):
+        self.vpc = vpc
+        self.resource_group = resource_group
+
+    def list_instances(self) -> list[dict[str, Any]]:
+        return list_instances(self.vpc, self.resource_group)
+
+    def delete(self, vsi_id: str) -> tuple[bool, str]:
+        return delete_instance(vsi_id)
+
+    def exists(self, vsi_id: str) -> bool:
+        return instance_exists(vsi_id)
+
+
+class SdkBackend:
+    """
+    ibm_vpc SDK: one VpcV1 client (one IAM token, one pooled HTTP session)
+    shared by the listing and all concurrent deletes and polls.
+    """
+
+    def __init__(self, vpc: str | None = None, resource_group: str | None = None,
+                 api_key: str | None = None, service_url: str | None = None, workers: int = DEFAULT_WORKERS):
+        from ibm_vpc import VpcV1
+        from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+        from ibm_cloud_sdk_core.http_adapter import SSLHTTPAdapter
+
+        api_key = api_key or os.environ.get('IBM_CLOUD_API_KEY')
+        if not api_key:
+            raise RuntimeError('IBM_CLOUD_API_KEY is not set')
+        self.service = VpcV1(version=API_VERSION, authenticator=IAMAuthenticator(api_key))
+        self.service.set_service_url(service_url or os.environ.get('IBM_VPC_URL', DEFAULT_SERVICE_URL))
+        # One keep-alive connection per worker thread in the shared session;
+        # same adapter class, retries and TLS settings the SDK mounted.
+        service = self.service
+        service.http_adapter = SSLHTTPAdapter(pool_maxsize=max(10, workers),
+                                              max_retries=service.http_adapter.max_retries,
+                                              _disable_ssl_verification=service.disable_ssl_verification)
+        service.get_http_client().mount('http://', service.http_adapter)
+        service.get_http_client().mount('https://', service.http_adapter)
+        self.vpc = vpc
+        self.resource_group = resource_group
+
+    def list_instances(self) -> list[dict[str, Any]]:
+        # Server-side filters: the API filters instances by VPC and resource
+        # group (not by IP), so only those narrow the listing.
+        kwargs: dict[str, Any] = {'limit': 100}
+        if self.vpc:
+            kwargs['vpc_name'] = self.vpc
+        if self.resource_group:
+            kwargs['resource_group_id'] = self.resource_group
+        instances: list[dict[str, Any]] = []
+        while True:
+            page = self.service.list_instances(**kwargs).get_result() or {}
+            instances.extend(page.get('instances', []))
+            start = _start_token((page.get('next') or {}).get('href'))
+            if not start:
+                return instances
+            kwargs['start'] = start
+
+    def delete(self, vsi_id: str) -> tuple[bool, str]:
+        from ibm_cloud_sdk_core import ApiException
+        try:
+            self.service.delete_instance(id=vsi_id)
+        except ApiException as e:
+            return False, e.message or f'HTTP {e.code}'
+        except Exception as e:  # connection errors, timeouts: keep the per-IP report
+            return False, str(e)
+        return True, 'deletion initiated'
+
+    def exists(self, vsi_id: str) -> bool:
+        from ibm_cloud_sdk_core import ApiException
+        try:
+            self.service.get_instance(id=vsi_id)
+        except ApiException as e:
+            if e.code == 404:
+                return False
+            if e.code != 429 and e.code < 500:
+                raise CheckError(e.message or f'HTTP {e.code}') from e
+            raise
+        return True
+
+
+def _start_token(href: str | None) -> str | None:
+    """
+    'start' query parameter of a VPC API 'next.href' link.
+    """
+    from urllib.parse import urlparse, parse_qs
+    return (parse_qs(urlparse(href).query).get('start') or [None])[0] if href else None
+
+
+def backoff_delays(base: float = WAIT_BASE, cap: float = WAIT_CAP):
+    """
+    Exponential backoff with full jitter: uniform(0, min(cap, base * 2**n)).
+    """
+    n = 0
+    while True:
+        yield random.uniform(0, min(cap, base * 2 ** n))
+        n += 1
+
+
+def wait_until_gone(backend, vsi_id: str, timeout: float = WAIT_TIMEOUT) -> tuple[bool, str]:
+    """
+    Poll until the instance no longer exists (or timeout). Failed status
+    checks (5xx, throttling, connection errors) are retried on the same
+    backoff; a CheckError (e.g. 401/403) ends the wait at once.
+    """
+    started = time.monotonic()
+    error = None
+    for delay in backoff_delays():
+        try:
+            if not backend.exists(vsi_id):
+                return True, f'deleted ({time.monotonic() - started:.0f}s)'
+            error = None
+        except CheckError as e:
+            return False, f'status check failed: {e}'
+        except Exception as e:
+            error = e
+        if time.monotonic() - started + delay > timeout:
+            if error is not None:
+                return False, f'status check failed: {error}'
+            return False, f'still present after {timeout:.0f}s'
+        time.sleep(delay)
+    return False, 'unreachable'
+
+
+def delete_by_ips(ips: list[str], workers: int = DEFAULT_WORKERS,
+                  dry_run: bool = False, backend=None, wait: bool = False) -> list[dict[str, str]]:
+    """
+    Resolve all IPs with one listing and delete the matched instances
+    concurrently (an instance owning several of the IPs is deleted once).
+    With wait, each delete is followed by polling until the instance is gone.
+    Returns one result row per IP, in input order.
+    """
+    backend = backend or CliBackend()
+    index = build_ip_index(backend.list_instances())
+    rows = []
+    targets: dict[str, dict[str, Any]] = {}
+    for ip in dict.fromkeys(ips):
+        inst = index.get(ip)
+        rows.append({'ip': ip, 'id': inst['id'] if inst else '', 'name': inst.get('name', '') if inst else '',
+                     'status': '' if inst else '❌ not found'})
+        if inst:
+            targets[inst['id']] = inst
+
+    def delete(vsi_id: str) -> tuple[bool, str]:
+        ok, message = backend.delete(vsi_id)
+        if ok and wait:
+            return wait_until_gone(backend, vsi_id)
+        return ok, message
+
+    if dry_run:
+        outcomes = {vsi_id: (True, 'dry run') for vsi_id in targets}
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            outcomes = dict(zip(targets, pool.map(delete, targets)))
+
+    for row in rows:
+        if row['id']:
+            ok, message = outcomes[row['id']]
+            row['status'] = f"{'✅' if ok else '❌'} {message}"
+    return rows
+
+
+def print_table(rows: list[dict[str, str]]) -> None:
+    cols = [('ip', 'IP'), ('name', 'Name'), ('id', 'Instance ID'), ('status', 'Result')]
+    widths = {k: max([len(title)] + [len(r[k]) for r in rows]) for k, title in cols}
+    print('  '.join(title.ljust(widths[k]) for k, title in cols))
+    for r in rows:
+        print('  '.join(r[k].ljust(widths[k]) for k, _ in cols))
+
+
+def delete_instance_ip(ip_address) -> Literal[1, 0]:
+    rows = delete_by_ips([ip_address], workers=1)
+    print_table(rows)
+    return 0 if rows[0]['status'].startswith('✅') else 1
+
+
+def read_ips(path: str) -> list[str]:
+    """
+    One IP per line; blank lines and '#' comments ignored.
+    """
+    with open(path, encoding='utf-8') as fh:
+        return [line.split('#', 1)[0].strip() for line in fh if line.split('#', 1)[0].strip()]
+
+
+def main(argv: list[str]) -> Literal[1, 0]:
+    parser = argparse.ArgumentParser(description='Delete IBM Cloud VPC virtual servers by IP address.')
+    parser.add_argument('ips', nargs='*', help='IP addresses')
+    parser.add_argument('-f', '--file', help='file with one IP per line')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS, help='concurrent deletions')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='resolve IPs only, delete nothing')
+    parser.add_argument('--sdk', action='store_true', help='use the ibm_vpc SDK instead of the ibmcloud CLI')
+    parser.add_argument('--vpc', help='only instances in this VPC (name)')
+    parser.add_argument('--resource-group', help='only instances in this resource group (ID)')
+    parser.add_argument('--wait', action='store_true', help='wait until each instance is gone')
+    args = parser.parse_args(argv)
+
+    ips = list(args.ips) + (read_ips(args.file) if args.file else [])
+    if not ips:
+        parser.error('no IP addresses given')
+
+    try:
+        if args.sdk:
+            backend = SdkBackend(args.vpc, args.resource_group, workers=args.workers)
+        else:
+            backend = CliBackend(args.vpc, args.resource_group)
+        rows = delete_by_ips(ips, workers=args.workers, dry_run=args.dry_run, backend=backend,
+                             wait=args.wait)
+    except ImportError:
+        print("❌ Error: --sdk requires the ibm_vpc SDK (pip install ibm-vpc)")
+        return 1
+    except Exception as e:
+        print(f"❌ Error: {e}")
         return 1
-    
-    print(f"Found Virtual Server ID: {vsi_id}")
-    print(f"Deleting VSI {vsi_id}")
-    subprocess.run(['ibmcloud', 'is', 'instance-delete', vsi_id, '--force'])
-    print(f"✅ VSI {vsi_id} deletion initiated.")
-    return 0
+    print_table(rows)
+    return 0 if all(r['status'].startswith('✅') for r in rows) else 1
+
 
 if __name__ == "__main__":
-    sys.exit(delete_instance_ip(ip_address=sys.argv[1]) if len(sys.argv) == 2 else 1)
\ No newline at end of file
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Latency history analyzer for the lisboa.log files written by ping_test.sh / ping_test.js.
+
+  latency_history.py lisboa.log
+  latency_history.py logs/*.log* --window 14d --threshold 15 --csv history.csv
+  latency_history.py site-a/lisboa.log site-b/porto.log.gz --json > report.jsonl
+
+The logs are streamed in chunks (concatenated logs, rotated pieces and
+.gz/.bz2/.xz files alike, in any order), so memory holds only the parsed
+series: per (source, destination) one compact column per field (array of
+doubles: timestamp, min, avg, max, stddev). A block is
+
+  <date line>                     `date` or JavaScript Date.toString() output
+  From <source> to <destination>
+  round-trip min/avg/max/stddev = a/b/c/d ms      (or Linux 'rtt min/avg/max/mdev')
+
+and everything else (progress messages, blank lines) is skipped. Runs are
+sorted by time and exact duplicates (overlapping copies of a log) dropped.
+
+Reported per series, on the per-run average RTT:
+  summary       runs, time span, p50/p95/p99/max, mean run-to-run jitter
+  rolling       p50/p95/p99 over the trailing --window (per run, --csv)
+  time of day   median and count per local hour of the day
+  alerts        regressions: the median of the last --recent runs is above
+                the p95 of the --window baseline before them and more than
+                --threshold % above its median
+"""
+
+from typing import Any, Iterator
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+import argparse
+import bz2
+import calendar
+import csv
+import gzip
+import json
+import lzma
+import re
+import sys
+
+from latency_probe import percentile
+
+DEFAULT_WINDOW = '7d'
+DEFAULT_RECENT = 5
+DEFAULT_THRESHOLD = 20.0
+MIN_BASELINE = 10
+
+MONTHS = {m: i for i, m in enumerate(calendar.month_abbr) if m}
+# `date` prints zone abbreviations; offsets in hours.
+TZ_OFFSETS = {'UTC': 0, 'GMT': 0, 'WET': 0, 'WEST': 1, 'BST': 1, 'IST': 1, 'CET': 1, 'CEST': 2,
+              'EET': 2, 'EEST': 3, 'EST': -5, 'EDT': -4, 'CST': -6, 'CDT': -5, 'PST': -8, 'PDT': -7}
+
+# Wed Oct  8 14:42:00 WEST 2025
+_DATE_CMD = re.compile(r'(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun) (\w{3}) +(\d{1,2}) (\d\d):(\d\d):(\d\d) (\w+) (\d{4})\s*$')
+# Tue Oct 21 2025 09:09:49 GMT+0100 (Western European Summer Time)
+_DATE_JS = re.compile(r'(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun) (\w{3}) (\d{1,2}) (\d{4}) (\d\d):(\d\d):(\d\d) GMT([+-])(\d\d)(\d\d)')
+# The three interesting line kinds in one pattern, so the regex engine (not
+# a Python loop) skips the progress messages and blank lines.
+_LINE = re.compile(
+    r'^(?:From (.+?) to (.+?)[ \t\r]*$'
+    r'|(?:round-trip|rtt) min/avg/max/(?:stddev|mdev) = ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+) ms'
+    r'|((?:Mon|Tue|Wed|Thu|Fri|Sat|Sun) .*?)\r?$)',
+    re.MULTILINE,
+)
+_CHUNK = 1 << 22
+
+
+def parse_duration(text: str) -> float:
+    """
+    '7d', '12h', '30m', '90s' or plain seconds → seconds.
+    """
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def open_log(path: str):
+    """
+    Text stream of a (possibly compressed) log; '-' is stdin.
+    """
+    if path == '-':
+        return sys.stdin
+    opener = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}.get(path[path.rfind('.'):], open)
+    return opener(path, 'rt', encoding='utf-8', errors='replace')
+
+
+def parse_date(line: str, stats: dict[str, int]) -> tuple[float, int] | None:
+    """
+    (UTC epoch seconds, local hour of day) of a date line, or None.
+    """
+    m = _DATE_JS.match(line)
+    if m:
+        mon, day, year, hh, mm, ss, sign, oh, om = m.groups()
+        offset = (int(oh) * 3600 + int(om) * 60) * (1 if sign == '+' else -1)
+    else:
+        m = _DATE_CMD.match(line)
+        if not m:
+            return None
+        mon, day, hh, mm, ss, tz, year = m.groups()
+        if tz not in TZ_OFFSETS:
+            stats['unknown_tz'] += 1
+        offset = TZ_OFFSETS.get(tz, 0) * 3600
+    if mon not in MONTHS:
+        return None
+    local = calendar.timegm((int(year), MONTHS[mon], int(day), int(hh), int(mm), int(ss)))
+    return local - offset, int(hh)
+
+
+def parse_log(stream, stats: dict[str, int]) -> Iterator[tuple]:
+    """
+    Stream (source, destination, epoch, local_hour, min, avg, max, stddev)
+    per ping summary, reading `stream` in chunks cut at line ends. A summary
+    without a preceding date or 'From' line (e.g. the head of a rotated
+    piece) is counted in stats['orphan'].
+    """
+    when = None
+    pair = None
+    rest = ''
+    while True:
+        chunk = stream.read(_CHUNK)
+        if chunk:
+            chunk = rest + chunk
+            cut = chunk.rfind('\n') + 1
+            chunk, rest = chunk[:cut], chunk[cut:]
+        else:
+            chunk, rest = rest, ''
+            if not chunk:
+                return
+        for m in _LINE.finditer(chunk):
+            source, dest, mn, avg, mx, sd, date = m.groups()
+            if date is not None:
+                parsed = parse_date(date, stats)
+                if parsed:
+                    when = parsed
+                    pair = None
+                    stats['blocks'] += 1
+            elif source is not None:
+                pair = (source, dest)
+            elif when is None or pair is None:
+                stats['orphan'] += 1
+            else:
+                stats['runs'] += 1
+                yield (*pair, *when, float(mn), float(avg), float(mx), float(sd))
+                pair = None
+
+# ------------------------------------------------------------------------------
+# Columnar series
+# ------------------------------------------------------------------------------
+class Series:
+    """
+    Runs of one (source, destination): parallel typed arrays, 41 bytes per run.
+    """
+
+    __slots__ = ('source', 'destination', 'ts', 'hour', 'min', 'avg', 'max', 'stddev')
+
+    def __init__(self, source: str, destination: str):
+        self.source = source
+        self.destination = destination
+        self.ts = array('d')
+        self.hour = array('b')
+        self.min, self.avg, self.max, self.stddev = array('d'), array('d'), array('d'), array('d')
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def append(self, ts: float, hour: int, mn: float, avg: float, mx: float, sd: float) -> None:
+        self.ts.append(ts)
+        self.hour.append(hour)
+        self.min.append(mn)
+        self.avg.append(avg)
+        self.max.append(mx)
+        self.stddev.append(sd)
+
+    def normalize(self) -> int:
+        """
+        Sort by time and drop exact duplicate runs; returns how many were dropped.
+        """
+        cols = ('ts', 'hour', 'min', 'avg', 'max', 'stddev')
+        ts = self.ts
+        if all(ts[i] < ts[i + 1] for i in range(len(ts) - 1)):
+            return 0
+        order = sorted(range(len(ts)), key=lambda i: (ts[i], self.avg[i]))
+        keep, last = [], None
+        for i in order:
+            key = (ts[i], self.min[i], self.avg[i], self.max[i], self.stddev[i])
+            if key != last:
+                keep.append(i)
+            last = key
+        for name in cols:
+            old = getattr(self, name)
+            setattr(self, name, array(old.typecode, (old[i] for i in keep)))
+        return len(order) - len(keep)
+
+
+def load_series(paths: list[str], stats: dict[str, int]) -> dict[tuple[str, str], Series]:
+    series: dict[tuple[str, str], Series] = {}
+    for path in paths:
+        with open_log(path) as fh:
+            for source, dest, ts, hour, mn, avg, mx, sd in parse_log(fh, stats):
+                s = series.get((source, dest))
+                if s is None:
+                    s = series[(source, dest)] = Series(source, dest)
+                s.append(ts, hour, mn, avg, mx, sd)
+        stats['files'] += 1
+    for s in series.values():
+        stats['duplicates'] += s.normalize()
+    return series
+
+# ------------------------------------------------------------------------------
+# Analysis
+# ------------------------------------------------------------------------------
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec='seconds')
+
+
+def summarize(s: Series) -> dict[str, Any]:
+    values = sorted(s.avg)
+    jitter = sum(abs(b - a) for a, b in zip(s.avg, s.avg[1:])) / (len(s) - 1) if len(s) > 1 else 0.0
+    return {
+        'type': 'summary', 'source': s.source, 'destination': s.destination, 'runs': len(s),
+        'first': iso(s.ts[0]), 'last': iso(s.ts[-1]),
+        'p50': round(percentile(values, 50), 3), 'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3), 'max': round(max(s.max), 3),
+        'jitter': round(jitter, 3),
+    }
+
+
+def rolling(s: Series, window: float) -> Iterator[tuple[float, float, float]]:
+    """
+    (p50, p95, p99) of the average RTT over the runs in (ts - window, ts], per run.
+    """
+    ordered: list[float] = []
+    lo = 0
+    for i, ts in enumerate(s.ts):
+        insort(ordered, s.avg[i])
+        while s.ts[lo] <= ts - window:
+            del ordered[bisect_left(ordered, s.avg[lo])]
+            lo += 1
+        yield percentile(ordered, 50), percentile(ordered, 95), percentile(ordered, 99)
+
+
+def time_of_day(s: Series) -> list[dict[str, Any]]:
+    """
+    Median average RTT and run count per local hour.
+    """
+    hours: dict[int, list[float]] = {}
+    for hour, avg in zip(s.hour, s.avg):
+        hours.setdefault(hour, []).append(avg)
+    return [{'type': 'hour', 'source': s.source, 'destination': s.destination, 'hour': h,
+             'runs': len(v), 'p50': round(percentile(sorted(v), 50), 3)}
+            for h, v in sorted(hours.items())]
+
+
+def regressions(s: Series, window: float, recent: int, threshold: float,
+                min_baseline: int = MIN_BASELINE) -> list[dict[str, Any]]:
+    """
+    Regression episodes. At each run the baseline is the runs within
+    `window` before the last `recent` runs. An episode opens when the recent
+    median is above the baseline p95 and threshold % over its p50, and lasts
+    until the recent median is back under that p95. The baseline is frozen
+    while an episode is open and the episode's runs never enter it, so one
+    incident is one alert and episodes do not overlap.
+    """
+    alerts: list[dict[str, Any]] = []
+    baseline: list[float] = []
+    skipped = bytearray(len(s))             # runs of closed episodes
+    lo = hi = 0
+    resumed = 0                             # first run after the last episode
+    current = None
+    for i in range(recent - 1, len(s)):
+        start = i - recent + 1              # first run of the recent set
+        if current is None:
+            while hi < start:
+                if not skipped[hi]:
+                    insort(baseline, s.avg[hi])
+                hi += 1
+            while lo < hi and s.ts[lo] <= s.ts[start] - window:
+                if not skipped[lo]:
+                    del baseline[bisect_left(baseline, s.avg[lo])]
+                lo += 1
+            if len(baseline) < min_baseline:
+                continue
+            p50, p95 = percentile(baseline, 50), percentile(baseline, 95)
+        now = percentile(sorted(s.avg[start:i + 1]), 50)
+        # Open an episode past the threshold, close it only once back under p95.
+        if current is None:
+            bad = now > p95 and now > p50 * (1 + threshold / 100.0)
+        else:
+            bad = now > p95
+        if bad and current is None:
+            opened = max(start, resumed)
+            current = {'type': 'alert', 'source': s.source, 'destination': s.destination,
+                       'start': iso(s.ts[opened]), 'end': None, 'baseline_p50': round(p50, 3),
+                       'baseline_p95': round(p95, 3), 'recent_p50': round(now, 3), 'peak_p50': round(now, 3)}
+            alerts.append(current)
+        elif bad:
+            current['peak_p50'] = round(max(current['peak_p50'], now), 3)
+        elif current is not None:
+            current['end'] = iso(s.ts[i])
+            skipped[opened:start] = b'\x01' * max(0, start - opened)
+            resumed = i + 1
+            current = None
+    return alerts
+
+
+def write_csv(series: list[Series], window: float, path: str) -> None:
+    with open(path, 'w', encoding='utf-8', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['time', 'source', 'destination', 'min', 'avg', 'max', 'stddev',
+                         'rolling_p50', 'rolling_p95', 'rolling_p99'])
+        for s in series:
+            for i, (p50, p95, p99) in enumerate(rolling(s, window)):
+                writer.writerow([iso(s.ts[i]), s.source, s.destination, s.min[i], s.avg[i], s.max[i],
+                                 s.stddev[i], round(p50, 3), round(p95, 3), round(p99, 3)])
+
+# ------------------------------------------------------------------------------
+# Report
+# ------------------------------------------------------------------------------
+def print_table(rows: list[dict[str, Any]], cols: list[tuple[str, str]]) -> None:
+    widths = {k: max([len(title)] + [len(str(r[k])) for r in rows]) for k, title in cols}
+    print('  '.join(title.ljust(widths[k]) for k, title in cols))
+    for r in rows:
+        print('  '.join(str(r[k]).ljust(widths[k]) for k, _ in cols).rstrip())
+
+
+def print_report(summaries, hours, alerts) -> None:
+    print_table(summaries, [('source', 'Source'), ('destination', 'Destination'), ('runs', 'Runs'),
+                            ('first', 'First'), ('last', 'Last'), ('p50', 'p50'), ('p95', 'p95'),
+                            ('p99', 'p99'), ('max', 'Max'), ('jitter', 'Jitter')])
+    if hours:
+        pairs = sorted({(h['source'], h['destination']) for h in hours})
+        by_hour = {(h['source'], h['destination'], h['hour']): h for h in hours}
+        print('\nMedian RTT by local hour (runs)')
+        rows = []
+        for hour in sorted({h['hour'] for h in hours}):
+            row = {'hour': f"{hour:02d}:00"}
+            for src, dst in pairs:
+                h = by_hour.get((src, dst, hour))
+                row[f"{src}→{dst}"] = f"{h['p50']} ({h['runs']})" if h else '-'
+            rows.append(row)
+        print_table(rows, [('hour', 'Hour')] + [(f"{s}→{d}", f"{s} → {d}") for s, d in pairs])
+    print()
+    if not alerts:
+        print('✅ No latency regressions.')
+    for a in alerts:
+        until = f"until {a['end']}" if a['end'] else 'ongoing'
+        print(f"🚨 {a['source']} → {a['destination']}: median {a['recent_p50']} ms (peak {a['peak_p50']}) "
+              f"vs baseline p50 {a['baseline_p50']} / p95 {a['baseline_p95']} ms, from {a['start']} {until}")
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description='Analyze accumulated ping_test.sh latency logs.')
+    parser.add_argument('logs', nargs='+', help="log files (.gz/.bz2/.xz ok, '-' = stdin)")
+    parser.add_argument('--window', default=DEFAULT_WINDOW, help='rolling / baseline window, e.g. 7d, 12h')
+    parser.add_argument('--recent', type=int, default=DEFAULT_RECENT, help='runs in the recent median')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='alert when the recent median is this %% over the baseline median')
+    parser.add_argument('--min-baseline', type=int, default=MIN_BASELINE, help='runs needed in a baseline')
+    parser.add_argument('--csv', help='write every run with its rolling percentiles to this CSV')
+    parser.add_argument('--json', action='store_true', help='print JSON lines instead of tables')
+    args = parser.parse_args(argv)
+
+    window = parse_duration(args.window)
+    stats = dict.fromkeys(('files', 'blocks', 'runs', 'orphan', 'duplicates', 'unknown_tz'), 0)
+    try:
+        series = sorted(load_series(args.logs, stats).values(), key=lambda s: (s.source, s.destination))
+    except OSError as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    summaries = [summarize(s) for s in series]
+    hours = [h for s in series for h in time_of_day(s)]
+    alerts = [a for s in series for a in regressions(s, window, max(1, args.recent), args.threshold,
+                                                         args.min_baseline)]
+    if args.csv:
+        write_csv(series, window, args.csv)
+
+    if args.json:
+        for record in [{'type': 'stats', **stats}, *summaries, *hours, *alerts]:
+            print(json.dumps(record))
+    else:
+        print(f"{stats['runs']} runs in {stats['blocks']} blocks from {stats['files']} files "
+              f"({stats['duplicates']} duplicates, {stats['orphan']} without date/destination skipped)\n")
+        print_report(summaries, hours, alerts)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Concurrent latency probe: TCP connect, TLS handshake and ICMP round-trips
+to many endpoints at once, with per-endpoint percentiles and jitter.
+
+  latency_probe.py                                   # Madrid and Frankfurt COS, as ping_test.sh
+  latency_probe.py --samples 100 --interval 0.2 -o latency.jsonl
+  latency_probe.py -t Madrid=s3.eu-es.cloud-object-storage.appdomain.cloud \\
+                   -t Paris=s3.eu-fr2.cloud-object-storage.appdomain.cloud:443 --probes tcp,tls
+
+Every endpoint is probed concurrently (asyncio); within an endpoint the
+samples are spaced by --interval. The name is resolved once per endpoint
+(its time is reported separately) so DNS does not pollute the connect times.
+
+  tcp   time to complete the TCP handshake
+  tls   time of the TLS handshake on top of a fresh TCP connection
+  icmp  echo round-trip, through an unprivileged ICMP socket where the kernel
+        allows it (net.ipv4.ping_group_range), else the system `ping`;
+        skipped when neither is available
+
+Each sample and a summary per endpoint and probe (min, p50, p95, p99, max,
+mean, stdev, jitter, loss) are written as JSON lines to --output (appended,
+like lisboa.log) and the summaries printed as a table.
+"""
+
+from typing import Any
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import shutil
+import socket
+import ssl
+import struct
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+DEFAULT_TARGETS = [
+    ('Madrid', 's3.eu-es.cloud-object-storage.appdomain.cloud'),
+    ('Frankfurt', 's3.eu-de.cloud-object-storage.appdomain.cloud'),
+]
+PROBES = ('tcp', 'tls', 'icmp')
+DEFAULT_PORT = 443
+DEFAULT_SAMPLES = 30
+DEFAULT_INTERVAL = 0.5
+DEFAULT_TIMEOUT = 3.0
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+
+def parse_target(spec: str) -> tuple[str, str, int]:
+    """
+    'Label=host[:port]' or 'host[:port]' → (label, host, port).
+    """
+    label, _, rest = spec.rpartition('=')
+    host, _, port = rest.partition(':')
+    return label or host, host, int(port) if port else DEFAULT_PORT
+
+# ------------------------------------------------------------------------------
+# Statistics
+# ------------------------------------------------------------------------------
+def percentile(sorted_values: list[float], p: float) -> float:
+    """
+    Linear-interpolated percentile (0-100) of an already sorted list.
+    """
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    k = (len(sorted_values) - 1) * p / 100.0
+    lo = math.floor(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(samples: list[float | None]) -> dict[str, Any]:
+    """
+    Stats over sample times in ms (None = lost). Jitter is the mean absolute
+    difference between consecutive successful samples (as in RFC 3550).
+    """
+    ok = [s for s in samples if s is not None]
+    stats: dict[str, Any] = {'n': len(samples), 'lost': len(samples) - len(ok),
+                             'loss_pct': round(100.0 * (len(samples) - len(ok)) / len(samples), 1) if samples else 0.0}
+    if not ok:
+        return stats
+    values = sorted(ok)
+    mean = sum(ok) / len(ok)
+    stats.update({
+        'min': values[0], 'p50': percentile(values, 50), 'p95': percentile(values, 95),
+        'p99': percentile(values, 99), 'max': values[-1], 'mean': mean,
+        'stdev': math.sqrt(sum((s - mean) ** 2 for s in ok) / (len(ok) - 1)) if len(ok) > 1 else 0.0,
+        'jitter': sum(abs(b - a) for a, b in zip(ok, ok[1:])) / (len(ok) - 1) if len(ok) > 1 else 0.0,
+    })
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()}
+
+# ------------------------------------------------------------------------------
+# Probes (each returns milliseconds; raises on failure/timeout)
+# ------------------------------------------------------------------------------
+async def probe_tcp(ip: str, port: int, **_) -> float:
+    started = time.perf_counter()
+    _, writer = await asyncio.open_connection(ip, port)
+    elapsed = time.perf_counter() - started
+    writer.close()
+    return elapsed * 1e3
+
+
+async def probe_tls(ip: str, port: int, host: str, tls_context: ssl.SSLContext, **_) -> float:
+    _, writer = await asyncio.open_connection(ip, port)
+    try:
+        started = time.perf_counter()
+        await writer.start_tls(tls_context, server_hostname=host)
+        return (time.perf_counter() - started) * 1e3
+    finally:
+        writer.close()
+
+
+class IcmpSocket:
+    """
+    Unprivileged ICMP echo (SOCK_DGRAM, IPPROTO_ICMP): no root needed where
+    the kernel's ping_group_range allows the user. One socket per endpoint;
+    the kernel sets the echo identifier, replies are matched on sequence.
+    """
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        self.sock.setblocking(False)
+        self.seq = 0
+
+    async def echo(self, ip: str, timeout: float) -> float:
+        loop = asyncio.get_running_loop()
+        self.seq = (self.seq + 1) & 0xFFFF
+        payload = os.urandom(32)
+        header = struct.pack('!BBHHH', 8, 0, 0, 0, self.seq)  # checksum/id filled by the kernel
+        started = time.perf_counter()
+        await loop.sock_sendto(self.sock, header + payload, (ip, 0))
+        deadline = started + timeout
+        while True:
+            data = await asyncio.wait_for(loop.sock_recv(self.sock, 2048),
+                                          max(0.0, deadline - time.perf_counter()))
+            if len(data) >= 8 and data[0] == 0 and struct.unpack('!H', data[6:8])[0] == self.seq:
+                return (time.perf_counter() - started) * 1e3
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+_PING_TIME = re.compile(r'time[=<]([\d.]+)\s*ms')
+
+
+async def ping_once(ip: str, timeout: float) -> float:
+    """
+    One echo through the system `ping` (its own reported time, not the
+    subprocess overhead).
+    """
+    proc = await asyncio.create_subprocess_exec(
+        'ping', '-c', '1', '-W', str(max(1, math.ceil(timeout))), ip,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+    out, _ = await proc.communicate()
+    match = _PING_TIME.search(out.decode(errors='replace'))
+    if proc.returncode != 0 or not match:
+        raise TimeoutError('no reply')
+    return float(match.group(1))
+
+
+def icmp_method() -> str | None:
+    """
+    'socket', 'ping' or None: how ICMP can be measured on this host.
+    """
+    try:
+        IcmpSocket().close()
+        return 'socket'
+    except OSError:
+        return 'ping' if shutil.which('ping') else None
+
+# ------------------------------------------------------------------------------
+# Runner
+# ------------------------------------------------------------------------------
+async def probe_endpoint(label: str, host: str, port: int, probes: list[str], samples: int,
+                         interval: float, timeout: float, tls_context: ssl.SSLContext,
+                         icmp: str | None, emit) -> list[dict[str, Any]]:
+    """
+    Resolve once, take `samples` rounds of every probe `interval` apart and
+    return one summary record per probe. emit(record) gets every sample.
+    """
+    loop = asyncio.get_running_loop()
+    base = {'target': label, 'host': host, 'port': port}
+    started = time.perf_counter()
+    try:
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, port, family=socket.AF_INET,
+                                                        type=socket.SOCK_STREAM), timeout)
+        ip = infos[0][4][0]
+    except (OSError, asyncio.TimeoutError) as e:
+        record = {'type': 'summary', **base, 'probe': 'dns', 'error': str(e) or 'timeout', 'n': 0}
+        emit(record)
+        return [record]
+    base['ip'] = ip
+    dns_ms = round((time.perf_counter() - started) * 1e3, 3)
+
+    icmp_socket = None
+    if 'icmp' in probes and icmp == 'socket':
+        icmp_socket = IcmpSocket()
+
+    async def icmp_probe(ip: str, **_) -> float:
+        if icmp_socket:
+            return await icmp_socket.echo(ip, timeout)
+        return await ping_once(ip, timeout)
+
+    funcs = {'tcp': probe_tcp, 'tls': probe_tls, 'icmp': icmp_probe}
+    active = [p for p in probes if p != 'icmp' or icmp]
+    times: dict[str, list[float | None]] = {p: [] for p in active}
+    try:
+        for n in range(samples):
+            round_started = time.perf_counter()
+            for probe in active:
+                error = None
+                try:
+                    ms = round(await asyncio.wait_for(
+                        funcs[probe](ip=ip, port=port, host=host, tls_context=tls_context), timeout), 3)
+                except (OSError, ssl.SSLError, asyncio.TimeoutError) as e:
+                    ms, error = None, type(e).__name__ if not str(e) else str(e)
+                times[probe].append(ms)
+                emit({'type': 'sample', 'ts': now_iso(), **base, 'probe': probe, 'seq': n, 'ms': ms,
+                      **({'error': error} if error else {})})
+            if n + 1 < samples:
+                await asyncio.sleep(max(0.0, interval - (time.perf_counter() - round_started)))
+    finally:
+        if icmp_socket:
+            icmp_socket.close()
+
+    summaries = []
+    for probe in probes:
+        if probe in times:
+            record = {'type': 'summary', **base, 'probe': probe, 'dns_ms': dns_ms, **summarize(times[probe])}
+        else:
+            record = {'type': 'summary', **base, 'probe': probe, 'n': 0,
+                      'error': 'ICMP not permitted and no ping binary'}
+        emit(record)
+        summaries.append(record)
+    return summaries
+
+
+async def run(targets: list[tuple[str, str, int]], probes: list[str], samples: int, interval: float,
+              timeout: float, insecure: bool, source: str, out) -> list[dict[str, Any]]:
+    tls_context = ssl.create_default_context()
+    if insecure:
+        tls_context.check_hostname = False
+        tls_context.verify_mode = ssl.CERT_NONE
+    icmp = icmp_method() if 'icmp' in probes else None
+    run_id = uuid.uuid4().hex[:12]
+
+    def emit(record: dict[str, Any]) -> None:
+        if out:
+            record = {'run': run_id, 'source': source, **({'ts': now_iso()} if 'ts' not in record else {}), **record}
+            out.write(json.dumps(record) + '\n')
+
+    results = await asyncio.gather(*(
+        probe_endpoint(label, host, port, probes, samples, interval, timeout, tls_context, icmp, emit)
+        for label, host, port in targets
+    ))
+    return [s for summaries in results for s in summaries]
+
+
+def print_summaries(summaries: list[dict[str, Any]]) -> None:
+    cols = ['target', 'probe', 'n', 'loss_pct', 'min', 'p50', 'p95', 'p99', 'max', 'jitter']
+    titles = ['Target', 'Probe', 'N', 'Loss %', 'Min', 'p50', 'p95', 'p99', 'Max', 'Jitter']
+    rows = [[str(s.get(c, '')) for c in cols] for s in summaries if 'error' not in s]
+    widths = [max([len(t)] + [len(r[i]) for r in rows]) for i, t in enumerate(titles)]
+    print('  '.join(t.ljust(w) for t, w in zip(titles, widths)) + '   (ms)')
+    for r in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(r, widths)).rstrip())
+    for s in summaries:
+        if 'error' in s:
+            print(f"❌ {s['target']} {s['probe']}: {s['error']}")
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description='Concurrent TCP/TLS/ICMP latency probe.')
+    parser.add_argument('-t', '--target', action='append', default=[], metavar='LABEL=HOST[:PORT]',
+                        help='endpoint to probe (repeatable; default: Madrid and Frankfurt COS)')
+    parser.add_argument('--probes', default=','.join(PROBES), help=f"comma-separated ({','.join(PROBES)})")
+    parser.add_argument('-n', '--samples', type=int, default=DEFAULT_SAMPLES, help='samples per probe')
+    parser.add_argument('-i', '--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='seconds between sample rounds')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='seconds per sample')
+    parser.add_argument('--source', default='Lisbon', help='label of where the probe runs')
+    parser.add_argument('-o', '--output', default='latency.jsonl', help="JSON lines file to append to ('-' = stdout)")
+    parser.add_argument('-k', '--insecure', action='store_true', help='do not verify TLS certificates')
+    args = parser.parse_args(argv)
+
+    probes = [p.strip() for p in args.probes.split(',') if p.strip()]
+    if not probes or any(p not in PROBES for p in probes):
+        parser.error(f"--probes must be a subset of {','.join(PROBES)}")
+    if args.samples < 1:
+        parser.error('--samples must be at least 1')
+    targets = [parse_target(t) for t in args.target] or [(label, host, DEFAULT_PORT) for label, host in DEFAULT_TARGETS]
+
+    print(f"Probing {len(targets)} endpoints from {args.source}: {args.samples} samples of "
+          f"{','.join(probes)} every {args.interval}s...", file=sys.stderr)
+    out = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+    try:
+        summaries = asyncio.run(run(targets, probes, args.samples, args.interval, args.timeout,
+                                    args.insecure, args.source, out))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.output != '-':
+        print_summaries(summaries)
+        print(f"\nSamples and summaries appended to {args.output}")
+    return 0 if all('error' not in s and s.get('lost', 0) < s.get('n', 0) for s in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for ibm_vpc.VpcV1 covering the calls vpc_teardown.py makes.
+
+Resources live in memory. Deletes are asynchronous like the real API: the
+resource turns 'deleting' and disappears after a per-type delay. Deletes are
+refused with 409 while something still depends on the resource (an instance
+or VPN gateway in a subnet, a subnet in a VPC, an attached volume, ...), so a
+wrong deletion order fails the same way it does against IBM Cloud.
+
+  api = FakeVpcApi.synthetic(vpcs=2, time_scale=0.05)
+  vpc_teardown.py --fake --yes
+"""
+
+from typing import Any
+import itertools
+import threading
+import time
+
+# Seconds until a deleted resource is gone (roughly what the real API takes).
+DELETE_SECONDS = {
+    'vpn_gateways': 120, 'load_balancers': 90, 'instances': 45, 'floating_ips': 3,
+    'images': 10, 'volumes': 15, 'shares': 30, 'subnets': 10, 'public_gateways': 10,
+    'vpcs': 15,
+}
+
+# collection → singular used in method names (list_<collection>, delete_<singular>)
+COLLECTIONS = {
+    'vpn_gateways': 'vpn_gateway', 'load_balancers': 'load_balancer', 'instances': 'instance',
+    'floating_ips': 'floating_ip', 'images': 'image', 'volumes': 'volume', 'shares': 'share',
+    'subnets': 'subnet', 'public_gateways': 'public_gateway', 'vpcs': 'vpc',
+}
+_SINGULAR = {v: k for k, v in COLLECTIONS.items()}
+
+
+class FakeApiError(Exception):
+    """
+    Same shape as ibm_cloud_sdk_core.ApiException (code, message).
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"Error: {message}, Status code: {code}")
+        self.code = code
+        self.message = message
+
+
+class _Response:
+    def __init__(self, result):
+        self._result = result
+
+    def get_result(self):
+        return self._result
+
+
+def _ref(resource: dict[str, Any] | None) -> str | None:
+    return (resource or {}).get('id')
+
+
+class FakeVpcApi:
+    """
+    resources: collection → list of resource dicts (each with an 'id').
+    time_scale: multiplies DELETE_SECONDS (0.01 → a 45 s instance delete takes 0.45 s).
+    latency: seconds to sleep per call (simulated round-trip).
+    fail_ids: resource IDs whose delete returns HTTP 500.
+    """
+
+    def __init__(self, resources: dict[str, list[dict[str, Any]]], time_scale: float = 1.0,
+                 latency: float = 0.0, fail_ids: set[str] | None = None):
+        self.resources = {c: {r['id']: dict(r) for r in resources.get(c, [])} for c in COLLECTIONS}
+        self.time_scale = time_scale
+        self.latency = latency
+        self.fail_ids = set(fail_ids or ())
+        self.calls: dict[str, int] = {}
+        self._gone_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def synthetic(cls, vpcs: int = 2, subnets: int = 3, instances: int = 4, **kwargs) -> 'FakeVpcApi':
+        """
+        A POC account: per VPC a public gateway, `subnets` subnets (gateway
+        attached) with `instances` instances each (a data volume and a
+        floating IP apiece), a load balancer, a VPN gateway and a file share;
+        plus a few private images.
+        """
+        ids = itertools.count(1)
+        res: dict[str, list[dict[str, Any]]] = {c: [] for c in COLLECTIONS}
+
+        def add(collection: str, name: str, **fields) -> dict[str, Any]:
+            r = {'id': f"r006-{COLLECTIONS[collection].replace('_', '')}-{next(ids):04d}", 'name': name,
+                 'lifecycle_state': 'stable', 'resource_group': {'id': 'rg-poc'}, **fields}
+            res[collection].append(r)
+            return r
+
+        for v in range(vpcs):
+            vpc = add('vpcs', f"poc-vpc-{v}")
+            pgw = add('public_gateways', f"poc-pgw-{v}", vpc={'id': vpc['id']})
+            subnet_refs = []
+            for s in range(subnets):
+                subnet = add('subnets', f"poc-subnet-{v}-{s}", vpc={'id': vpc['id']},
+                             public_gateway={'id': pgw['id']})
+                subnet_refs.append({'id': subnet['id']})
+                for i in range(instances):
+                    name = f"poc-vsi-{v}-{s}-{i}"
+                    vol = add('volumes', f"{name}-data")
+                    inst = add('instances', name, vpc={'id': vpc['id']},
+                               primary_network_interface={'id': f"nic-{vol['id']}",
+                                                          'subnet': {'id': subnet['id']}},
+                               volume_attachments=[{'volume': {'id': vol['id']}}])
+                    vol['volume_attachments'] = [{'instance': {'id': inst['id']}}]
+                    add('floating_ips', f"{name}-fip",
+                        target={'id': inst['primary_network_interface']['id']})
+            add('load_balancers', f"poc-lb-{v}", subnets=subnet_refs[:2])
+            add('vpn_gateways', f"poc-vpn-{v}", subnet=subnet_refs[0], vpc={'id': vpc['id']})
+            add('shares', f"poc-share-{v}", mount_targets=[{'subnet': subnet_refs[-1]}])
+        for i in range(3):
+            add('images', f"poc-image-{i}", visibility='private')
+        return cls(res, **kwargs)
+
+    # -- plumbing --------------------------------------------------------------
+    def _call(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _reap(self) -> None:
+        now = time.monotonic()
+        for rid, when in list(self._gone_at.items()):
+            if when <= now:
+                del self._gone_at[rid]
+                for table in self.resources.values():
+                    table.pop(rid, None)
+
+    def _blockers(self, collection: str, r: dict[str, Any]) -> list[str]:
+        """
+        IDs of resources that must be gone before r can be deleted.
+        """
+        rid = r['id']
+        res = self.resources
+        if collection == 'volumes':
+            return [i for i in (_ref(a.get('instance')) for a in r.get('volume_attachments', []))
+                    if i in res['instances']]
+        if collection == 'subnets':
+            users = [i['id'] for i in res['instances'].values()
+                     if _ref((i.get('primary_network_interface') or {}).get('subnet')) == rid]
+            users += [g['id'] for g in res['vpn_gateways'].values() if _ref(g.get('subnet')) == rid]
+            users += [lb['id'] for lb in res['load_balancers'].values()
+                      if rid in {_ref(s) for s in lb.get('subnets', [])}]
+            users += [s['id'] for s in res['shares'].values()
+                      if rid in {_ref(m.get('subnet')) for m in s.get('mount_targets', [])}]
+            return users
+        if collection == 'public_gateways':
+            return [s['id'] for s in res['subnets'].values() if _ref(s.get('public_gateway')) == rid]
+        if collection == 'vpcs':
+            return [x['id'] for c in ('subnets', 'public_gateways', 'instances', 'vpn_gateways')
+                    for x in res[c].values() if _ref(x.get('vpc')) == rid]
+        return []
+
+    # -- API -------------------------------------------------------------------
+    def _list(self, collection: str, start: str | None = None, limit: int | None = None,
+              resource_group_id: str | None = None, visibility: str | None = None,
+              **kwargs) -> _Response:
+        self._call(f"list_{collection}")
+        with self._lock:
+            self._reap()
+            items = [dict(r) for r in self.resources[collection].values()
+                     if (not resource_group_id or _ref(r.get('resource_group')) == resource_group_id)
+                     and (not visibility or r.get('visibility') == visibility)]
+        offset, limit = int(start or 0), limit or 50
+        page: dict[str, Any] = {collection: items[offset:offset + limit], 'limit': limit}
+        if offset + limit < len(items):
+            page['next'] = {'href': f"https://fake.iaas.cloud.ibm.com/v1/{collection}"
+                                    f"?limit={limit}&start={offset + limit}"}
+        return _Response(page)
+
+    def _get(self, collection: str, id: str, **kwargs) -> _Response:
+        self._call(f"get_{COLLECTIONS[collection]}")
+        with self._lock:
+            self._reap()
+            r = self.resources[collection].get(id)
+            if r is None:
+                raise FakeApiError(404, f"{COLLECTIONS[collection]} not found")
+            return _Response(dict(r))
+
+    def _delete(self, collection: str, id: str, **kwargs) -> _Response:
+        self._call(f"delete_{COLLECTIONS[collection]}")
+        with self._lock:
+            self._reap()
+            r = self.resources[collection].get(id)
+            if r is None:
+                raise FakeApiError(404, f"{COLLECTIONS[collection]} not found")
+            if id in self.fail_ids:
+                raise FakeApiError(500, 'internal error')
+            if r['lifecycle_state'] == 'deleting':
+                return _Response(None)
+            blockers = self._blockers(collection, r)
+            if blockers:
+                raise FakeApiError(409, f"{COLLECTIONS[collection]} {id} is in use by {blockers[0]}")
+            r['lifecycle_state'] = 'deleting'
+            self._gone_at[id] = time.monotonic() + DELETE_SECONDS[collection] * self.time_scale
+            # Deleting an instance also releases its volume attachments.
+            if collection == 'instances':
+                for a in r.get('volume_attachments', []):
+                    vol = self.resources['volumes'].get(_ref(a.get('volume')))
+                    if vol:
+                        vol['volume_attachments'] = []
+        return _Response(None)
+
+    def unset_subnet_public_gateway(self, id: str, **kwargs) -> _Response:
+        self._call('unset_subnet_public_gateway')
+        with self._lock:
+            self._reap()
+            subnet = self.resources['subnets'].get(id)
+            if subnet is None:
+                raise FakeApiError(404, 'subnet not found')
+            subnet['public_gateway'] = None
+        return _Response(None)
+
+    def set_service_url(self, url: str) -> None:
+        pass
+
+    def __getattr__(self, name: str):
+        verb, _, noun = name.partition('_')
+        if verb == 'list' and noun in COLLECTIONS:
+            return lambda **kwargs: self._list(noun, **kwargs)
+        if verb in ('get', 'delete') and noun in _SINGULAR:
+            method = self._get if verb == 'get' else self._delete
+            return lambda id, **kwargs: method(_SINGULAR[noun], id, **kwargs)
+        raise AttributeError(name)
+
+    def remaining(self) -> dict[str, int]:
+        """
+        Resource count per collection (deleted ones reaped).
+        """
+        with self._lock:
+            self._reap()
+            return {c: len(t) for c, t in self.resources.items() if t}
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Tear down the VPC resources of an IBM Cloud region, dependency-aware and in parallel.
+
+  vpc_teardown.py --dry-run                        # inventory and deletion plan only
+  vpc_teardown.py --region eu-de --yes
+  vpc_teardown.py --resource-group <id> --limit instances=20 --limit vpcs=2
+  vpc_teardown.py --only instances,volumes
+  vpc_teardown.py --fake --yes                     # against fake_vpc_api.FakeVpcApi
+
+Python replacement for cleanup_ibmcloud_vpc.sh. The resource types form a
+dependency graph (RESOURCE_TYPES: a subnet goes after the instances, gateways,
+load balancers and shares in it, a VPC after its subnets and public gateways).
+Each level of the graph is deleted concurrently - every resource of every type
+in the level, with a per-type limit on in-flight API calls - and then the
+whole level is awaited at once: one listing per type per round, polled with
+an adaptive delay (short while resources keep disappearing, backing off to
+--poll-cap while nothing changes). Deletes refused with 409 (a dependency is
+still going away) are retried on each round until --timeout.
+
+Uses the ibm_vpc SDK (pip install ibm-vpc; IBM_CLOUD_API_KEY, IBM_VPC_URL or
+--region).
+"""
+
+from typing import Any, Literal, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+DEFAULT_SERVICE_URL = 'https://us-south.iaas.cloud.ibm.com/v1'
+API_VERSION = '2025-04-29'
+DEFAULT_WORKERS = 32
+DEFAULT_LIMIT = 8
+
+# Polling of a level: first delay, cap and overall limit (seconds)
+POLL_BASE, POLL_CAP, LEVEL_TIMEOUT = 1.0, 15.0, 1800.0
+
+
+class ResourceType(NamedTuple):
+    name: str                        # collection: list_<name>() result key
+    label: str
+    singular: str                    # delete_<singular>(id)
+    depends_on: tuple[str, ...] = ()  # types that must be gone first
+    limit: int = DEFAULT_LIMIT       # concurrent delete calls
+    list_kwargs: dict[str, Any] = {}
+    rg_filter: bool = True           # list_<name> accepts resource_group_id
+
+
+# Same scope as cleanup_ibmcloud_vpc.sh. Floating IPs can be released while
+# bound and private images depend on nothing, so both go in the first level.
+RESOURCE_TYPES = [
+    ResourceType('vpn_gateways', 'VPN gateway', 'vpn_gateway'),
+    ResourceType('load_balancers', 'load balancer', 'load_balancer', rg_filter=False),
+    ResourceType('instances', 'instance', 'instance', limit=16),
+    ResourceType('floating_ips', 'floating IP', 'floating_ip'),
+    ResourceType('images', 'custom image', 'image', list_kwargs={'visibility': 'private'}),
+    ResourceType('volumes', 'block storage volume', 'volume', ('instances',), rg_filter=False),
+    ResourceType('shares', 'file share', 'share', ('instances',)),
+    ResourceType('subnets', 'subnet', 'subnet',
+                 ('vpn_gateways', 'load_balancers', 'instances', 'shares')),
+    ResourceType('public_gateways', 'public gateway', 'public_gateway', ('subnets',)),
+    ResourceType('vpcs', 'VPC', 'vpc', ('subnets', 'public_gateways'), limit=4),
+]
+TYPES = {t.name: t for t in RESOURCE_TYPES}
+
+
+def dependency_levels(types: list[ResourceType]) -> list[list[ResourceType]]:
+    """
+    Group types into levels: each type comes after every type it depends on.
+    Dependencies on types not in `types` are ignored (e.g. with --only).
+    """
+    names = {t.name for t in types}
+    pending = {t.name: {d for d in t.depends_on if d in names} for t in types}
+    levels: list[list[ResourceType]] = []
+    while pending:
+        ready = [t for t in types if t.name in pending and not pending[t.name]]
+        if not ready:
+            raise ValueError(f"dependency cycle between {', '.join(sorted(pending))}")
+        levels.append(ready)
+        for t in ready:
+            del pending[t.name]
+        for deps in pending.values():
+            deps.difference_update(t.name for t in ready)
+    return levels
+
+
+def _start_token(href: str | None) -> str | None:
+    """
+    'start' query parameter of a VPC API 'next.href' link.
+    """
+    return (parse_qs(urlparse(href).query).get('start') or [None])[0] if href else None
+
+
+def _error_code(e: Exception) -> int | None:
+    return getattr(e, 'code', None)
+
+
+def _error_message(e: Exception) -> str:
+    return getattr(e, 'message', None) or str(e)
+
+
+def list_resources(service, rtype: ResourceType, resource_group: str | None = None) -> list[dict[str, Any]]:
+    """
+    Every resource of a type, following pagination. With resource_group the
+    listing is filtered server-side where the API supports it and always
+    client-side (load balancers and volumes have no such filter).
+    """
+    kwargs: dict[str, Any] = {'limit': 100, **rtype.list_kwargs}
+    if resource_group and rtype.rg_filter:
+        kwargs['resource_group_id'] = resource_group
+    items: list[dict[str, Any]] = []
+    while True:
+        page = getattr(service, f"list_{rtype.name}")(**kwargs).get_result() or {}
+        items.extend(page.get(rtype.name, []))
+        start = _start_token((page.get('next') or {}).get('href'))
+        if not start:
+            break
+        kwargs['start'] = start
+    if resource_group:
+        items = [r for r in items if (r.get('resource_group') or {}).get('id') == resource_group]
+    return items
+
+
+class Teardown:
+    """
+    One teardown run: inventory, then level by level delete + wait.
+
+    service: VpcV1 client (or fake_vpc_api.FakeVpcApi).
+    limits: per-type concurrent delete calls, overriding ResourceType.limit.
+    log: called with each progress line.
+    """
+
+    def __init__(self, service, types: list[ResourceType] | None = None,
+                 limits: dict[str, int] | None = None, workers: int = DEFAULT_WORKERS,
+                 resource_group: str | None = None, poll_base: float = POLL_BASE,
+                 poll_cap: float = POLL_CAP, timeout: float = LEVEL_TIMEOUT, log=print):
+        self.service = service
+        self.types = types or RESOURCE_TYPES
+        self.levels = dependency_levels(self.types)
+        limits = limits or {}
+        self._slots = {t.name: threading.Semaphore(max(1, limits.get(t.name, t.limit))) for t in self.types}
+        self.workers = max(1, workers)
+        self.resource_group = resource_group
+        self.poll_base = poll_base
+        self.poll_cap = poll_cap
+        self.timeout = timeout
+        self.log = log
+        self.results: list[dict[str, Any]] = []
+
+    def inventory(self, pool: ThreadPoolExecutor) -> dict[str, list[dict[str, Any]]]:
+        listings = pool.map(lambda t: list_resources(self.service, t, self.resource_group), self.types)
+        return dict(zip((t.name for t in self.types), listings))
+
+    def _delete(self, rtype: ResourceType, r: dict[str, Any]) -> tuple[str, str]:
+        """
+        ('ok' | 'gone' | 'conflict' | 'error', message) for one delete call.
+        """
+        with self._slots[rtype.name]:
+            try:
+                if rtype.name == 'subnets' and r.get('public_gateway'):
+                    self.service.unset_subnet_public_gateway(id=r['id'])
+                    r['public_gateway'] = None  # not again when a 409 is retried
+                getattr(self.service, f"delete_{rtype.singular}")(id=r['id'])
+            except Exception as e:
+                code = _error_code(e)
+                if code == 404:
+                    return 'gone', 'already deleted'
+                return ('conflict' if code == 409 else 'error'), _error_message(e)
+        return 'ok', 'deletion initiated'
+
+    def _record(self, rtype: ResourceType, r: dict[str, Any], ok: bool, message: str, level: int) -> None:
+        self.results.append({'type': rtype.name, 'id': r['id'], 'name': r.get('name', ''),
+                             'level': level, 'ok': ok, 'status': message})
+
+    def delete_level(self, pool: ThreadPoolExecutor, level: int,
+                     batch: list[tuple[ResourceType, dict[str, Any]]]) -> set[str]:
+        """
+        Delete a level's resources concurrently and wait for all of them.
+        Returns the names of the types that still have resources left.
+        """
+        started = time.monotonic()
+        pending: dict[str, tuple[ResourceType, dict[str, Any]]] = {}
+        retry: dict[str, str] = {}
+        failed: set[str] = set()
+
+        def submit(items):
+            outcomes = pool.map(lambda item: self._delete(*item), items)
+            for (rtype, r), (state, message) in zip(items, outcomes):
+                if state in ('ok', 'gone'):
+                    pending[r['id']] = (rtype, r)
+                    retry.pop(r['id'], None)
+                elif state == 'conflict':
+                    pending[r['id']] = (rtype, r)
+                    retry[r['id']] = message
+                else:
+                    self._record(rtype, r, False, message, level)
+                    failed.add(rtype.name)
+                    pending.pop(r['id'], None)
+                    retry.pop(r['id'], None)
+                    self.log(f"❌ {rtype.label} {r.get('name') or r['id']}: {message}")
+
+        submit(batch)
+        delay = self.poll_base
+        while pending:
+            waiting = {rtype.name: rtype for rtype, _ in pending.values()}
+            listings = pool.map(lambda t: list_resources(self.service, t), waiting.values())
+            present = {r['id']: r for items in listings for r in items}
+            gone = [rid for rid in pending if rid not in present]
+            for rid in gone:
+                rtype, r = pending.pop(rid)
+                retry.pop(rid, None)
+                self._record(rtype, r, True, f"deleted ({time.monotonic() - started:.0f}s)", level)
+            for rid in [rid for rid in pending if _lifecycle(present[rid]) == 'failed']:
+                rtype, r = pending.pop(rid)
+                retry.pop(rid, None)
+                self._record(rtype, r, False, 'lifecycle_state failed', level)
+                failed.add(rtype.name)
+            if retry:
+                submit([pending[rid] for rid in retry if rid in pending])
+            if not pending:
+                break
+
+            counts: dict[str, int] = {}
+            for rtype, _ in pending.values():
+                counts[rtype.label] = counts.get(rtype.label, 0) + 1
+            elapsed = time.monotonic() - started
+            if elapsed + delay > self.timeout:
+                for rid, (rtype, r) in pending.items():
+                    self._record(rtype, r, False, retry.get(rid) or f"still present after {self.timeout:.0f}s",
+                                 level)
+                    failed.add(rtype.name)
+                self.log(f"❌ Timed out waiting for {sum(counts.values())} resources")
+                break
+            # Adaptive polling: stay fast while resources keep disappearing,
+            # back off exponentially (with jitter) while nothing changes.
+            delay = self.poll_base if gone else min(self.poll_cap, delay * 2)
+            self.log(f"   ⏳ {elapsed:.0f}s: waiting for "
+                     f"{', '.join(f'{n} {label}' for label, n in counts.items())} (next check in ~{delay:.1f}s)")
+            time.sleep(random.uniform(delay / 2, delay))
+        return failed
+
+    def run(self, dry_run: bool = False, confirm=None) -> list[dict[str, Any]]:
+        """
+        Inventory, print the plan and (unless dry_run) delete level by level.
+        confirm(total) is asked first and raises RuntimeError when it declines.
+        Types depending on a type that could not be fully deleted are skipped.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            found = self.inventory(pool)
+            total = sum(len(v) for v in found.values())
+            for n, level in enumerate(self.levels):
+                parts = [f"{len(found[t.name])} {t.label}" for t in level if found[t.name]]
+                self.log(f"Level {n}: {', '.join(parts) or 'nothing'}")
+            if not total:
+                self.log("✅ No VPC resources to delete.")
+                return []
+            if dry_run:
+                for t in self.types:
+                    for r in found[t.name]:
+                        self._record(t, r, True, 'dry run', -1)
+                return self.results
+            if confirm and not confirm(total):
+                raise RuntimeError('not confirmed, nothing deleted')
+
+            blocked: set[str] = set()
+            for n, level in enumerate(self.levels):
+                batch = []
+                for t in level:
+                    skip = [d for d in t.depends_on if d in blocked]
+                    if skip:
+                        blocked.add(t.name)
+                        for r in found[t.name]:
+                            self._record(t, r, False, f"skipped: {TYPES[skip[0]].label} not deleted", n)
+                        continue
+                    batch.extend((t, r) for r in found[t.name])
+                if not batch:
+                    continue
+                self.log(f"\n🚨 Level {n}: deleting {len(batch)} resources "
+                         f"({', '.join(t.label for t in level if found[t.name] and t.name not in blocked)})")
+                started = time.monotonic()
+                blocked |= self.delete_level(pool, n, batch)
+                self.log(f"✅ Level {n} done in {time.monotonic() - started:.1f}s")
+        return self.results
+
+
+def _lifecycle(r: dict[str, Any]) -> str | None:
+    return r.get('lifecycle_state') or r.get('status')
+
+
+def make_service(region: str | None = None, workers: int = DEFAULT_WORKERS):
+    from ibm_vpc import VpcV1
+    from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+    from ibm_cloud_sdk_core.http_adapter import SSLHTTPAdapter
+
+    api_key = os.environ.get('IBM_CLOUD_API_KEY')
+    if not api_key:
+        raise RuntimeError('IBM_CLOUD_API_KEY is not set')
+    service = VpcV1(version=API_VERSION, authenticator=IAMAuthenticator(api_key))
+    url = f"https://{region}.iaas.cloud.ibm.com/v1" if region else os.environ.get('IBM_VPC_URL', DEFAULT_SERVICE_URL)
+    service.set_service_url(url)
+    # One keep-alive connection per worker thread in the shared session;
+    # same adapter class, retries and TLS settings the SDK mounted.
+    service.http_adapter = SSLHTTPAdapter(pool_maxsize=max(10, workers),
+                                          max_retries=service.http_adapter.max_retries,
+                                          _disable_ssl_verification=service.disable_ssl_verification)
+    service.get_http_client().mount('http://', service.http_adapter)
+    service.get_http_client().mount('https://', service.http_adapter)
+    return service, url
+
+
+def confirm_on_tty(where: str):
+    def confirm(total: int) -> bool:
+        if not sys.stdin or not sys.stdin.isatty():
+            print("❌ Refusing to delete without a terminal to confirm on (use --yes).")
+            return False
+        return input(f"Delete {total} resources in {where}? Type 'yes' to continue: ").strip() == 'yes'
+    return confirm
+
+
+def print_summary(results: list[dict[str, Any]], types: list[ResourceType]) -> None:
+    rows = []
+    for t in types:
+        mine = [r for r in results if r['type'] == t.name]
+        if mine:
+            ok = sum(1 for r in mine if r['ok'])
+            rows.append((t.label, str(len(mine)), str(ok), str(len(mine) - ok)))
+    if not rows:
+        return
+    cols = ('Resource', 'Found', 'Deleted', 'Failed')
+    widths = [max(len(c), *(len(r[i]) for r in rows)) for i, c in enumerate(cols)]
+    print('\n' + '  '.join(c.ljust(w) for c, w in zip(cols, widths)))
+    for r in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(r, widths)))
+    for r in results:
+        if not r['ok']:
+            print(f"❌ {TYPES[r['type']].label} {r['name'] or r['id']} ({r['id']}): {r['status']}")
+
+
+def parse_limits(specs: list[str]) -> dict[str, int]:
+    limits = {}
+    for spec in specs:
+        name, _, value = spec.partition('=')
+        if name not in TYPES or not value.isdigit():
+            raise argparse.ArgumentTypeError(f"bad --limit {spec!r} (expected <type>=<n>, types: {', '.join(TYPES)})")
+        limits[name] = int(value)
+    return limits
+
+
+def select_types(only: str | None, skip: str | None) -> list[ResourceType]:
+    names = [n.strip() for n in (only or '').split(',') if n.strip()] or list(TYPES)
+    skipped = {n.strip() for n in (skip or '').split(',') if n.strip()}
+    unknown = [n for n in [*names, *skipped] if n not in TYPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown resource type {unknown[0]!r} (types: {', '.join(TYPES)})")
+    return [TYPES[n] for n in names if n not in skipped]
+
+
+def main(argv: list[str]) -> Literal[1, 0]:
+    parser = argparse.ArgumentParser(description='Tear down the VPC resources of an IBM Cloud region.')
+    parser.add_argument('--region', help='VPC region, e.g. eu-de (default: IBM_VPC_URL or us-south)')
+    parser.add_argument('--resource-group', help='only resources in this resource group (ID)')
+    parser.add_argument('--only', help=f"comma-separated types to delete ({','.join(TYPES)})")
+    parser.add_argument('--skip', help='comma-separated types to keep')
+    parser.add_argument('--limit', action='append', default=[], metavar='TYPE=N',
+                        help='concurrent deletes for a type (repeatable)')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS, help='thread pool size')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='list resources and the plan, delete nothing')
+    parser.add_argument('-y', '--yes', action='store_true', help='do not ask for confirmation')
+    parser.add_argument('--timeout', type=float, default=LEVEL_TIMEOUT, help='max seconds to wait per level')
+    parser.add_argument('--poll-cap', type=float, default=POLL_CAP, help='longest delay between checks')
+    parser.add_argument('--fake', action='store_true', help='run against a synthetic in-memory account')
+    args = parser.parse_args(argv)
+
+    try:
+        types = select_types(args.only, args.skip)
+        limits = parse_limits(args.limit)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    poll_base = POLL_BASE
+    try:
+        if args.fake:
+            from fake_vpc_api import FakeVpcApi
+            service, where = FakeVpcApi.synthetic(time_scale=0.05, latency=0.02), 'fake account'
+            poll_base = 0.2
+        else:
+            service, where = make_service(args.region, args.workers)
+        teardown = Teardown(service, types, limits, args.workers, args.resource_group,
+                            poll_base=poll_base, poll_cap=args.poll_cap, timeout=args.timeout)
+        started = time.monotonic()
+        results = teardown.run(dry_run=args.dry_run, confirm=None if args.yes else confirm_on_tty(where))
+    except ImportError:
+        print("❌ Error: requires the ibm_vpc SDK (pip install ibm-vpc)")
+        return 1
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return 1
+    if args.dry_run:
+        for r in results:
+            print(f"   {TYPES[r['type']].label}: {r['name'] or '-'} ({r['id']})")
+        return 0
+    print_summary(results, types)
+    if results:
+        print(f"\nFinished in {time.monotonic() - started:.1f}s")
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
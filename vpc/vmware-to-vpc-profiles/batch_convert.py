@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Headless batch converter: runs the upload pipeline over many RVTools exports.
+
+The VPC catalog is fetched once (or read from a snapshot) in the parent
+process and handed to every worker of a process pool, so N workbooks cost one
+API fetch. Each workbook gets its own export; the run ends with consolidated
+CSVs across all workbooks.
+
+Usage:
+  python batch_convert.py exports/ -o out/                      # every .xlsx/.xls in exports/
+  python batch_convert.py exports/ -o out/ --workers 8 --mode cheapest --families bx2,cx2
+  python batch_convert.py a.xlsx b.xlsx -o out/ --format parquet
+  python batch_convert.py exports/ -o out/ --snapshot catalog.db --offline
+
+Outputs in the output directory:
+  <workbook>.<format>     processed rows per workbook (csv, xlsx or parquet)
+  batch_summary.csv       one row per workbook (rows, cost, image coverage, errors)
+  batch_profiles.csv      VM count and hourly cost per instance profile, all workbooks
+  batch_unmatched_os.csv  OS labels without a VPC image, all workbooks
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from profile_matching import FIRST_FIT, CHEAPEST, UNKNOWN_PROFILE
+
+WORKBOOK_PATTERNS = ('*.xlsx', '*.xlsm', '*.xls')
+OUTPUT_FORMATS = ('csv', 'xlsx', 'parquet')
+
+# Catalog of the current worker process (set by _init_worker).
+_CATALOG = None
+
+# ------------------------------------------------------------------------------
+# Catalog: fetched once, shipped to workers as plain data
+# ------------------------------------------------------------------------------
+def fetch_catalog(region=None, snapshot_path=None, offline=False, gc_pricing=True):
+    """
+    CatalogData for a region, from the API or a catalog_snapshot file, with
+    Global Catalog prices filling the ones the API did not return.
+    """
+    from vpc_client import VpcClientFactory, LazyService
+    vpc = VpcClientFactory()
+    region = region or vpc.default_region
+    if snapshot_path:
+        from catalog_snapshot import CatalogSnapshot, snapshot_loader
+        loader = snapshot_loader(CatalogSnapshot(snapshot_path), region, offline=offline)
+    else:
+        from vpc_catalog import load_catalog
+        loader = load_catalog
+    if gc_pricing:
+        from gc_pricing import GcPricing, priced_loader
+        loader = priced_loader(loader, GcPricing(offline=offline), region)
+    return loader(LazyService(vpc, region))
+
+
+def catalog_payload(cat):
+    """
+    The parts of CatalogData workers need to rebuild it; lookup structures
+    are rebuilt per process instead of being pickled.
+    """
+    return (cat.profiles, cat.prices, cat.images_all, cat.fetched_at, cat.version)
+
+
+def _init_worker(payload):
+    global _CATALOG
+    from vpc_catalog import make_catalog_data, index_image_records
+    profiles, prices, images_all, fetched_at, version = payload
+    _CATALOG = make_catalog_data(profiles, prices, index_image_records(images_all), images_all,
+                                 fetched_at, version)
+
+# ------------------------------------------------------------------------------
+# Per-workbook work (runs in the pool)
+# ------------------------------------------------------------------------------
+def output_path(path, out_dir, fmt, root=None):
+    """
+    out_dir/<path relative to root, '/' → '__'>.<fmt>, so equal file names in
+    different sub-directories don't collide.
+    """
+    rel = os.path.relpath(path, root) if root else os.path.basename(path)
+    stem = os.path.splitext(rel)[0].replace(os.sep, '__')
+    return os.path.join(out_dir, f"{stem}.{fmt}")
+
+
+def write_output(result, path, fmt):
+    from exports import iter_csv, write_parquet, write_xlsx
+    if fmt == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as fh:
+            for chunk in iter_csv(result):
+                fh.write(chunk)
+    else:
+        with open(path, 'wb') as fh:
+            (write_parquet if fmt == 'parquet' else write_xlsx)(result, fh)
+
+
+def convert_one(path, out_path, fmt, mode, families):
+    """
+    Convert one workbook and write its export. Returns a small, picklable
+    report (never raises): summary stats plus per-profile and unmatched-OS
+    tables for the consolidated outputs.
+    """
+    from pipeline import run_pipeline
+    started = time.time()
+    report = {'file': path, 'output': out_path, 'error': None}
+    try:
+        result = run_pipeline(path, _CATALOG, mode=mode, families=families)
+        write_output(result, out_path, fmt)
+        df = result.df
+        price = df['VPC Price ($)']
+        report.update({
+            'rows': len(df),
+            'profile_matched': int((df['Instance Profile'] != UNKNOWN_PROFILE).sum()),
+            'priced': int(price.notna().sum()),
+            'total_price': round(float(price.sum()), 4),
+            'image_coverage_pct': round(100.0 * df['Image ID'].notna().mean(), 1) if len(df) else 0.0,
+            'profiles': df.groupby('Instance Profile', observed=True)['VPC Price ($)']
+                          .agg(['count', 'sum']).reset_index().values.tolist(),
+            'unmatched': result.unmatched_df.values.tolist(),
+        })
+    except Exception as e:
+        report['error'] = f"{type(e).__name__}: {e}"
+    report['seconds'] = round(time.time() - started, 3)
+    return report
+
+# ------------------------------------------------------------------------------
+# Consolidation
+# ------------------------------------------------------------------------------
+def write_consolidated(reports, out_dir):
+    import pandas as pd
+
+    summary = pd.DataFrame([
+        {k: r.get(k) for k in ('file', 'output', 'rows', 'profile_matched', 'priced',
+                               'total_price', 'image_coverage_pct', 'seconds', 'error')}
+        for r in reports
+    ]).astype({'rows': 'Int64', 'profile_matched': 'Int64', 'priced': 'Int64'})
+    summary.to_csv(os.path.join(out_dir, 'batch_summary.csv'), index=False)
+
+    ok = [r for r in reports if not r['error']]
+    profiles = pd.DataFrame(
+        [(r['file'], *row) for r in ok for row in r['profiles']],
+        columns=['File', 'Instance Profile', 'VMs', 'Total Price ($)'],
+    )
+    (profiles.groupby('Instance Profile', as_index=False)
+             .agg(VMs=('VMs', 'sum'), Workbooks=('File', 'nunique'),
+                  **{'Total Price ($)': ('Total Price ($)', 'sum')})
+             .sort_values('VMs', ascending=False)
+             .to_csv(os.path.join(out_dir, 'batch_profiles.csv'), index=False))
+
+    unmatched = pd.DataFrame(
+        [(r['file'], *row) for r in ok for row in r['unmatched']],
+        columns=['File', 'Requested OS', 'Count'],
+    )
+    (unmatched.groupby('Requested OS', as_index=False)
+              .agg(Count=('Count', 'sum'), Workbooks=('File', 'nunique'))
+              .sort_values('Count', ascending=False)
+              .to_csv(os.path.join(out_dir, 'batch_unmatched_os.csv'), index=False))
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+def find_workbooks(inputs, recursive=False):
+    """
+    [(path, root)] for files and directories given on the command line.
+    """
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in WORKBOOK_PATTERNS:
+                spec = os.path.join(item, '**', pattern) if recursive else os.path.join(item, pattern)
+                found.extend((p, item) for p in glob.glob(spec, recursive=recursive))
+        else:
+            found.append((item, None))
+    # '~$x.xlsx' are Excel lock files, not workbooks.
+    return sorted({(p, root) for p, root in found if not os.path.basename(p).startswith('~$')})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="workbooks and/or directories of workbooks")
+    parser.add_argument('-o', '--output', required=True, help="output directory")
+    parser.add_argument('-r', '--recursive', action='store_true', help="search directories recursively")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv')
+    parser.add_argument('--mode', choices=[FIRST_FIT, CHEAPEST], default=FIRST_FIT)
+    parser.add_argument('--families', default='', help="profile families, e.g. bx2,cx2")
+    parser.add_argument('--region', help="VPC region (default: from IBM_VPC_URL)")
+    parser.add_argument('--snapshot', help="catalog_snapshot.py file to read/refresh the catalog from")
+    parser.add_argument('--offline', action='store_true', help="use --snapshot only, never the API")
+    parser.add_argument('--no-gc-pricing', action='store_true',
+                        help="only prices returned by the VPC API (no Global Catalog lookup)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='[%(levelname)s] %(message)s')
+    if args.offline and not args.snapshot:
+        parser.error("--offline requires --snapshot")
+
+    workbooks = find_workbooks(args.inputs, args.recursive)
+    if not workbooks:
+        sys.exit("No workbooks found.")
+    os.makedirs(args.output, exist_ok=True)
+    families = [f.strip() for f in args.families.split(',') if f.strip()] or None
+
+    started = time.time()
+    cat = fetch_catalog(args.region, args.snapshot, args.offline, not args.no_gc_pricing)
+    print(f"Catalog: {len(cat.profiles)} profiles, {len(cat.prices)} priced, {len(cat.images_all)} images "
+          f"({time.time() - started:.1f}s)")
+
+    reports = []
+    workers = max(1, min(args.workers, len(workbooks)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(catalog_payload(cat),)) as pool:
+        futures = [pool.submit(convert_one, path, output_path(path, args.output, args.format, root),
+                               args.format, args.mode, families)
+                   for path, root in workbooks]
+        for n, future in enumerate(as_completed(futures), 1):
+            r = future.result()
+            reports.append(r)
+            status = f"ERROR {r['error']}" if r['error'] else f"{r['rows']} rows"
+            print(f"[{n}/{len(workbooks)}] {r['file']}: {status} ({r['seconds']:.2f}s)")
+
+    reports.sort(key=lambda r: r['file'])
+    write_consolidated(reports, args.output)
+    failed = sum(1 for r in reports if r['error'])
+    print(f"Converted {len(reports) - failed}/{len(reports)} workbooks with {workers} workers "
+          f"in {time.time() - started:.1f}s → {args.output}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
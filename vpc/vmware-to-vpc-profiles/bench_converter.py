@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+End-to-end converter benchmark: times every pipeline stage on synthetic
+RVTools exports against a stubbed VPC API (fake_vpc.FakeVpcService).
+
+Stages: catalog load, Excel parse, memory rounding, profile match, OS → image
+mapping, groupby summaries and HTML rendering. A separate pass (not timed)
+records each stage's peak traced memory and the size of the processed frame.
+Results are written as JSON so runs can be compared across commits.
+
+Usage:
+  python bench_converter.py                                  # 1k, 10k, 100k rows
+  python bench_converter.py --rows 50000 --mode cheapest --output bench.json
+  python bench_converter.py --catalog catalog_pages.json     # replay recorded API pages
+  python bench_converter.py --workbook RVTools_export.xlsx   # time a real export
+  python bench_converter.py --compare baseline.json --fail-above 1.25
+  python bench_converter.py --no-memory                      # skip the tracemalloc pass
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from fake_vpc import FakeVpcService
+from os_mapping import OS_TO_TARGET
+from pipeline import (parse_workbook, match_profiles, map_images, summarize, savings_summary,
+                      display_columns, render_tables, ConversionResult)
+from profile_matching import round_memory_array, FIRST_FIT, CHEAPEST
+from vpc_catalog import load_catalog
+
+# vInfo header as exported by RVTools (first 13 columns; the converter reads I, L, M).
+VINFO_HEADER = ['VM', 'Powerstate', 'Template', 'SRM Placeholder', 'Config status', 'DNS Name',
+                'Connection state', 'Guest state', 'OS according to the configuration file',
+                'Heartbeat', 'Consolidation Needed', 'CPUs', 'Memory']
+
+# Labels that are not in OS_TO_TARGET (exercise the "unmapped" path).
+UNKNOWN_LABELS = ['FreeBSD 13 (64-bit)', 'VMware Photon OS (64-bit)', 'Other 5.x Linux (64-bit)', '']
+
+VM_CPUS = [1, 2, 4, 6, 8, 12, 16, 24, 32, 64, 160]
+VM_MEMORY_MB = [512, 1024, 2048, 4096, 6144, 8192, 16384, 32768, 65536, 262144]
+
+STAGES = ['catalog', 'parse', 'round_memory', 'match', 'image_map', 'summary', 'render',
+          'render_data']
+
+# ------------------------------------------------------------------------------
+# Synthetic RVTools export
+# ------------------------------------------------------------------------------
+def default_os_mix(unknown_share=0.05):
+    """
+    {label: weight}: every OS_TO_TARGET label equally, plus unknown labels
+    sharing `unknown_share` of the rows.
+    """
+    known = list(OS_TO_TARGET)
+    mix = {label: (1.0 - unknown_share) / len(known) for label in known}
+    for label in UNKNOWN_LABELS:
+        mix[label] = unknown_share / len(UNKNOWN_LABELS)
+    return mix
+
+
+def synthetic_vinfo(rows, os_mix, seed=42):
+    """
+    Write a vInfo workbook with `rows` VMs to an in-memory .xlsx; returns bytes.
+    """
+    rng = np.random.default_rng(seed)
+    labels = list(os_mix)
+    weights = np.asarray([os_mix[l] for l in labels], dtype=float)
+    os_col = rng.choice(len(labels), size=rows, p=weights / weights.sum())
+    cpus = rng.choice(VM_CPUS, size=rows)
+    memory = rng.choice(VM_MEMORY_MB, size=rows)
+    blank_mem = rng.random(rows) < 0.01  # blank cells in real exports
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('vInfo')
+    ws.append(VINFO_HEADER)
+    for i in range(rows):
+        ws.append([f"vm-{i:07d}", 'poweredOn', False, False, 'green', f"vm-{i:07d}.example.local",
+                   'connected', 'running', labels[os_col[i]] or None, 'green', False,
+                   int(cpus[i]), None if blank_mem[i] else int(memory[i])])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+# ------------------------------------------------------------------------------
+# Timing
+# ------------------------------------------------------------------------------
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - started
+
+
+def traced(fn, *args, **kwargs):
+    """
+    (result, peak bytes allocated while fn ran) — tracemalloc must be started.
+    """
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    out = fn(*args, **kwargs)
+    return out, tracemalloc.get_traced_memory()[1] - base
+
+
+def run_once(data, service, mode, families, measure=timed):
+    """
+    One pass over every stage; returns {stage: seconds} (or {stage: peak
+    bytes} with measure=traced), plus the processed frame.
+    """
+    t = {}
+    cat, t['catalog'] = measure(load_catalog, service)
+    df, t['parse'] = measure(parse_workbook, io.BytesIO(data))
+    _, t['round_memory'] = measure(round_memory_array, df['Memory'].to_numpy(dtype=float))
+    df, t['match'] = measure(match_profiles, df, cat, mode, families)
+    df, t['image_map'] = measure(map_images, df, cat)
+
+    def summary():
+        return summarize(df) + (savings_summary(df),)
+    (summary_df, image_summary, unmatched_df, savings_df), t['summary'] = measure(summary)
+
+    result = ConversionResult(df, summary_df, image_summary, unmatched_df, display_columns(df),
+                              savings_df)
+    _, t['render'] = measure(render_tables, result)
+    _, t['render_data'] = measure(df[result.display_cols].to_html, classes='data', index=False)
+    return t, df
+
+
+def memory_profile(data, service, mode, families):
+    """
+    {'peak_mb': {stage: MB}, 'frame_mb': MB}: tracemalloc peak per stage and
+    the processed frame's deep memory usage.
+    """
+    tracemalloc.start()
+    try:
+        peaks, df = run_once(data, service, mode, families, measure=traced)
+    finally:
+        tracemalloc.stop()
+    return {'peak_mb': {s: round(b / 1e6, 2) for s, b in peaks.items()},
+            'frame_mb': round(df.memory_usage(index=True, deep=True).sum() / 1e6, 2)}
+
+
+def bench(data, rows, service, mode, families, repeat, memory=True):
+    runs = [run_once(data, service, mode, families)[0] for _ in range(repeat)]
+    stages = {s: {'min': min(r[s] for r in runs), 'median': statistics.median(r[s] for r in runs)}
+              for s in STAGES}
+    res = {'rows': rows, 'bytes': len(data), 'stages': stages,
+           'total': {'min': min(sum(r.values()) for r in runs),
+                     'median': statistics.median(sum(r.values()) for r in runs)}}
+    if memory:
+        res['memory'] = memory_profile(data, service, mode, families)
+    return res
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ------------------------------------------------------------------------------
+# Reporting
+# ------------------------------------------------------------------------------
+def print_table(report):
+    print(f"{'rows':>9} " + ' '.join(f"{s:>12}" for s in STAGES) + f" {'total':>9}")
+    for res in report['results']:
+        cells = ' '.join(f"{res['stages'][s]['median']:>12.4f}" for s in STAGES)
+        print(f"{res['rows']:>9} {cells} {res['total']['median']:>9.3f}")
+    with_memory = [res for res in report['results'] if 'memory' in res]
+    if with_memory:
+        print(f"\npeak MB   " + ' '.join(f"{s:>12}" for s in STAGES) + f" {'frame MB':>9}")
+        for res in with_memory:
+            mem = res['memory']
+            cells = ' '.join(f"{mem['peak_mb'][s]:>12.2f}" for s in STAGES)
+            print(f"{res['rows']:>9} {cells} {mem['frame_mb']:>9.2f}")
+
+
+def compare(report, baseline, fail_above=None):
+    """
+    Print median ratios (current / baseline) for matching row counts.
+    Returns False if any stage is slower than fail_above × baseline.
+    """
+    ok = True
+    base = {r['rows']: r for r in baseline['results']}
+    print(f"\nvs baseline {baseline['meta'].get('commit')} (median ratio, >1 = slower):")
+    for res in report['results']:
+        ref = base.get(res['rows'])
+        if ref is None:
+            continue
+        ratios = {}
+        for s in STAGES:
+            old = ref['stages'].get(s, {}).get('median')
+            if old:
+                ratios[s] = res['stages'][s]['median'] / old
+        print(f"{res['rows']:>9} " + ' '.join(f"{s}={r:.2f}" for s, r in ratios.items()))
+        old_frame = ref.get('memory', {}).get('frame_mb')
+        if old_frame and 'memory' in res:
+            print(f"{'':>9} frame_mb={res['memory']['frame_mb'] / old_frame:.2f}")
+        if fail_above and any(r > fail_above for r in ratios.values()):
+            ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--mode', choices=[FIRST_FIT, CHEAPEST], default=FIRST_FIT)
+    parser.add_argument('--families', default='', help="profile families, e.g. bx2,cx2")
+    parser.add_argument('--os-mix', help="JSON file {label: weight} (default: all known labels)")
+    parser.add_argument('--unknown-share', type=float, default=0.05,
+                        help="share of rows with unmapped OS labels in the default mix")
+    parser.add_argument('--catalog', help="recorded API pages (fake_vpc.py record ...)")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated seconds per API call")
+    parser.add_argument('--workbook', help="benchmark a real RVTools export instead")
+    parser.add_argument('--save', help="also write the generated workbook(s) here (prefix)")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--compare', help="baseline JSON report to compare against")
+    parser.add_argument('--fail-above', type=float, help="exit 1 if a stage is this many times slower")
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak-memory pass")
+    args = parser.parse_args()
+
+    if args.catalog:
+        service = FakeVpcService.from_file(args.catalog, latency=args.latency)
+    else:
+        service = FakeVpcService.synthetic(latency=args.latency)
+    families = [f for f in args.families.split(',') if f.strip()]
+    if args.os_mix:
+        with open(args.os_mix, encoding='utf-8') as fh:
+            os_mix = json.load(fh)
+    else:
+        os_mix = default_os_mix(args.unknown_share)
+
+    if args.workbook:
+        with open(args.workbook, 'rb') as fh:
+            inputs = [(fh.read(), None)]
+    else:
+        inputs = []
+        for rows in args.rows:
+            data, gen_s = timed(synthetic_vinfo, rows, os_mix)
+            print(f"Generated {rows} rows ({len(data) / 1e6:.1f} MB) in {gen_s:.1f}s", file=sys.stderr)
+            if args.save:
+                with open(f"{args.save}-{rows}.xlsx", 'wb') as fh:
+                    fh.write(data)
+            inputs.append((data, rows))
+
+    results = []
+    for data, rows in inputs:
+        res = bench(data, rows, service, args.mode, families, args.repeat, memory=not args.no_memory)
+        if rows is None:
+            res['rows'] = len(parse_workbook(io.BytesIO(data)))
+        results.append(res)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'mode': args.mode,
+            'families': families,
+            'repeat': args.repeat,
+            'catalog': os.path.basename(args.catalog) if args.catalog else 'synthetic',
+            'workbook': os.path.basename(args.workbook) if args.workbook else None,
+        },
+        'results': results,
+    }
+    print_table(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+    ok = True
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            ok = compare(report, json.load(fh), args.fail_above)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
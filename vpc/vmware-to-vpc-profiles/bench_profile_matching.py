@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: row-wise round_memory/find_best_match (df.apply) vs the vectorized
+round_memory_array/ProfileIndex, on synthetic VM lists.
+
+Usage:
+  python bench_profile_matching.py                 # 10k, 100k, 1M rows
+  python bench_profile_matching.py --sizes 10000 50000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from profile_matching import round_memory, find_best_match, round_memory_array, ProfileIndex
+
+# Representative VPC gen2 profile grid (balanced 1:4, compute 1:2, memory 1:8).
+FAMILY_RATIOS = {'bx2': 4, 'cx2': 2, 'mx2': 8}
+PROFILE_CPUS = [2, 4, 8, 16, 32, 48, 64, 96, 128]
+
+
+def synthetic_profiles():
+    profiles = [(c, c * r, f"{fam}-{c}x{c * r}")
+                for fam, r in FAMILY_RATIOS.items() for c in PROFILE_CPUS]
+    profiles.sort()
+    return profiles
+
+
+def synthetic_vms(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    cpus = rng.choice([1, 2, 4, 6, 8, 12, 16, 24, 32, 64, 160], size=rows)
+    memory = rng.choice([512, 1024, 2048, 4096, 6144, 8192, 16384, 32768, 65536], size=rows).astype(float)
+    memory[rng.random(rows) < 0.01] = np.nan  # blank cells in real exports
+    return pd.DataFrame({'CPUs': cpus, 'Memory': memory})
+
+
+def rowwise(df, profiles):
+    df = df.copy()
+    df['Mem Rounded'] = df['Memory'].apply(round_memory).fillna(0).astype(int)
+    df['Instance Profile'] = df.apply(
+        lambda r: find_best_match(r['CPUs'], r['Mem Rounded'], profiles), axis=1
+    )
+    return df
+
+
+def vectorized(df, index):
+    df = df.copy()
+    df['Mem Rounded'] = round_memory_array(df['Memory'].to_numpy(dtype=float))
+    df['Instance Profile'] = index.match(df['CPUs'].to_numpy(), df['Mem Rounded'].to_numpy())
+    return df
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    profiles = synthetic_profiles()
+    index, build_s = timed(ProfileIndex, profiles)
+    print(f"ProfileIndex: {len(profiles)} profiles, table {index.table.shape}, built in {build_s * 1e3:.2f} ms")
+    print(f"{'rows':>10} {'row-wise (s)':>14} {'vectorized (s)':>15} {'speedup':>9}")
+
+    for rows in args.sizes:
+        df = synthetic_vms(rows)
+        slow, slow_s = timed(rowwise, df, profiles)
+        fast, fast_s = timed(vectorized, df, index)
+        for col in ('Mem Rounded', 'Instance Profile'):
+            if not np.array_equal(slow[col].to_numpy(), fast[col].to_numpy()):
+                raise SystemExit(f"Mismatch in '{col}' at {rows} rows")
+        print(f"{rows:>10} {slow_s:>14.3f} {fast_s:>15.4f} {slow_s / fast_s:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
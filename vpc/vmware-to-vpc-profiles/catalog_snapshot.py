@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+On-disk VPC catalog snapshots (SQLite), keyed by region and fetch time.
+
+A snapshot holds the parsed profiles, prices and normalized image records of
+one catalog fetch. Web workers and batch runs pointed at the same file share
+one API fetch per region and TTL: the first process to find the snapshot
+stale takes the region's fetch lock (a row with an expiry, so a crashed
+fetcher does not block the others for long) and fetches, the others poll
+until it has stored the new snapshot. The database write lock is only held
+to take the fetch lock and to insert the snapshot, never during the fetch. With offline=True the API is never called, so the
+converter runs at sites without network access against a copied snapshot.
+
+  python catalog_snapshot.py fetch catalog.db us-south eu-de   # needs IBM_CLOUD_API_KEY
+  python catalog_snapshot.py list catalog.db
+"""
+
+import json
+import logging
+import sqlite3
+import sys
+import time
+import uuid
+from contextlib import closing
+
+from vpc_catalog import load_catalog, make_catalog_data, index_image_records, DEFAULT_TTL
+
+# Bump when the stored payload layout changes; older rows are ignored.
+SNAPSHOT_FORMAT = 1
+
+# Seconds a worker waits for another process that is fetching the same catalog
+# (also how long a fetch lock is honoured).
+LOCK_TIMEOUT = 120
+
+# Seconds between checks while another process fetches.
+LOCK_POLL = 0.5
+
+# Snapshots kept per region by prune().
+KEEP_SNAPSHOTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    region     TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    format     INTEGER NOT NULL,
+    payload    TEXT NOT NULL,
+    PRIMARY KEY (region, fetched_at)
+);
+CREATE TABLE IF NOT EXISTS fetch_locks (
+    region  TEXT PRIMARY KEY,
+    owner   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class CatalogSnapshot:
+    """
+    SQLite file of catalog snapshots. Each call opens its own connection, so
+    one instance can be shared between threads.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        with closing(self._connect()) as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')  # readers never block on a writer
+        return db
+
+    # -- read / write ----------------------------------------------------------
+    def save(self, region, data, db=None):
+        """
+        Store CatalogData for a region (fetch time = data.fetched_at).
+        """
+        payload = json.dumps({
+            'profiles': data.profiles,
+            'prices': data.prices,
+            'images': data.images_all,
+        }, separators=(',', ':'))
+        conn = db or self._connect()
+        try:
+            conn.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)',
+                         (region, data.fetched_at, SNAPSHOT_FORMAT, payload))
+        finally:
+            if db is None:
+                conn.close()
+        logging.info(f"Catalog snapshot saved: {region} @ {time.ctime(data.fetched_at)}")
+
+    def load(self, region, max_age=None, version=1, db=None):
+        """
+        Latest snapshot for a region as CatalogData, or None if there is none
+        (or none younger than max_age seconds).
+        """
+        conn = db or self._connect()
+        try:
+            row = conn.execute(
+                'SELECT fetched_at, payload FROM snapshots WHERE region = ? AND format = ? '
+                'ORDER BY fetched_at DESC LIMIT 1', (region, SNAPSHOT_FORMAT)
+            ).fetchone()
+        finally:
+            if db is None:
+                conn.close()
+        if row is None:
+            return None
+        fetched_at, payload = row
+        if max_age is not None and time.time() - fetched_at > max_age:
+            return None
+        raw = json.loads(payload)
+        images_all = raw['images']
+        return make_catalog_data([tuple(p) for p in raw['profiles']], raw['prices'],
+                                 index_image_records(images_all), images_all, fetched_at, version)
+
+    def list(self):
+        """
+        [(region, fetched_at, profiles, images)] for every stored snapshot, newest first.
+        """
+        with closing(self._connect()) as db:
+            rows = db.execute('SELECT region, fetched_at, payload FROM snapshots '
+                              'WHERE format = ? ORDER BY region, fetched_at DESC',
+                              (SNAPSHOT_FORMAT,)).fetchall()
+        out = []
+        for region, fetched_at, payload in rows:
+            raw = json.loads(payload)
+            out.append((region, fetched_at, len(raw['profiles']), len(raw['images'])))
+        return out
+
+    def prune(self, keep=KEEP_SNAPSHOTS, db=None):
+        """
+        Keep only the `keep` newest snapshots per region.
+        """
+        conn = db or self._connect()
+        try:
+            conn.execute('DELETE FROM snapshots WHERE rowid IN ('
+                         ' SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER ('
+                         '  PARTITION BY region ORDER BY fetched_at DESC) AS n FROM snapshots)'
+                         ' WHERE n > ?)', (keep,))
+        finally:
+            if db is None:
+                conn.close()
+
+    # -- shared fetch ----------------------------------------------------------
+    def fetch_or_load(self, vpc_service, region, max_age=DEFAULT_TTL, version=1):
+        """
+        Snapshot younger than max_age, else fetch from the API and store it
+        (pruning older snapshots). One process per region fetches at a time;
+        the others wait up to `timeout` seconds for its snapshot, then raise
+        TimeoutError.
+        """
+        data = self.load(region, max_age, version)
+        if data is not None:
+            return data
+        owner = uuid.uuid4().hex
+        deadline = time.time() + self.timeout
+        while not self._lock_fetch(region, owner):
+            # Checked after the lock attempt, so a lock left by a crashed
+            # fetcher (expiring at about our deadline) is still taken over.
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for another process to fetch the {region} catalog")
+            time.sleep(LOCK_POLL)
+            data = self.load(region, max_age, version)
+            if data is not None:
+                return data
+        try:
+            # Another process may have stored a fresh snapshot before we got the lock.
+            data = self.load(region, max_age, version)
+            if data is None:
+                data = load_catalog(vpc_service, version)
+                with closing(self._connect()) as db:
+                    db.execute('BEGIN IMMEDIATE')
+                    try:
+                        self.save(region, data, db=db)
+                        self.prune(db=db)
+                        db.execute('COMMIT')
+                    except Exception:
+                        db.execute('ROLLBACK')
+                        raise
+            return data
+        finally:
+            self._unlock_fetch(region, owner)
+
+    def _lock_fetch(self, region, owner):
+        """
+        Take the region's fetch lock unless another owner holds an unexpired one.
+        """
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT expires FROM fetch_locks WHERE region = ?', (region,)).fetchone()
+            if row is not None and row[0] > now:
+                db.execute('ROLLBACK')
+                return False
+            db.execute('INSERT OR REPLACE INTO fetch_locks VALUES (?, ?, ?)',
+                       (region, owner, now + self.timeout))
+            db.execute('COMMIT')
+            return True
+
+    def _unlock_fetch(self, region, owner):
+        with closing(self._connect()) as db:
+            db.execute('DELETE FROM fetch_locks WHERE region = ? AND owner = ?', (region, owner))
+
+
+def snapshot_loader(snapshot, region, max_age=DEFAULT_TTL, offline=False):
+    """
+    VpcCatalog loader backed by a CatalogSnapshot.
+
+    Online: fresh snapshot or shared fetch (see fetch_or_load); if the API
+    fails, the newest snapshot of any age is served instead.
+    Offline: newest snapshot only; the API is never called.
+    """
+    def loader(vpc_service, version=1):
+        if not offline:
+            try:
+                return snapshot.fetch_or_load(vpc_service, region, max_age, version)
+            except Exception as e:
+                logging.warning(f"Catalog fetch for {region} failed, trying snapshot: {e}")
+        data = snapshot.load(region, version=version)
+        if data is None:
+            raise RuntimeError(f"No catalog snapshot for {region} in {snapshot.path}")
+        return data
+    return loader
+
+
+def main(argv):
+    if len(argv) < 3 or argv[1] not in ('fetch', 'list'):
+        sys.exit(__doc__)
+    snapshot = CatalogSnapshot(argv[2])
+    if argv[1] == 'list':
+        for region, fetched_at, n_profiles, n_images in snapshot.list():
+            print(f"{region:10} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(fetched_at))}"
+                  f"  profiles={n_profiles} images={n_images}")
+        return
+    from vpc_client import VpcClientFactory
+    vpc = VpcClientFactory()
+    for region in argv[3:] or [vpc.default_region]:
+        data = load_catalog(vpc(region))
+        snapshot.save(region, data)
+        print(f"{region}: {len(data.profiles)} profiles, {len(data.images_all)} images")
+    snapshot.prune()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    main(sys.argv)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+File exports of a processed conversion result (CSV, Parquet, XLSX).
+
+Rows are written in chunks so a large result is never rendered into one big
+in-memory string: CSV is yielded chunk by chunk, Parquet is written one row
+group at a time and XLSX uses openpyxl's write-only mode (imported on first
+export).
+"""
+
+import math
+
+CHUNK_ROWS = 10000
+
+# Low-cardinality text columns stored as dictionary/categorical in Parquet.
+CATEGORICAL_COLS = ['Requested OS', 'Instance Profile', 'Target Family',
+                    'Image Name', 'Image ID', 'Image Match Note', 'OS Rule']
+
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_frame(result):
+    """
+    Columns exported: vInfo metadata + computed columns, as displayed.
+    """
+    return result.df[result.display_cols]
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+# ------------------------------------------------------------------------------
+# CSV
+# ------------------------------------------------------------------------------
+def iter_csv(result, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the CSV export as text chunks (header first).
+    """
+    df = export_frame(result)
+    yield df.iloc[:0].to_csv(index=False)
+    for chunk in _chunks(df, chunk_rows):
+        yield chunk.to_csv(header=False, index=False)
+
+# ------------------------------------------------------------------------------
+# Parquet
+# ------------------------------------------------------------------------------
+def write_parquet(result, fileobj, chunk_rows=CHUNK_ROWS):
+    """
+    Write the export as Parquet (one row group per chunk) into a binary file.
+    Requires pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    df = export_frame(result).copy()
+    for c in df.columns:
+        if c in CATEGORICAL_COLS:
+            # Categories are fixed over the whole frame so every row group
+            # shares one dictionary schema.
+            df[c] = df[c].astype('category')
+        elif df[c].dtype == object:
+            # Raw vInfo columns may mix types; Parquet needs one per column.
+            df[c] = df[c].map(lambda v: None if v is None or (isinstance(v, float) and math.isnan(v)) else str(v))
+    df.columns = [str(c) for c in df.columns]
+
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+# ------------------------------------------------------------------------------
+# XLSX
+# ------------------------------------------------------------------------------
+def _xlsx_value(v):
+    if v is None:
+        return None
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    if hasattr(v, 'item'):  # numpy scalar → Python scalar
+        return v.item()
+    return v
+
+
+def write_xlsx(result, fileobj, sheet_title='VPC Mapping'):
+    """
+    Write the export as XLSX with openpyxl write-only mode (rows are streamed
+    to the zip, not kept as cell objects).
+    """
+    from openpyxl import Workbook
+    from pandas import NA  # missing value of nullable columns (CPUs)
+    df = export_frame(result)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    ws.append([str(c) for c in df.columns])
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if v is NA else _xlsx_value(v) for v in row])
+    wb.save(fileobj)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for ibm_vpc.VpcV1 serving recorded catalog pages.
+
+Implements the two calls the converter makes (list_instance_profiles and
+paginated list_images) so the catalog, pipeline and benchmarks run without an
+API key or network. Pages come either from a recording made against the real
+API (record_catalog_pages) or from a built-in synthetic catalog.
+
+  python fake_vpc.py record catalog_pages.json   # needs IBM_CLOUD_API_KEY
+"""
+
+import json
+import os
+import sys
+
+
+class _Response:
+    def __init__(self, result):
+        self._result = result
+
+    def get_result(self):
+        return self._result
+
+
+class FakeVpcService:
+    """
+    profiles_page: one list_instance_profiles result ({'profiles': [...]}).
+    images_pages: list_images results in order; 'next.start' links them.
+    latency: optional seconds to sleep per call (simulated round-trip).
+    """
+
+    def __init__(self, profiles_page, images_pages, latency=0.0):
+        self.profiles_page = profiles_page
+        self.images_pages = images_pages
+        self.latency = latency
+        self.calls = {'list_instance_profiles': 0, 'list_images': 0}
+
+    @classmethod
+    def from_file(cls, path, latency=0.0):
+        with open(path, encoding='utf-8') as fh:
+            data = json.load(fh)
+        return cls(data['profiles'], data['images_pages'], latency)
+
+    @classmethod
+    def synthetic(cls, latency=0.0, page_size=100):
+        profiles, images = synthetic_catalog()
+        pages = []
+        for i in range(0, len(images), page_size):
+            page = {'images': images[i:i + page_size]}
+            if i + page_size < len(images):
+                page['next'] = {'start': str(len(pages) + 1)}
+            pages.append(page)
+        return cls({'profiles': profiles}, pages or [{'images': []}], latency)
+
+    def _wait(self):
+        if self.latency:
+            import time
+            time.sleep(self.latency)
+
+    def list_instance_profiles(self, **kwargs):
+        self.calls['list_instance_profiles'] += 1
+        self._wait()
+        return _Response(self.profiles_page)
+
+    def list_images(self, limit=None, start=None, **kwargs):
+        self.calls['list_images'] += 1
+        self._wait()
+        return _Response(self.images_pages[int(start) if start else 0])
+
+    def set_service_url(self, url):
+        pass
+
+
+def synthetic_catalog():
+    """
+    (profiles, images) shaped like the VPC API results: bx2/cx2/mx2 (+ bz2,
+    which the converter skips) profiles with prices, and public images for
+    every family referenced by os_mapping.OS_TO_TARGET plus private noise.
+    """
+    profiles = []
+    for fam, ratio, rate in (('bx2', 4, 0.048), ('cx2', 2, 0.041), ('mx2', 8, 0.061), ('bz2', 4, 0.05)):
+        for cpus in (2, 4, 8, 16, 32, 48, 64, 96, 128):
+            mem = cpus * ratio
+            profiles.append({'name': f"{fam}-{cpus}x{mem}",
+                             'price': {'value': round(cpus * rate + mem * 0.002, 4)}})
+
+    images = []
+    versions = {
+        'ubuntu': ['20.04', '22.04', '24.04'], 'debian': ['11', '12'],
+        'centos': ['7.9', 'stream 9'], 'redhat': ['8.8', '9.2', '9.4'],
+        'rocky': ['8.9', '9.3'], 'sles': ['12 sp5', '15 sp5'],
+        'windows': ['2016 standard', '2019 standard', '2022 standard'],
+    }
+    for fam, vers in versions.items():
+        for ver in vers:
+            for arch in ('amd64', 's390x'):
+                images.append({
+                    'id': f"r006-{fam}-{ver.replace(' ', '-')}-{arch}",
+                    'name': f"ibm-{fam}-{ver.replace(' ', '-').replace('.', '-')}-{arch}",
+                    'visibility': 'public', 'status': 'available',
+                    'operating_system': {'family': fam, 'name': f"{fam}-{ver}", 'version': ver,
+                                         'architecture': arch},
+                })
+    for i in range(150):
+        images.append({'id': f"r006-private-{i}", 'name': f"custom-{i}", 'visibility': 'private',
+                       'status': 'available', 'operating_system': {}})
+    return profiles, images
+
+
+def record_catalog_pages(vpc_service, path):
+    """
+    Save the real API's profile page and every image page for later replay.
+    """
+    profiles = vpc_service.list_instance_profiles().get_result()
+    pages = []
+    resp = vpc_service.list_images(limit=100)
+    while True:
+        result = resp.get_result() or {}
+        pages.append(result)
+        start = (result.get('next') or {}).get('start')
+        if not start:
+            break
+        # Re-key pagination to page numbers so replays don't depend on tokens.
+        result['next'] = {'start': str(len(pages))}
+        resp = vpc_service.list_images(limit=100, start=start)
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({'profiles': profiles, 'images_pages': pages}, fh)
+    return len(pages)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'record':
+        sys.exit(__doc__)
+    from ibm_vpc import VpcV1
+    from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+    service = VpcV1(version='2025-04-29', authenticator=IAMAuthenticator(os.environ['IBM_CLOUD_API_KEY']))
+    service.set_service_url(os.environ.get('IBM_VPC_URL', 'https://us-south.iaas.cloud.ibm.com/v1'))
+    print(f"Recorded {record_catalog_pages(service, sys.argv[2])} image pages → {sys.argv[2]}")
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IBM Cloud Global Catalog pricing for VPC virtual servers.
+
+The Python version of ibm_vpc_prices.sh: service → paid plan → regional
+deployment → pricing. The service, plan and deployment list are looked up
+once; the per-region pricing documents are then fetched concurrently over
+one pooled, retrying HTTP session and reduced to a compact index
+
+  (region, profile, metric) → (hourly, monthly)
+
+persisted to a JSON file with a TTL, so web workers and batch runs cost
+whole fleets without any per-request catalog calls. priced_loader() plugs
+the index into a VpcCatalog loader: the instance-profiles API rarely
+returns prices, so Global Catalog prices fill the gaps.
+
+  python gc_pricing.py fetch prices.json us-south eu-de
+  python gc_pricing.py show prices.json eu-de bx2-2x8
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+GC_URL = 'https://globalcatalog.cloud.ibm.com/api/v1'
+SERVICE_QUERY = 'kind:service AND (name:"is.instance" OR label:"Virtual Server for VPC")'
+
+DEFAULT_CACHE_PATH = os.environ.get('GC_PRICING_CACHE')
+DEFAULT_TTL = int(os.environ.get('GC_PRICING_TTL', 86400))
+DEFAULT_COUNTRY = os.environ.get('GC_PRICING_COUNTRY', 'USA')
+DEFAULT_CURRENCY = os.environ.get('GC_PRICING_CURRENCY', 'USD')
+# Metric used as "the" hourly price of a profile when it has several.
+DEFAULT_METRIC = os.environ.get('GC_PRICING_METRIC', 'INSTANCE_HOURS_MULTI_TENANT')
+DEFAULT_WORKERS = int(os.environ.get('GC_PRICING_WORKERS', 8))
+HTTP_TIMEOUT = 30
+
+HOURS_PER_MONTH = 730
+INDEX_FORMAT = 1
+
+# bx2-2x8, bx2d-16x64, gx3-24x120x1l40s, ...
+_PROFILE_RE = re.compile(r'\b([a-z]+\d+[a-z]*-\d+x\d+(?:x[0-9a-z]+)?)\b')
+
+# ------------------------------------------------------------------------------
+# Global Catalog client
+# ------------------------------------------------------------------------------
+def make_session(workers=DEFAULT_WORKERS):
+    """
+    requests.Session with one keep-alive connection per worker and retries
+    (with backoff) on throttling and server errors.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=('GET',))
+    session.mount('https://', HTTPAdapter(pool_maxsize=max(10, workers), max_retries=retry))
+    return session
+
+
+def _resources(doc):
+    """
+    Global Catalog answers with {resources: [...]}, a bare list or a single object.
+    """
+    if isinstance(doc, dict):
+        doc = doc.get('resources', doc)
+    return doc if isinstance(doc, list) else [doc]
+
+
+class GlobalCatalog:
+    """
+    The four lookups of ibm_vpc_prices.sh. Thread-safe: one session shared
+    by all concurrent pricing fetches; service/plan/deployments are cached.
+    """
+
+    def __init__(self, session=None, base_url=GC_URL, timeout=HTTP_TIMEOUT, workers=DEFAULT_WORKERS):
+        self.session = session or make_session(workers)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._deployments = None
+        self._lock = threading.Lock()
+
+    def _get(self, path, **params):
+        started = time.perf_counter()
+        resp = self.session.get(f"{self.base_url}/{path}", params=params or None, timeout=self.timeout)
+        resp.raise_for_status()
+        logging.debug(f"Global Catalog {path}: {time.perf_counter() - started:.2f}s")
+        return resp.json()
+
+    def service_id(self):
+        found = _resources(self._get('', q=SERVICE_QUERY, _limit=50))
+        sid = found and (found[0].get('id') or found[0].get('_id'))
+        if not sid:
+            raise RuntimeError("Global Catalog service for Virtual Server for VPC not found")
+        return sid
+
+    def plan_id(self, service_id):
+        for plan in _resources(self._get(f"{service_id}/plan", _offset=0, _limit=50)):
+            meta = plan.get('metadata') or {}
+            if str((meta.get('pricing') or {}).get('type', '')).lower() == 'paid' or meta.get('type') == 'paid':
+                return plan.get('id') or plan.get('_id')
+        raise RuntimeError(f"No paid plan under Global Catalog service {service_id}")
+
+    def deployments(self):
+        """
+        {region: deployment_id} of the paid plan (looked up once).
+        """
+        with self._lock:
+            if self._deployments is None:
+                plan = self.plan_id(self.service_id())
+                found = {}
+                for d in _resources(self._get(f"{plan}/pricing/deployment")):
+                    for key in ('deployment_region', 'deployment_location'):
+                        if d.get(key) and d.get('deployment_id'):
+                            found.setdefault(d[key], d['deployment_id'])
+                self._deployments = found
+            return self._deployments
+
+    def pricing(self, region):
+        deployment = self.deployments().get(region)
+        if not deployment:
+            raise RuntimeError(f"Region {region} not found in the Global Catalog plan deployments")
+        return deployment, self._get(f"{deployment}:global/pricing", deployment_region=region)
+
+
+def _metrics(doc):
+    """
+    Every metric of a pricing document; like the jq in ibm_vpc_prices.sh it
+    accepts an array or object root, each with or without 'resources'.
+    """
+    for item in _resources(doc):
+        for res in _resources(item):
+            if isinstance(res, dict):
+                yield from res.get('metrics') or []
+
+
+def parse_pricing(doc, country=DEFAULT_COUNTRY, currency=DEFAULT_CURRENCY):
+    """
+    [(profile, metric, hourly, monthly)] from a pricing document: first-tier
+    price per metric for the country/currency, profile name taken from the
+    metric's display name or id. Per-month metrics are converted to hourly.
+    """
+    rows = []
+    for m in _metrics(doc):
+        name = m.get('resource_display_name') or ''
+        metric_id = m.get('metric_id') or ''
+        match = _PROFILE_RE.search(name.lower()) or _PROFILE_RE.search(metric_id.lower())
+        if not match:
+            continue
+        unit = (m.get('charge_unit_name') or metric_id).upper()
+        amounts = m.get('amounts') or []
+        amount = next((a for a in amounts if a.get('country') == country and a.get('currency') == currency),
+                      next((a for a in amounts if a.get('currency') == currency), None))
+        price = next((p.get('price') for p in (amount or {}).get('prices') or [] if p.get('quantity_tier') == 1),
+                     None)
+        if price is None:
+            continue
+        price = float(price) / float(m.get('charge_unit_quantity') or 1)
+        if 'MONTH' in unit:
+            hourly, monthly = price / HOURS_PER_MONTH, price
+        else:
+            hourly, monthly = price, price * HOURS_PER_MONTH
+        rows.append((match.group(1), unit, round(hourly, 6), round(monthly, 4)))
+    return rows
+
+# ------------------------------------------------------------------------------
+# Price index
+# ------------------------------------------------------------------------------
+class PriceIndex:
+    """
+    (region, profile, metric) → (hourly, monthly), with a fetch time per region.
+    """
+
+    def __init__(self, regions=None):
+        self.regions = regions or {}  # region → {'fetched_at', 'deployment', 'prices': {(profile, metric): (h, m)}}
+
+    def set_region(self, region, rows, deployment=None, fetched_at=None):
+        self.regions[region] = {
+            'fetched_at': fetched_at or time.time(), 'deployment': deployment,
+            'prices': {(p, metric): (h, mo) for p, metric, h, mo in rows},
+        }
+
+    def age(self, region):
+        entry = self.regions.get(region)
+        return time.time() - entry['fetched_at'] if entry else None
+
+    def lookup(self, region, profile, metric=None):
+        """
+        (hourly, monthly) of a profile, for `metric` or the preferred hourly one.
+        """
+        prices = (self.regions.get(region) or {}).get('prices') or {}
+        if metric:
+            return prices.get((profile, metric))
+        return self.hourly(region).get(profile)
+
+    def hourly(self, region, metric=DEFAULT_METRIC):
+        """
+        {profile: (hourly, monthly)} using `metric` where a profile has it,
+        else its first hourly metric.
+        """
+        best = {}
+        for (profile, m), value in sorted(((self.regions.get(region) or {}).get('prices') or {}).items()):
+            if m == metric or ('HOUR' in m and profile not in best):
+                best[profile] = value
+        return best
+
+    # -- persistence -----------------------------------------------------------
+    def to_json(self):
+        return {'format': INDEX_FORMAT, 'regions': {
+            r: {'fetched_at': e['fetched_at'], 'deployment': e['deployment'],
+                'prices': [[p, m, h, mo] for (p, m), (h, mo) in sorted(e['prices'].items())]}
+            for r, e in self.regions.items()}}
+
+    @classmethod
+    def from_json(cls, doc):
+        index = cls()
+        if doc.get('format') == INDEX_FORMAT:
+            for region, e in doc.get('regions', {}).items():
+                index.set_region(region, e['prices'], e.get('deployment'), e['fetched_at'])
+        return index
+
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(self.to_json(), fh, separators=(',', ':'))
+        os.replace(tmp, path)  # atomic: other workers never read a partial file
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding='utf-8') as fh:
+                return cls.from_json(json.load(fh))
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Unreadable price index {path}, starting empty: {e}")
+            return cls()
+
+
+class GcPricing:
+    """
+    Regional Global Catalog prices with a TTL, persisted to `path`.
+
+    ensure(regions) refreshes the stale ones concurrently; a failed refresh
+    keeps serving the previous prices. offline=True never calls the catalog.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, catalog=None, workers=DEFAULT_WORKERS,
+                 offline=False):
+        self.path = path
+        self.ttl = ttl
+        self.workers = workers
+        self.offline = offline
+        self._catalog = catalog
+        self._lock = threading.Lock()
+        self._inflight = {}  # region → Event set when its fetch finishes
+        self.index = PriceIndex.load(path) if path else PriceIndex()
+
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            self._catalog = GlobalCatalog(workers=self.workers)
+        return self._catalog
+
+    def stale(self, regions):
+        return [r for r in regions if self.index.age(r) is None or self.index.age(r) > self.ttl]
+
+    def ensure(self, regions):
+        """
+        Fetch the stale regions' pricing concurrently. Returns {region: error}
+        for failures. A region already being fetched by another thread is
+        waited for, not fetched twice.
+        """
+        with self._lock:
+            if self.path:
+                # Another worker may have refreshed the shared file meanwhile.
+                for region, entry in PriceIndex.load(self.path).regions.items():
+                    if entry['fetched_at'] > (self.index.regions.get(region) or {}).get('fetched_at', 0):
+                        self.index.regions[region] = entry
+            stale = [] if self.offline else self.stale(list(dict.fromkeys(regions)))
+            waits = [self._inflight[r] for r in stale if r in self._inflight]
+            todo = [r for r in stale if r not in self._inflight]
+            for region in todo:
+                self._inflight[region] = threading.Event()
+
+        errors = {}
+        if todo:
+            started = time.time()
+
+            def fetch(region):
+                try:
+                    deployment, doc = self.catalog.pricing(region)
+                    return region, deployment, parse_pricing(doc), None
+                except Exception as e:
+                    return region, None, None, e
+
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(todo)))) as pool:
+                fetched = list(pool.map(fetch, todo))
+            with self._lock:
+                for region, deployment, rows, error in fetched:
+                    if error is not None or not rows:
+                        errors[region] = error or RuntimeError('no profile prices in pricing document')
+                        logging.warning(f"Global Catalog pricing for {region} unavailable: {errors[region]}")
+                    else:
+                        self.index.set_region(region, rows, deployment)
+                try:
+                    if self.path and len(errors) < len(todo):
+                        self.index.save(self.path)
+                finally:
+                    for region in todo:
+                        self._inflight.pop(region).set()
+            logging.info(f"Global Catalog pricing for {len(todo) - len(errors)}/{len(todo)} regions "
+                         f"in {time.time() - started:.2f}s")
+        for event in waits:
+            event.wait()
+        return errors
+
+    def hourly_prices(self, region):
+        """
+        {profile: hourly price} for a region (refreshed first if stale).
+        """
+        self.ensure([region])
+        return {p: h for p, (h, _) in self.index.hourly(region).items()}
+
+
+def priced_loader(loader, pricing, region):
+    """
+    Wrap a VpcCatalog loader so the loaded catalog also carries Global
+    Catalog prices for `region`. Prices the VPC API returned take precedence;
+    if the Global Catalog is unreachable the catalog loads unchanged.
+    """
+    from vpc_catalog import make_catalog_data
+
+    def load(vpc_service, version=1):
+        data = loader(vpc_service, version=version)
+        try:
+            gc = pricing.hourly_prices(region)
+        except Exception as e:
+            logging.warning(f"Global Catalog pricing for {region} failed: {e}")
+            return data
+        names = {name for _, _, name in data.profiles}
+        prices = {**{p: h for p, h in gc.items() if p in names}, **data.prices}
+        if prices == data.prices:
+            return data
+        logging.info(f"Prices for {region}: {len(data.prices)} from the VPC API, "
+                     f"{len(prices) - len(data.prices)} from the Global Catalog")
+        return make_catalog_data(data.profiles, prices, data.images_idx, data.images_all,
+                                 data.fetched_at, data.version)
+    return load
+
+
+def main(argv):
+    if len(argv) < 3 or argv[1] not in ('fetch', 'show'):
+        sys.exit(__doc__)
+    path = argv[2]
+    if argv[1] == 'fetch':
+        pricing = GcPricing(path, ttl=0)
+        regions = argv[3:] or ['us-south']
+        errors = pricing.ensure(regions)
+        for region in regions:
+            if region not in errors:
+                print(f"{region}: {len(pricing.index.hourly(region))} profiles")
+        sys.exit(1 if errors else 0)
+    index = PriceIndex.load(path)
+    region = argv[3] if len(argv) > 3 else 'us-south'
+    pattern = argv[4].lower() if len(argv) > 4 else ''
+    print(f"Profile,Metric,HourlyPrice,MonthlyPrice  ({region})")
+    for (profile, metric), (hourly, monthly) in sorted(((index.regions.get(region) or {}).get('prices') or {}).items()):
+        if pattern in profile:
+            print(f"{profile},{metric},{hourly},{monthly}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    main(sys.argv)
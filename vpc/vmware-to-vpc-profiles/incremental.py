@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental re-processing of a new RVTools export against a previous result.
+
+VMs are keyed on the VM name (the first vInfo column; repeated names are
+numbered in row order), so a renamed VM shows up as removed + added.
+Added, removed and changed rows are found with index lookups and
+column-wise comparisons of the inputs (OS, CPUs, memory). When the previous
+result was built with the same context (catalog contents, OS rules, matching
+options), unchanged rows keep their computed columns and only added/changed
+rows go through match_profiles() and map_images(); otherwise every row is
+reprocessed and the delta still shows what moved.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from pipeline import (parse_workbook, match_profiles, map_images, summarize, savings_summary,
+                      display_columns, run_context, ConversionResult, VINFO_COLUMNS, _stage)
+from profile_matching import FIRST_FIT
+from rvtools import META_COLS
+
+# Metadata column that identifies a VM (the first vInfo column).
+KEY_COLUMNS = ('VM',)
+INPUT_COLS = list(VINFO_COLUMNS)
+
+# Change kinds in the delta table.
+ADDED, REMOVED, CHANGED, REPRICED = 'added', 'removed', 'changed', 'repriced'
+
+# Rows of the per-VM delta table rendered on the page (all are kept in Delta).
+MAX_DELTA_ROWS = 200
+
+# counts: one-row totals; changes: one row per added/removed/changed VM;
+# profiles: VMs and cost per instance profile before/after (changed only).
+Delta = namedtuple('Delta', ['counts', 'changes', 'profiles'])
+
+# ------------------------------------------------------------------------------
+# Row matching
+# ------------------------------------------------------------------------------
+def key_columns(df):
+    """
+    Identifying columns among the metadata columns (first column if none).
+    """
+    cols = [c for c in df.columns[:META_COLS] if str(c) in KEY_COLUMNS]
+    return cols or [df.columns[0]]
+
+
+def row_keys(df, cols):
+    """
+    MultiIndex of (key columns..., occurrence) so duplicated VM names still
+    pair up in row order.
+    """
+    arrays = [df[c].astype(object).where(df[c].notna(), '').astype(str).to_numpy() for c in cols]
+    occurrence = pd.DataFrame(dict(enumerate(arrays))).groupby(list(range(len(arrays))),
+                                                                sort=False).cumcount()
+    return pd.MultiIndex.from_arrays(arrays + [occurrence.to_numpy()])
+
+
+def _same(a, b):
+    """
+    Element-wise equality where missing == missing.
+    """
+    a, b = np.asarray(a, dtype=object), np.asarray(b, dtype=object)
+    na_a, na_b = pd.isna(a), pd.isna(b)
+    same = na_a & na_b
+    both = ~(na_a | na_b)
+    same[both] = a[both] == b[both]
+    return same
+
+
+def diff_rows(old, new, cols=None):
+    """
+    Pair new rows with old ones by key.
+
+    Returns (pos, changed, removed): pos[i] is the old position of new row i
+    (-1 when added); changed is {input column: bool array over new rows}
+    (False for added rows); removed holds old positions missing from new.
+    """
+    cols = cols or key_columns(new)
+    pos = row_keys(old, cols).get_indexer(row_keys(new, cols)) if all(c in old for c in cols) \
+        else np.full(len(new), -1)
+    matched = pos >= 0
+    changed = {}
+    for c in INPUT_COLS:
+        flags = np.zeros(len(new), dtype=bool)
+        flags[matched] = ~_same(new[c].to_numpy()[matched], old[c].to_numpy()[pos[matched]])
+        changed[c] = flags
+    removed = np.setdiff1d(np.arange(len(old)), pos[matched])
+    return pos, changed, removed
+
+
+def _splice(old_col, old_take, fresh_col, order):
+    """
+    Column of old_col[old_take] followed by fresh_col, reordered by `order`.
+    Categoricals stay categorical (categories unioned, sorted).
+    """
+    if isinstance(old_col.dtype, pd.CategoricalDtype) and isinstance(fresh_col.dtype, pd.CategoricalDtype):
+        values = pd.api.types.union_categoricals(
+            [old_col.array.take(old_take), fresh_col.array], sort_categories=True)
+        return values.take(order)
+    values = np.concatenate([old_col.to_numpy()[old_take], fresh_col.to_numpy()])
+    return values[order]
+
+# ------------------------------------------------------------------------------
+# Delta tables
+# ------------------------------------------------------------------------------
+def _by_profile(df):
+    grouped = df.groupby('Instance Profile', observed=True)
+    out = pd.DataFrame({'VMs': grouped.size(), 'Cost': grouped['VPC Price ($)'].sum()})
+    out.index = out.index.astype(object)
+    return out
+
+
+def delta_tables(old, new, pos, changed, removed, keys, reprocessed=None):
+    """
+    Delta(counts, changes, profiles) between an old and a new processed frame
+    (see diff_rows for pos/changed/removed; keys are the key columns shown).
+    """
+    matched = pos >= 0
+    old_pos = pos[matched]
+    old_profile = old['Instance Profile'].to_numpy(dtype=object)
+    old_price = old['VPC Price ($)'].to_numpy(dtype=float)
+    new_profile = new['Instance Profile'].to_numpy(dtype=object)
+    new_price = new['VPC Price ($)'].to_numpy(dtype=float)
+
+    inputs_changed = np.zeros(len(new), dtype=bool)
+    for flags in changed.values():
+        inputs_changed |= flags
+    moved = np.zeros(len(new), dtype=bool)
+    moved[matched] = ~(_same(new_profile[matched], old_profile[old_pos]) &
+                       _same(new_price[matched], old_price[old_pos]))
+
+    kind = np.full(len(new), '', dtype=object)
+    kind[~matched] = ADDED
+    kind[matched & moved & ~inputs_changed] = REPRICED
+    kind[inputs_changed] = CHANGED
+    rows = np.flatnonzero(kind != '')
+
+    fields = np.full(len(rows), '', dtype=object)
+    for c, flags in changed.items():
+        fields = np.where(flags[rows], np.where(fields == '', c, fields + ', ' + c), fields)
+
+    prev = pos[rows]
+    has_prev = prev >= 0
+    was_profile = np.full(len(rows), None, dtype=object)
+    was_price = np.full(len(rows), np.nan)
+    was_profile[has_prev] = old_profile[prev[has_prev]]
+    was_price[has_prev] = old_price[prev[has_prev]]
+
+    changes = pd.DataFrame({
+        'Change': kind[rows],
+        **{str(c): new[c].to_numpy(dtype=object)[rows] for c in keys},
+        'Changed': fields,
+        'Old Profile': was_profile,
+        'New Profile': new_profile[rows],
+        'Old Price ($)': was_price,
+        'New Price ($)': new_price[rows],
+    })
+    gone = pd.DataFrame({
+        'Change': REMOVED,
+        **{str(c): old[c].to_numpy(dtype=object)[removed] for c in keys},
+        'Changed': '',
+        'Old Profile': old_profile[removed],
+        'New Profile': None,
+        'Old Price ($)': old_price[removed],
+        'New Price ($)': np.nan,
+    })
+    changes = pd.concat([changes, gone], ignore_index=True) if len(gone) else changes
+    changes['Price Δ ($)'] = changes['New Price ($)'].fillna(0) - changes['Old Price ($)'].fillna(0)
+
+    before, after = _by_profile(old), _by_profile(new)
+    profiles = before.join(after, how='outer', lsuffix=' Before', rsuffix=' After').fillna(0)
+    profiles = pd.DataFrame({
+        'VMs Before': profiles['VMs Before'].astype(int),
+        'VMs After': profiles['VMs After'].astype(int),
+        'VMs Δ': (profiles['VMs After'] - profiles['VMs Before']).astype(int),
+        'Cost Before ($)': profiles['Cost Before'].round(2),
+        'Cost After ($)': profiles['Cost After'].round(2),
+        'Cost Δ ($)': (profiles['Cost After'] - profiles['Cost Before']).round(2),
+    }).rename_axis('Instance Profile')
+    profiles = profiles[(profiles['VMs Δ'] != 0) | (profiles['Cost Δ ($)'] != 0)]
+    profiles = (profiles.reset_index()
+                .sort_values(['Cost Δ ($)', 'VMs Δ'], key=abs, ascending=False, kind='stable'))
+
+    old_total, new_total = float(np.nansum(old_price)), float(np.nansum(new_price))
+    counts = pd.DataFrame([{
+        'VMs Before': len(old),
+        'VMs After': len(new),
+        'Added': int((kind == ADDED).sum()),
+        'Removed': len(removed),
+        'Changed': int((kind == CHANGED).sum()),
+        'Repriced': int((kind == REPRICED).sum()),
+        'Total Before ($)': round(old_total, 2),
+        'Total After ($)': round(new_total, 2),
+        'Total Δ ($)': round(new_total - old_total, 2),
+        'Reprocessed': len(new) if reprocessed is None else reprocessed,
+    }])
+    return Delta(counts, changes, profiles)
+
+# ------------------------------------------------------------------------------
+# Incremental pipeline
+# ------------------------------------------------------------------------------
+def run_incremental(source, previous, cat, on_stage=None, mode=FIRST_FIT, families=None):
+    """
+    run_pipeline() for a workbook that is a later export of `previous` (a
+    ConversionResult). Returns a ConversionResult whose delta holds the
+    Delta against previous; delta.counts 'Reprocessed' is the number of rows
+    that went through matching and image mapping again.
+    """
+    with _stage(on_stage, 'parse'):
+        df = parse_workbook(source)
+    context = run_context(cat, mode, families)
+    old = previous.df
+
+    with _stage(on_stage, 'match'):
+        keys = key_columns(df)
+        pos, changed, removed = diff_rows(old, df, keys)
+        # Same context → same computed columns for the same inputs.
+        reuse = pos >= 0 if previous.context == context else np.zeros(len(df), dtype=bool)
+        for flags in changed.values():
+            reuse &= ~flags
+        reused_rows, fresh_rows = np.flatnonzero(reuse), np.flatnonzero(~reuse)
+        fresh = match_profiles(df[INPUT_COLS].iloc[fresh_rows].copy(), cat, mode, families)
+
+    with _stage(on_stage, 'image-map'):
+        fresh = map_images(fresh, cat)
+        # Reused rows first, then fresh ones; `order` puts them back in row order.
+        order = np.empty(len(df), dtype=np.int64)
+        order[reused_rows] = np.arange(len(reused_rows))
+        order[fresh_rows] = len(reused_rows) + np.arange(len(fresh_rows))
+        for c in fresh.columns:
+            if c not in INPUT_COLS:
+                df[c] = _splice(old[c] if len(reused_rows) else fresh[c], pos[reused_rows], fresh[c], order)
+
+    with _stage(on_stage, 'summary'):
+        summary_df, image_summary, unmatched_df = summarize(df)
+        savings_df = savings_summary(df)
+        delta = delta_tables(old, df, pos, changed, removed, keys, reprocessed=len(fresh_rows))
+    return ConversionResult(df, summary_df, image_summary, unmatched_df, display_columns(df),
+                            savings_df, context, delta)
+
+
+def render_delta(delta, max_rows=MAX_DELTA_ROWS):
+    """
+    HTML fragments for the "Changes Since Previous Export" card.
+    """
+    money = lambda x: f"${x:,.2f}"
+    changes = delta.changes
+    return {
+        'delta_counts_table': delta.counts.to_html(classes='summary', index=False),
+        'delta_profiles_table': (delta.profiles.to_html(classes='summary', index=False, float_format=money)
+                                 if len(delta.profiles) else None),
+        'delta_changes_table': (changes.head(max_rows).to_html(classes='summary', index=False, na_rep='',
+                                                               float_format=money)
+                                if len(changes) else None),
+        'delta_changes_more': max(0, len(changes) - max_rows),
+    }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Background conversion jobs for large RVTools uploads.
+
+A JobManager runs pipeline.run_pipeline on a bounded thread pool. Submissions
+beyond workers + queue depth are rejected (QueueFull) instead of piling up,
+finished jobs are kept for `job_ttl` seconds so clients can poll them. With a
+ResultStore the processed result lives only there (bounded by its LRU); the
+job keeps its row count.
+The pipeline (pandas) is imported with the first job, not with this module.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import digest_bytes, cache_key, catalog_stamp, frame_nbytes
+
+
+DEFAULT_WORKERS = int(os.environ.get('CONVERTER_WORKERS', 4))
+DEFAULT_QUEUE_DEPTH = int(os.environ.get('CONVERTER_QUEUE_DEPTH', 16))
+DEFAULT_JOB_TTL = int(os.environ.get('CONVERTER_JOB_TTL', 3600))
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class QueueFull(Exception):
+    """Raised when every worker is busy and the queue is at capacity."""
+
+
+class Job:
+    def __init__(self, filename):
+        from pipeline import STAGES
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = QUEUED
+        self.stages = {s: {'status': 'pending', 'seconds': None} for s in STAGES}
+        self.error = None
+        self.result = None
+        self.rows = None
+        self.cached = False
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._stage_started = {}
+
+    def on_stage(self, stage, state):
+        with self._lock:
+            if state == 'running':
+                self._stage_started[stage] = time.time()
+            elif stage in self._stage_started:
+                self.stages[stage]['seconds'] = round(time.time() - self._stage_started[stage], 3)
+            self.stages[stage]['status'] = state
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'filename': self.filename,
+                'status': self.status,
+                'stages': {s: dict(v) for s, v in self.stages.items()},
+                'rows': self.rows,
+                'cached': self.cached,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Bounded pool of conversion workers sharing one VpcCatalog.
+    """
+
+    def __init__(self, catalog, workers=DEFAULT_WORKERS, queue_depth=DEFAULT_QUEUE_DEPTH,
+                 job_ttl=DEFAULT_JOB_TTL, results=None, cache=None, region='default'):
+        self.catalog = catalog
+        # Optional results.ResultStore; finished jobs are published under their job id.
+        self.results = results
+        # Optional result_cache.ResultCache shared with the upload route; region
+        # names the catalog in cache keys.
+        self.cache = cache
+        self.region = region
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='converter')
+        # Jobs admitted but not finished: running (<= workers) + waiting (<= queue_depth).
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, data, filename='', options=None, previous=None):
+        """
+        Queue a workbook (bytes) for conversion. options are passed to
+        run_pipeline (mode, families). With a previous ConversionResult the
+        workbook is diffed against it (incremental.run_incremental) and the
+        result cache is bypassed. Returns the Job.
+        Raises QueueFull when the pool is saturated.
+        """
+        self._expire()
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull("Converter queue is full, retry later")
+        job = Job(filename)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._executor.submit(self._run, job, data, options or {}, previous)
+        except Exception:
+            self._slots.release()
+            raise
+        logging.info(f"Job {job.id} queued ({filename}, {len(data)} bytes)")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def result(self, job):
+        """
+        ConversionResult of a finished job, or None once the result store has evicted it.
+        """
+        if self.results is None:
+            return job.result
+        return self.results.get(job.id)
+
+    def has_result(self, job):
+        """
+        True if result() would return the job's result (status polls do not keep it alive).
+        """
+        if self.results is None:
+            return job.result is not None
+        return job.id in self.results
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, data, options, previous=None):
+        from pipeline import run_pipeline
+        from incremental import run_incremental
+        try:
+            job.status = RUNNING
+            # Every job reads the same in-memory catalog (loaded once, shared).
+            cat = self.catalog.get()
+            key = cached = None
+            if previous is not None:
+                job.result = run_incremental(io.BytesIO(data), previous, cat, job.on_stage, **options)
+            elif self.cache is not None:
+                stamps = [catalog_stamp(self.region, cat)]
+                key = cache_key(digest_bytes(data), stamps, options)
+                cached = self.cache.get(key, stamps)
+            if cached is not None:
+                job.result, job.cached = cached[0], True
+                for stage in job.stages.values():
+                    stage.update(status=DONE, seconds=0.0)
+            elif previous is None:
+                job.result = run_pipeline(io.BytesIO(data), cat, job.on_stage, **options)
+                if key is not None:
+                    # Same value shape as the upload route: (result, region comparison).
+                    self.cache.put(key, (job.result, None), stamps, frame_nbytes(job.result.df))
+            job.rows = len(job.result.df)
+            if self.results is not None:
+                # The store's LRU bounds result memory; the job keeps only its row count.
+                self.results.put(job.result, result_id=job.id)
+                job.result = None
+            job.status = DONE
+            logging.info(f"Job {job.id} done: {job.rows} rows")
+        except Exception as e:
+            logging.exception(f"Job {job.id} failed")
+            for stage in job.stages.values():
+                if stage['status'] == 'running':
+                    stage['status'] = FAILED
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            self._slots.release()
+
+    def _expire(self):
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values()
+                           if j.finished_at and j.finished_at < cutoff]:
+                del self._jobs[job_id]
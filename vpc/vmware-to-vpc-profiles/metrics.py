@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timing spans and Prometheus metrics for the VMware → VPC converter.
+
+span() times a block, feeds a histogram and records the duration on the
+current request's span list, which the app turns into a Server-Timing header.
+Histograms are rendered in the Prometheus text format by render() for the
+/metrics endpoint (no client library needed).
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(2 ** p for p in range(16, 30, 2))            # 64 KiB … 256 MiB
+ROW_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_REGISTRY = []
+
+
+def _fmt(v):
+    return '+Inf' if v == float('inf') else repr(float(v))
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                    for k, v in pairs)
+    return '{' + body + '}'
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values → [bucket counts, sum, count]
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, [list(s[0]), s[1], s[2]]) for k, s in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _fmt(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return '\n'.join(lines)
+
+
+def render():
+    """
+    Every registered metric in the Prometheus text exposition format.
+    """
+    return '\n'.join(m.render() for m in _REGISTRY) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# ------------------------------------------------------------------------------
+# Converter metrics
+# ------------------------------------------------------------------------------
+STAGE_SECONDS = Histogram('converter_stage_seconds', 'Pipeline stage latency',
+                          labelnames=['stage'])
+VPC_API_SECONDS = Histogram('converter_vpc_api_seconds', 'VPC API call latency (per call/page)',
+                            labelnames=['call'])
+IMAGE_PAGES = Histogram('converter_vpc_image_pages', 'list_images pages per catalog fetch',
+                        buckets=PAGE_BUCKETS)
+UPLOAD_BYTES = Histogram('converter_upload_bytes', 'Uploaded workbook size',
+                         buckets=SIZE_BUCKETS, labelnames=['route'])
+ROWS = Histogram('converter_rows', 'vInfo rows per conversion', buckets=ROW_BUCKETS)
+
+# ------------------------------------------------------------------------------
+# Spans (Server-Timing)
+# ------------------------------------------------------------------------------
+_spans = contextvars.ContextVar('converter_spans', default=None)
+
+
+def start_spans():
+    """
+    Begin collecting spans for the current request/context; returns the list.
+    """
+    spans = []
+    _spans.set(spans)
+    return spans
+
+
+def add_span(name, seconds, desc=None):
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, seconds, desc))
+
+
+@contextmanager
+def span(name, histogram=None, desc=None, **labels):
+    """
+    Time a block: observed on `histogram` (with labels) and added to the
+    current span list.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if histogram is not None:
+            histogram.observe(elapsed, **labels)
+        add_span(name, elapsed, desc)
+
+
+def server_timing(spans):
+    """
+    Server-Timing header value: 'parse;dur=12.3, match;dur=1.0;desc="..."'.
+    """
+    parts = []
+    for name, seconds, desc in spans:
+        part = f"{name};dur={seconds * 1e3:.1f}"
+        if desc:
+            part += ';desc="{}"'.format(str(desc).replace('"', "'"))
+        parts.append(part)
+    return ', '.join(parts)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VMware OS label → VPC public image mapping for the VMware → VPC converter.
+
+Labels are resolved in three steps: the exact OS_TO_TARGET key, the same
+table keyed by normalized label (case, spacing, bitness spelling), then the
+ordered pattern rules of os_rules.json (family, version, bitness). Each
+distinct label is resolved once per process and the matching rule is kept.
+
+  python os_mapping.py "Microsoft Windows Server 2019 Datacenter (64 bit)"
+  cut -f9 vinfo.tsv | sort -u | python os_mapping.py      # one label per line
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+
+OS_RULES_PATH = os.environ.get(
+    'CONVERTER_OS_RULES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'os_rules.json'))
+# Distinct labels memoized per OsRules (cleared when exceeded).
+MAX_MEMO_LABELS = int(os.environ.get('CONVERTER_OS_MEMO', 10000))
+
+# Rule names reported for table hits.
+RULE_EXACT, RULE_NORMALIZED = 'exact', 'normalized'
+
+# ------------------------------------------------------------------------------
+# ONE-TO-ONE OS → TARGET FAMILY/MAJOR MAPPING (exact label match)
+# Each entry maps a VMware OS label (as in Excel col I) to a target:
+#   {'family': <vpc_family>, 'major': <int>, 'note': '...'}
+# For unsupported 32-bit, use {'unsupported': True, 'note': 'unsupported: 32-bit OS'}
+# ------------------------------------------------------------------------------
+OS_TO_TARGET = {
+    "CentOS 4/5 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS→CentOS 7"},
+    "CentOS 4/5/6 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS→CentOS 7"},
+    "CentOS 4/5/6/7 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS 7"},
+    "CentOS 6 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS→CentOS 7"},
+    "CentOS 7 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS→CentOS 7"},
+    "Debian GNU/Linux 6 (64-bit)": {"family": "debian", "major": 12, "note": "mapped: Debian 12"},
+    "Microsoft Windows 10 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Microsoft Windows 10 (64-bit)": {"family": "windows", "major": 2022, "note": "mapped: client→Windows 2022"},
+    "Microsoft Windows 11 (64-bit)": {"family": "windows", "major": 2022, "note": "mapped: client→Windows 2022"},
+    "Microsoft Windows 7 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Microsoft Windows NT": {"unsupported": True, "note": "unsupported: legacy OS"},
+    "Microsoft Windows Server 2003 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Microsoft Windows Server 2003 Standard (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Microsoft Windows Server 2003 Standard (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2003→2019"},
+    "Microsoft Windows Server 2003 Web Edition (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Microsoft Windows Server 2008 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Microsoft Windows Server 2008 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2008→2019"},
+    "Microsoft Windows Server 2008 R2 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2008 R2→2019"},
+    "Microsoft Windows Server 2012 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2012→2019"},
+    "Microsoft Windows Server 2012 R2 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2012 R2→2019"},
+    "Microsoft Windows Server 2016 (64-bit)": {"family": "windows", "major": 2016, "note": "mapped: 2016"},
+    "Microsoft Windows Server 2019 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2019"},
+    "Microsoft Windows Server 2022 (64-bit)": {"family": "windows", "major": 2022, "note": "mapped: 2022"},
+    "Microsoft Windows Server 2025 (64-bit)": {"family": "windows", "major": 2022, "note": "mapped: 2025→2022"},
+    "Microsoft Windows XP Professional (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Oracle Linux 4/5 (64-bit)": {"family": "redhat", "major": 9, "note": "mapped: Oracle→RHEL 9"},
+    "Oracle Linux 4/5/6 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: Oracle→RHEL 9"},
+    "Oracle Linux 6 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: Oracle→redhat 9"},
+    "Oracle Linux 7 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: Oracle→redhat 9"},
+    "Oracle Linux 8 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: Oracle→redhat 9"},
+    "Oracle Linux 9 (64-bit)": {"family": "redhat", "major": 9, "note": "mapped: Oracle→Rocky 9"},
+    "Other (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Other 2.6.x Linux (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Other 2.6.x Linux (64-bit)": {"family": "ubuntu", "major": 22, "note": "mapped: generic→Ubuntu 22.04 LTS"},
+    "Other Linux (64-bit)": {"family": "ubuntu", "major": 22, "note": "mapped: generic→Ubuntu 22.04 LTS"},
+    "Red Hat Enterprise Linux 4 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
+    "Red Hat Enterprise Linux 5 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: RHEL 5→RHEL 8"},
+    "Red Hat Enterprise Linux 6 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: RHEL 6→RHEL 8"},
+    "Rocky Linux (64-bit)": {"family": "rocky", "major": 9, "note": "mapped: Rocky 9"},
+    "SUSE Linux Enterprise 12 (64-bit)": {"family": "sles", "major": 12, "note": "mapped: SLES 12"},
+    "Ubuntu Linux (64-bit)": {"family": "ubuntu", "major": 22, "note": "mapped: Ubuntu 22.04 LTS"},
+}
+
+# ------------------------------------------------------------------------------
+# Mapping selection using the ONE-TO-ONE table
+# ------------------------------------------------------------------------------
+def _nearest_version_match(images_idx_family, target_major):
+    """
+    Find nearest major version available (bias upwards on ties).
+    """
+    if not images_idx_family:
+        return None, None
+    majors = sorted(images_idx_family.keys())
+    if target_major is None:
+        mv = majors[-1]
+        return mv, images_idx_family[mv][0]
+    best = None
+    best_dist = math.inf
+    for v in majors:
+        d = abs(v - target_major)
+        if d < best_dist or (d == best_dist and (best is None or v > best)):
+            best = v
+            best_dist = d
+    return best, images_idx_family[best][0] if best is not None else (None, None)
+
+def _select_image(fam, major, images_idx):
+    """
+    Pick an image for a normalized family/major. Returns (image_rec or None, how).
+    """
+    fam_idx = images_idx.get(fam)
+    if not fam_idx:
+        return None, f"no images for family '{fam}' in region"
+
+    # exact major first
+    if major in fam_idx and fam_idx[major]:
+        return fam_idx[major][0], "mapped exact"
+    # nearest major in same family
+    nearest_v, img = _nearest_version_match(fam_idx, major)
+    if img:
+        return img, f"mapped nearest ({nearest_v})"
+    return None, "no image match in family"
+
+def choose_image_for_target(target, images_idx):
+    """
+    Given a target {'family','major','note'} choose an image from images_idx.
+    Returns (image_rec or None, match_note).
+    """
+    fam = (target.get('family') or '').lower().strip()
+    img, how = _select_image(fam, target.get('major'), images_idx)
+    return img, f"{target.get('note', 'mapped')}; {how}"
+
+# ------------------------------------------------------------------------------
+# Label normalization and rules
+# ------------------------------------------------------------------------------
+_SPACES = re.compile(r'[\s_]+')
+# "(64 bit)", "64-bit", "64bit", "(64-Bit)" → "(64-bit)"
+_BITNESS = re.compile(r'\(?\b(32|64)[- ]?bit\b\)?')
+
+
+def normalize_label(os_label):
+    """
+    Case-folded label with collapsed whitespace and bitness as '(NN-bit)'.
+    """
+    text = _SPACES.sub(' ', str(os_label or '')).strip().casefold()
+    return _BITNESS.sub(lambda m: f"({m.group(1)}-bit)", text)
+
+
+class OsRules:
+    """
+    OS_TO_TARGET plus ordered fallback rules, compiled once.
+
+    resolve(label) → (target or None, rule name or None); memoized per label
+    so an export pays for the regexes once per distinct label, not per row.
+    """
+
+    def __init__(self, rules=(), table=None, digest=''):
+        self.table = OS_TO_TARGET if table is None else table
+        self.index = {normalize_label(k): v for k, v in self.table.items()}
+        self.rules = [dict(r, regex=re.compile(r['pattern'])) for r in rules]
+        self.digest = digest
+        self._memo = {}
+
+    @classmethod
+    def from_file(cls, path=OS_RULES_PATH, table=None):
+        with open(path, 'rb') as fh:
+            raw = fh.read()
+        table = OS_TO_TARGET if table is None else table
+        h = hashlib.sha256(raw)
+        h.update(json.dumps(table, sort_keys=True).encode('utf-8'))
+        return cls(json.loads(raw).get('rules', []), table, h.hexdigest()[:16])
+
+    def _apply(self, rule, match):
+        version = match.groupdict().get('version')
+        if rule.get('unsupported'):
+            return {'unsupported': True, 'note': rule.get('note', 'unsupported')}
+        major = rule.get('major')
+        if version:
+            major = rule.get('majors', {}).get(version, int(version))
+        note = rule.get('note', 'mapped').format(version=version or '', major=major)
+        return {'family': rule['family'], 'major': major, 'note': note}
+
+    def _lookup(self, os_label):
+        key = (os_label or "").strip()
+        if key in self.table:
+            return self.table[key], RULE_EXACT
+        norm = normalize_label(key)
+        if norm in self.index:
+            return self.index[norm], RULE_NORMALIZED
+        if norm:
+            for rule in self.rules:
+                m = rule['regex'].search(norm)
+                if m:
+                    return self._apply(rule, m), rule['name']
+        return None, None
+
+    def resolve(self, os_label):
+        try:
+            return self._memo[os_label]
+        except (KeyError, TypeError):
+            pass
+        out = self._lookup(os_label)
+        if len(self._memo) >= MAX_MEMO_LABELS:
+            self._memo.clear()
+        try:
+            self._memo[os_label] = out
+        except TypeError:
+            pass
+        return out
+
+
+_default_rules = None
+
+
+def default_rules():
+    """
+    OsRules from OS_RULES_PATH (loaded once; table-only if the file is missing).
+    """
+    global _default_rules
+    if _default_rules is None:
+        try:
+            _default_rules = OsRules.from_file(OS_RULES_PATH)
+        except FileNotFoundError:
+            _default_rules = OsRules()
+    return _default_rules
+
+
+def map_vmw_label_to_target(os_label, rules=None):
+    """
+    Label → target via OS_TO_TARGET (exact, then normalized) and the fallback
+    rules. If nothing matches, return None to mark as unmapped.
+    """
+    return (rules or default_rules()).resolve(os_label)[0]
+
+# ------------------------------------------------------------------------------
+# Per-label resolution (memoized against one image index)
+# ------------------------------------------------------------------------------
+# Columns produced for every row, in order.
+IMAGE_COLS = ['Target Family', 'Target Major', 'Image Name', 'Image ID', 'Image Match Note',
+              'OS Rule']
+
+class ImageResolver:
+    """
+    Resolves VMware OS labels to images against a fixed images_idx.
+
+    An export has tens of thousands of rows but only a few dozen distinct
+    labels, so results are memoized per label, and image selection per
+    (family, major). Build one per catalog load; the index must not change.
+    """
+
+    def __init__(self, images_idx, rules=None):
+        self.images_idx = images_idx
+        self.rules = rules or default_rules()
+        self._by_label = {}
+        self._by_target = {}
+
+    def _image_for(self, fam, major):
+        key = (fam, major)
+        if key not in self._by_target:
+            self._by_target[key] = _select_image(fam, major, self.images_idx)
+        return self._by_target[key]
+
+    def resolve(self, os_label):
+        """
+        Returns (target_family, target_major, image_name, image_id, match_note, rule).
+        """
+        if os_label in self._by_label:
+            return self._by_label[os_label]
+
+        target, rule = self.rules.resolve(os_label)
+        if not target:
+            # Strict behavior: no mapping configured
+            out = (None, None, None, None, "no mapping configured for label", None)
+        elif target.get('unsupported'):
+            out = (None, None, None, None, target.get('note', 'unsupported'), rule)
+        else:
+            fam = (target.get('family') or '').lower().strip()
+            img, how = self._image_for(fam, target.get('major'))
+            note = f"{target.get('note', 'mapped')}; {how}"
+            out = (target.get('family'), target.get('major'),
+                   img['name'] if img else None, img['id'] if img else None, note, rule)
+
+        self._by_label[os_label] = out
+        return out
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+def main():
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Show which mapping rule resolves each VMware OS label.")
+    parser.add_argument('labels', nargs='*', help="labels (default: one per line on stdin)")
+    parser.add_argument('--rules', default=OS_RULES_PATH, help="rules file (default: %(default)s)")
+    args = parser.parse_args()
+
+    rules = OsRules.from_file(args.rules)
+    labels = args.labels or [line.rstrip('\n') for line in sys.stdin if line.strip()]
+    for label in labels:
+        target, rule = rules.resolve(label)
+        if target is None:
+            print(f"{label}\t-\tno mapping configured for label")
+        elif target.get('unsupported'):
+            print(f"{label}\t{rule}\t{target.get('note', 'unsupported')}")
+        else:
+            print(f"{label}\t{rule}\t{target['family']} {target['major']}\t{target.get('note', '')}")
+
+
+if __name__ == '__main__':
+    main()
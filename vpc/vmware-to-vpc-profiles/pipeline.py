@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VMware → VPC conversion pipeline: parse → match → image-map → summary.
+
+Shared by the synchronous upload route and the background job workers. Each
+stage reports to an optional on_stage(stage, state) callback so callers can
+track progress; every stage is also timed into metrics.STAGE_SECONDS and
+the current request's Server-Timing spans.
+
+The processed frame is kept compact: text columns with few distinct values
+(OS, profile, image) are Categoricals built from small per-label tables,
+integer columns are downcast, and only the vInfo columns we use are read.
+"""
+
+import json
+from collections import namedtuple
+from contextlib import contextmanager
+from html import escape
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from os_mapping import IMAGE_COLS
+from profile_matching import round_memory_array, UNKNOWN_PROFILE, FIRST_FIT, CHEAPEST
+from rvtools import read_vinfo, CAT, INT, FLOAT
+
+STAGES = ('parse', 'match', 'image-map', 'summary')
+
+# ------------------------------------------------------------------------------
+# vInfo columns read from the workbook (0-based index, kind):
+#   OS name from Column I, CPUs from Column L, Memory from Column M (MB or GB)
+#   A blank OS cell is '' (the read_excel version showed 'nan'); both map to
+#   'no mapping configured for label'.
+# ------------------------------------------------------------------------------
+VINFO_COLUMNS = {
+    'Requested OS': (8, CAT),
+    'CPUs': (11, INT),
+    'Memory': (12, FLOAT),
+}
+
+# Computed columns shown after the leading vInfo metadata columns.
+RESULT_COLS = ['Requested OS', 'CPUs', 'Memory', 'Mem Rounded',
+               'Instance Profile', 'VPC Price ($)', 'First-Fit Profile', 'First-Fit Price ($)',
+               'Target Family', 'Target Major', 'Image Name', 'Image ID', 'Image Match Note', 'OS Rule']
+
+# Columns of the multi-region comparison table.
+REGION_COLS = ['Region', 'VMs', 'Profile Matched', 'Priced', 'Total Price ($)',
+               'Image Coverage (%)', 'Note']
+
+# context: what the computed columns depend on (see run_context); delta: an
+# incremental.Delta when the result was diffed against a previous one.
+ConversionResult = namedtuple(
+    'ConversionResult',
+    ['df', 'summary_df', 'image_summary', 'unmatched_df', 'display_cols', 'savings_df',
+     'context', 'delta'],
+    defaults=(None, None, None)
+)
+
+
+def _categorical(codes, labels):
+    """
+    Categorical of labels[codes] (code -1 → missing) with lexically ordered
+    categories, so sorting and groupby output match plain text columns. Only
+    the small label table is hashed; rows are mapped with one integer take.
+    """
+    label_codes, categories = pd.factorize(pd.Series(labels, dtype=object), sort=True)
+    label_codes = np.append(label_codes, -1)
+    return pd.Categorical.from_codes(label_codes[codes], categories=categories)
+
+
+def _downcast(values):
+    """
+    Smallest integer dtype that holds values (int8/int16/... ).
+    """
+    return pd.to_numeric(values, downcast='integer')
+
+
+@contextmanager
+def _stage(on_stage, name):
+    if on_stage:
+        on_stage(name, 'running')
+    with metrics.span(name, metrics.STAGE_SECONDS, stage=name):
+        yield
+    if on_stage:
+        on_stage(name, 'done')
+
+# ------------------------------------------------------------------------------
+# Stages
+# ------------------------------------------------------------------------------
+def parse_workbook(source):
+    """
+    Stream sheet 'vInfo' from a path or binary stream, keeping only the columns we use.
+    """
+    df = read_vinfo(source, VINFO_COLUMNS)
+    # Nullable: blank/non-numeric CPU cells stay missing and match "Unknown".
+    df['CPUs'] = _downcast(df['CPUs'])
+    return df
+
+
+def match_profiles(df, cat, mode=FIRST_FIT, families=None):
+    """
+    Add 'Mem Rounded', 'Instance Profile' and 'VPC Price ($)'.
+
+    mode 'first-fit' picks the first profile in (cpus, memory) order that fits;
+    'cheapest' picks the cheapest priced profile that fits and also records
+    the first-fit choice ('First-Fit Profile', 'First-Fit Price ($)') so the
+    savings can be shown. families optionally restricts the profile families
+    considered (e.g. ['bx2', 'cx2']).
+    """
+    index = cat.profile_index.subset(families)
+    df['Mem Rounded'] = _downcast(round_memory_array(df['Memory'].to_numpy(dtype=float)))
+    cpus, mem = df['CPUs'].to_numpy(dtype=float, na_value=np.nan), df['Mem Rounded'].to_numpy()
+
+    # Profiles and prices are looked up per profile position, not per row.
+    price_table = np.asarray([cat.prices.get(name, np.nan) for name in index.names], dtype=float)
+    first_fit = index.match_positions(cpus, mem)
+    if mode == CHEAPEST:
+        chosen = index.cheapest_positions(cpus, mem)
+        df['Instance Profile'] = _categorical(chosen, index.names)
+        df['First-Fit Profile'] = _categorical(first_fit, index.names)
+        df['First-Fit Price ($)'] = price_table[first_fit]
+    else:
+        chosen = first_fit
+        df['Instance Profile'] = _categorical(chosen, index.names)
+    df['VPC Price ($)'] = price_table[chosen]
+    return df
+
+
+def map_images(df, cat):
+    """
+    Map OS → image using strict one-to-one dictionary.
+    Each distinct label is resolved once (memoized on the catalog's
+    ImageResolver) and the result is broadcast back to rows by label code.
+    """
+    codes, labels = pd.factorize(df['Requested OS'])
+    # Missing labels get code -1 → point them at a trailing "unmapped" row.
+    codes = np.where(codes < 0, len(labels), codes)
+    resolved = [cat.image_resolver.resolve(label) for label in labels]
+    resolved.append(cat.image_resolver.resolve(None))
+
+    table = pd.DataFrame(resolved, columns=IMAGE_COLS)
+    mapped = pd.DataFrame({
+        c: (table[c].astype(float).to_numpy()[codes] if c == 'Target Major'
+            else _categorical(codes, table[c].to_numpy()))
+        for c in IMAGE_COLS
+    }, index=df.index)
+    return pd.concat([df, mapped], axis=1)
+
+
+def summarize(df):
+    """
+    Profile cost summary, image coverage and unmatched OS tables.
+    Returns (summary_df, image_summary, unmatched_df).
+    """
+    summary_df = df.groupby('Instance Profile', dropna=False, observed=True).agg(
+        Number_Listed=('Instance Profile', 'count'),
+        Total_Price=('VPC Price ($)', 'sum')
+    ).reset_index()
+    summary_df['Total_Price'] = summary_df['Total_Price'].apply(
+        lambda x: f"${x:.2f}" if pd.notna(x) else "$0.00"
+    )
+
+    image_summary = df.groupby(
+        ['Target Family', 'Target Major', 'Image Name'], dropna=False, observed=True
+    ).size().reset_index(name='Count').sort_values(['Target Family','Target Major','Image Name'])
+
+    unmatched_df = (df[df['Image ID'].isna()].groupby('Requested OS', observed=True)
+                    .size().reset_index(name='Count'))
+    # Summary tables are small: hand them out as plain text columns.
+    for table in (summary_df, image_summary, unmatched_df):
+        for c in table.columns:
+            if isinstance(table[c].dtype, pd.CategoricalDtype):
+                table[c] = table[c].astype(object)
+    return summary_df, image_summary, unmatched_df
+
+
+def savings_summary(df):
+    """
+    Cheapest-fit vs first-fit totals (None unless matched in 'cheapest' mode).
+    """
+    if 'First-Fit Profile' not in df.columns:
+        return None
+    first_fit_total = float(df['First-Fit Price ($)'].sum())
+    cheapest_total = float(df['VPC Price ($)'].sum())
+    saved = first_fit_total - cheapest_total
+    return pd.DataFrame([{
+        'First-Fit Total ($)': round(first_fit_total, 2),
+        'Cheapest Total ($)': round(cheapest_total, 2),
+        'Savings ($)': round(saved, 2),
+        'Savings (%)': round(100.0 * saved / first_fit_total, 1) if first_fit_total else 0.0,
+        'VMs Re-profiled': int((df['Instance Profile'] != df['First-Fit Profile']).sum()),
+    }])
+
+
+def display_columns(df):
+    """
+    Keep original columns visible (initial metadata cols 0..7) + our computed ones.
+    """
+    display_cols = []
+    for c in list(df.columns[:8]):
+        if c not in display_cols:
+            display_cols.append(c)
+    for c in RESULT_COLS:
+        if c in df.columns and c not in display_cols:
+            display_cols.append(c)
+    return display_cols
+
+# ------------------------------------------------------------------------------
+# Full pipeline
+# ------------------------------------------------------------------------------
+def run_context(cat, mode=FIRST_FIT, families=None):
+    """
+    (catalog contents, OS rules, mode, families): two results with the same
+    context compute identical columns for identical vInfo inputs.
+    """
+    from vpc_catalog import catalog_digest
+    return (catalog_digest(cat), cat.image_resolver.rules.digest, mode,
+            tuple(sorted(f.strip().lower() for f in families or () if f.strip())))
+
+
+def run_pipeline(source, cat, on_stage=None, mode=FIRST_FIT, families=None):
+    """
+    Run every stage on a workbook (path or binary stream) against the catalog
+    data `cat` (a vpc_catalog.CatalogData). mode/families are passed to
+    match_profiles(). Returns a ConversionResult.
+    """
+    with _stage(on_stage, 'parse'):
+        df = parse_workbook(source)
+    metrics.ROWS.observe(len(df))
+    with _stage(on_stage, 'match'):
+        df = match_profiles(df, cat, mode, families)
+    with _stage(on_stage, 'image-map'):
+        df = map_images(df, cat)
+    with _stage(on_stage, 'summary'):
+        summary_df, image_summary, unmatched_df = summarize(df)
+        savings_df = savings_summary(df)
+    return ConversionResult(df, summary_df, image_summary, unmatched_df, display_columns(df),
+                            savings_df, run_context(cat, mode, families))
+
+
+def compare_regions(df, region_data, mode=FIRST_FIT, families=None):
+    """
+    Match an already-parsed frame against several regions' catalogs.
+
+    region_data: { region: CatalogData or Exception } (see regions.RegionCatalogs.fetch).
+    Returns (region_summary, profile_costs): one row per region with cost and
+    image coverage, and total price per instance profile side by side.
+    """
+    base = df[list(VINFO_COLUMNS)].copy()
+    rows = []
+    costs = {}
+    for region, cat in region_data.items():
+        if isinstance(cat, Exception):
+            rows.append({'Region': region, 'VMs': len(base), 'Note': f"catalog unavailable: {cat}"})
+            continue
+        rdf = map_images(match_profiles(base.copy(), cat, mode, families), cat)
+        matched = rdf['Instance Profile'] != UNKNOWN_PROFILE
+        rows.append({
+            'Region': region,
+            'VMs': len(rdf),
+            'Profile Matched': int(matched.sum()),
+            'Priced': int(rdf['VPC Price ($)'].notna().sum()),
+            'Total Price ($)': round(float(rdf['VPC Price ($)'].sum()), 2),
+            'Image Coverage (%)': round(100.0 * rdf['Image ID'].notna().mean(), 1) if len(rdf) else 0.0,
+            'Note': '',
+        })
+        costs[region] = rdf.groupby('Instance Profile', observed=True)['VPC Price ($)'].sum(min_count=1)
+
+    region_summary = pd.DataFrame(rows, columns=REGION_COLS).astype(
+        {'Profile Matched': 'Int64', 'Priced': 'Int64'}
+    )
+    profile_costs = pd.DataFrame(costs).rename_axis('Instance Profile').reset_index() if costs else None
+    return region_summary, profile_costs
+
+
+def render_tables(result):
+    """
+    HTML fragments for the summary cards of PAGE_TMPL (unmatched_table is None
+    when every row mapped, savings_table unless matched in 'cheapest' mode,
+    delta_* only for incremental results). The full data table is served
+    page by page.
+    """
+    unmatched_df = result.unmatched_df
+    delta = {}
+    if result.delta is not None:
+        from incremental import render_delta
+        delta = render_delta(result.delta)
+    return {
+        **delta,
+        'summary_table': result.summary_df.to_html(classes='summary', index=False, escape=False),
+        'image_table': result.image_summary.to_html(classes='images', index=False, escape=False),
+        'unmatched_table': (unmatched_df.to_html(classes='unmatched', index=False, escape=False)
+                            if len(unmatched_df) else None),
+        'savings_table': (result.savings_df.to_html(classes='summary', index=False)
+                          if result.savings_df is not None else None),
+    }
+
+
+def _cell_text(v):
+    # Same text the page's script shows for a /rows JSON value.
+    if v is None:
+        return ''
+    if isinstance(v, bool):
+        return 'true' if v else 'false'
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def iter_table_rows(result, limit=None, chunk_rows=100):
+    """
+    Yield the first `limit` rows (all when None) of the display columns as
+    HTML <tr> chunks of chunk_rows rows, so a page can stream the data table
+    without building it in one string.
+    """
+    df = result.df[result.display_cols]
+    stop = len(df) if limit is None else min(limit, len(df))
+    for start in range(0, stop, chunk_rows):
+        chunk = df.iloc[start:min(start + chunk_rows, stop)]
+        # to_json handles NaN → null and numpy scalars in one pass.
+        rows = json.loads(chunk.to_json(orient='values', date_format='iso'))
+        yield ''.join('<tr>' + ''.join(f"<td>{escape(_cell_text(v))}</td>" for v in row) + '</tr>\n'
+                      for row in rows)
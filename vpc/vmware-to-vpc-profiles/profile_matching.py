@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory rounding and instance-profile matching for the VMware → VPC converter.
+
+The scalar helpers (round_memory, find_best_match, find_cheapest_match) define
+the semantics; the vectorized versions (round_memory_array, ProfileIndex) give
+identical results over whole columns without a Python call per row.
+numpy is imported on first vectorized use, so importing the scalar helpers
+and constants costs next to nothing.
+"""
+
+# VMware memory (MB) thresholds → rounded VPC profile GB steps.
+MEM_THRESHOLDS = [128, 1024, 2048, 4096, 6136, 8192, 12288, 16384, 24576, 32768]
+MEM_ROUNDED = [0, 1, 2, 4, 6, 8, 12, 16, 24, 32]
+MEM_ROUNDED_MAX = 32
+
+UNKNOWN_PROFILE = "Unknown"
+
+# Profile selection modes
+FIRST_FIT, CHEAPEST = 'first-fit', 'cheapest'
+
+# ------------------------------------------------------------------------------
+# Scalar reference implementation
+# ------------------------------------------------------------------------------
+def round_memory(mem):
+    """
+    VMware memory (MB?) → rounded VPC profile GB steps (as per original logic).
+    Adjust if your input is already in GB.
+    """
+    try:
+        val = float(mem)
+    except (TypeError, ValueError):
+        val = 0.0
+    for i, t in enumerate(MEM_THRESHOLDS):
+        if val <= t:
+            return MEM_ROUNDED[i]
+    return MEM_ROUNDED_MAX
+
+
+def find_best_match(cpus, mem_rounded, profiles_list):
+    """
+    First profile with CPUs >= requested and Memory >= requested (both rounded).
+    """
+    for pcpu, pmem, pname in profiles_list:
+        if pcpu >= cpus and pmem >= mem_rounded:
+            return pname
+    return UNKNOWN_PROFILE
+
+# ------------------------------------------------------------------------------
+# Vectorized implementation
+# ------------------------------------------------------------------------------
+def round_memory_array(mem):
+    """
+    round_memory over an array of memory values; returns an int64 array.
+    """
+    import numpy as np
+    thresholds = np.asarray(MEM_THRESHOLDS, dtype=float)
+    # One extra slot for values above the last threshold (and NaN, which never
+    # compares <= any threshold in round_memory).
+    rounded = np.asarray(MEM_ROUNDED + [MEM_ROUNDED_MAX], dtype=np.int64)
+    vals = np.asarray(mem, dtype=float)
+    # side='left' → first threshold t with val <= t, same as the scalar loop.
+    pos = np.searchsorted(thresholds, vals, side='left')
+    pos[np.isnan(vals)] = len(MEM_THRESHOLDS)
+    return rounded[pos]
+
+
+class ProfileIndex:
+    """
+    First-fit (and cheapest-fit) lookup tables built once from a sorted profiles_list.
+
+    profiles_list is ordered by (cpus, memory, name), so the profiles with
+    enough CPUs for a request form a suffix of the list. For every distinct
+    profile CPU count (the suffix start) and every distinct profile memory
+    size, table[r, k] holds the position of the first profile in that suffix
+    with at least that much memory. A request (cpus, mem) then resolves with
+    two searchsorted calls and one fancy-index, exactly like find_best_match.
+
+    With prices, match_cheapest() answers "cheapest profile with enough CPUs
+    and memory" from a second table of the same shape, built over the
+    CPU/memory/price Pareto frontier.
+    """
+
+    def __init__(self, profiles_list, prices=None):
+        import numpy as np
+        self.profiles_list = list(profiles_list)
+        self.prices = prices or {}
+        n = len(self.profiles_list)
+        pcpu = np.asarray([p[0] for p in self.profiles_list], dtype=float)
+        pmem = np.asarray([p[1] for p in self.profiles_list], dtype=float)
+        self._pcpu, self._pmem = pcpu, pmem
+        # Built on first use: cheapest-fit table and per-family subsets.
+        self._cheapest_table = None
+        self._subsets = {}
+
+        # Position n is the "Unknown" sentinel.
+        self.names = np.asarray([p[2] for p in self.profiles_list] + [UNKNOWN_PROFILE], dtype=object)
+        self.cpu_steps = np.unique(pcpu)
+        self.mem_steps = np.unique(pmem)
+
+        # Extra row/column: requests above the largest CPU count / memory size.
+        table = np.full((len(self.cpu_steps) + 1, len(self.mem_steps) + 1), n, dtype=np.int64)
+        for r, c in enumerate(self.cpu_steps):
+            start = int(np.searchsorted(pcpu, c, side='left'))
+            suffix = pmem[start:]
+            for k, m in enumerate(self.mem_steps):
+                hits = np.flatnonzero(suffix >= m)
+                if len(hits):
+                    table[r, k] = start + hits[0]
+        self.table = table
+
+    def __len__(self):
+        return len(self.profiles_list)
+
+    def match_positions(self, cpus, mem_rounded):
+        """
+        Positions into profiles_list (len(profiles_list) means no match).
+        """
+        import numpy as np
+        c = np.asarray(cpus, dtype=float)
+        m = np.asarray(mem_rounded, dtype=float)
+        r = np.searchsorted(self.cpu_steps, c, side='left')
+        k = np.searchsorted(self.mem_steps, m, side='left')
+        return self.table[r, k]
+
+    def match(self, cpus, mem_rounded):
+        """
+        find_best_match over arrays of CPUs and rounded memory; returns an
+        object array of profile names ("Unknown" where nothing fits).
+        """
+        return self.names[self.match_positions(cpus, mem_rounded)]
+
+    # -- family allow-lists ----------------------------------------------------
+    def subset(self, families):
+        """
+        ProfileIndex restricted to profile families (e.g. ['bx2', 'cx2']);
+        memoized per allow-list. Empty/None → self.
+        """
+        if not families:
+            return self
+        key = frozenset(f.strip().lower() for f in families if f.strip())
+        if key not in self._subsets:
+            kept = [p for p in self.profiles_list if profile_family(p[2]) in key]
+            self._subsets[key] = ProfileIndex(kept, self.prices)
+        return self._subsets[key]
+
+    # -- cheapest fit ----------------------------------------------------------
+    def pareto_positions(self):
+        """
+        Positions of priced profiles not dominated by another profile that has
+        at least as many CPUs and as much memory for no more money. Only these
+        can ever be the cheapest fit. Ordered by (price, list position).
+        """
+        priced = [i for i, p in enumerate(self.profiles_list) if p[2] in self.prices]
+        priced.sort(key=lambda i: (self.prices[self.profiles_list[i][2]], i))
+        frontier = []
+        for i in priced:
+            c, m = self._pcpu[i], self._pmem[i]
+            if not any(self._pcpu[j] >= c and self._pmem[j] >= m for j in frontier):
+                frontier.append(i)
+        return frontier
+
+    def _build_cheapest(self):
+        import numpy as np
+        front = np.asarray(self.pareto_positions(), dtype=np.int64)
+        # Fall back to first-fit where no priced profile fits.
+        table = self.table.copy()
+        if len(front):
+            fcpu, fmem = self._pcpu[front], self._pmem[front]
+            fits = ((fcpu[None, None, :] >= self.cpu_steps[:, None, None]) &
+                    (fmem[None, None, :] >= self.mem_steps[None, :, None]))
+            # front is already ordered cheapest-first, so the first fitting
+            # entry along the last axis is the answer for each cell.
+            first = np.argmax(fits, axis=2)
+            has = fits.any(axis=2)
+            cells = table[:len(self.cpu_steps), :len(self.mem_steps)]
+            cells[has] = front[first[has]]
+        self._cheapest_table = table
+        return table
+
+    def cheapest_positions(self, cpus, mem_rounded):
+        """
+        Positions into profiles_list for match_cheapest().
+        """
+        import numpy as np
+        table = self._cheapest_table if self._cheapest_table is not None else self._build_cheapest()
+        c = np.asarray(cpus, dtype=float)
+        m = np.asarray(mem_rounded, dtype=float)
+        r = np.searchsorted(self.cpu_steps, c, side='left')
+        k = np.searchsorted(self.mem_steps, m, side='left')
+        return table[r, k]
+
+    def match_cheapest(self, cpus, mem_rounded):
+        """
+        Cheapest priced profile with CPUs >= requested and Memory >= requested
+        (ties → first in list order); first-fit where nothing priced fits.
+        """
+        return self.names[self.cheapest_positions(cpus, mem_rounded)]
+
+
+def profile_family(name):
+    """
+    'bx2-4x16' → 'bx2'
+    """
+    return (name or '').split('-', 1)[0].lower()
+
+
+def find_cheapest_match(cpus, mem_rounded, profiles_list, prices):
+    """
+    Scalar reference for ProfileIndex.match_cheapest.
+    """
+    best = None
+    for pcpu, pmem, pname in profiles_list:
+        if pcpu >= cpus and pmem >= mem_rounded and pname in prices:
+            if best is None or prices[pname] < prices[best]:
+                best = pname
+    return best if best is not None else find_best_match(cpus, mem_rounded, profiles_list)
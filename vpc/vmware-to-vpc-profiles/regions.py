@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-region VPC catalogs for side-by-side quoting.
+
+RegionCatalogs keeps one VpcCatalog per region. Each region has its own VpcV1
+client, so its HTTP session and connection pool are reused across fetches and
+refreshes. fetch() loads the requested regions concurrently, so wall time
+tracks the slowest region rather than the sum.
+"""
+
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from vpc_catalog import VpcCatalog, DEFAULT_TTL
+
+VPC_REGIONS = ['us-south', 'us-east', 'ca-tor', 'br-sao', 'eu-gb', 'eu-de', 'eu-es',
+               'jp-tok', 'jp-osa', 'au-syd']
+
+DEFAULT_REGION_WORKERS = int(os.environ.get('CONVERTER_REGION_WORKERS', 8))
+
+
+def region_url(region):
+    return f"https://{region}.iaas.cloud.ibm.com/v1"
+
+
+def region_from_url(url, default='us-south'):
+    m = re.match(r'https?://([a-z]+-[a-z]+)\.', url or '')
+    return m.group(1) if m else default
+
+
+class RegionCatalogs:
+    """
+    One VpcCatalog per region, created on first use.
+
+    service_factory(region) must return a configured VpcV1 client for that
+    region (typically sharing one IAMAuthenticator, so the IAM token is
+    fetched once for all regions). loader_factory(region), if given, returns
+    the VpcCatalog loader for that region (e.g. a snapshot loader).
+    """
+
+    def __init__(self, service_factory, ttl=DEFAULT_TTL, workers=DEFAULT_REGION_WORKERS,
+                 loader_factory=None):
+        self.service_factory = service_factory
+        self.ttl = ttl
+        self.workers = workers
+        self.loader_factory = loader_factory
+        self._catalogs = {}
+        self._lock = threading.Lock()
+
+    def add(self, region, catalog):
+        """
+        Register an existing catalog (e.g. the app's default region).
+        """
+        with self._lock:
+            self._catalogs[region] = catalog
+
+    def catalog(self, region):
+        with self._lock:
+            if region not in self._catalogs:
+                kwargs = {'loader': self.loader_factory(region)} if self.loader_factory else {}
+                self._catalogs[region] = VpcCatalog(self.service_factory(region), ttl=self.ttl,
+                                                    **kwargs)
+            return self._catalogs[region]
+
+    def fetch(self, regions):
+        """
+        Return {region: CatalogData or Exception}, loading regions concurrently.
+        """
+        regions = list(dict.fromkeys(regions))
+        started = time.time()
+
+        def load(region):
+            try:
+                return self.catalog(region).get()
+            except Exception as e:
+                logging.error(f"Catalog for {region} unavailable: {e}")
+                return e
+
+        # Each task runs in a copy of the caller's context, so API timing
+        # spans recorded in the pool land on the request's Server-Timing list.
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(regions)))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, load, r) for r in regions]
+            loaded = dict(zip(regions, (f.result() for f in futures)))
+        logging.info(f"Catalogs for {len(regions)} regions ready in {time.time() - started:.2f}s")
+        return loaded
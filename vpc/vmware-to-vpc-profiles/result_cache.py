@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache of conversion results for repeated uploads.
+
+Entries are keyed by the SHA-256 of the uploaded workbook, the catalogs it was
+matched against (region + fetch time) and the matching options, so an
+identical re-upload is served without parsing or matching again. A catalog
+refresh changes its fetch time, so older entries stop matching and are purged
+as soon as a result for the refreshed catalog is cached.
+
+The memory tier is an LRU bounded by the frames' size in bytes; an optional
+disk tier (one directory per entry, also LRU by size) survives restarts and
+can be shared by workers on the same host. Disk entries hold the DataFrames
+as parquet files and everything else as JSON, never pickles, so a writable
+cache directory cannot inject code into the web process. It needs pyarrow.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_MB = int(os.environ.get('CONVERTER_CACHE_MB', 256))
+DEFAULT_CACHE_DIR = os.environ.get('CONVERTER_CACHE_DIR')
+DEFAULT_CACHE_DISK_MB = int(os.environ.get('CONVERTER_CACHE_DISK_MB', 1024))
+
+_CHUNK = 1 << 20
+
+# Disk entry layout: <disk_dir>/<key>/meta.json + <n>.parquet per DataFrame.
+_META = 'meta.json'
+
+
+def digest_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def digest_stream(stream):
+    """
+    SHA-256 of a seekable binary stream, read in chunks; rewinds it afterwards.
+    """
+    h = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(_CHUNK), b''):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+def catalog_stamp(region, data):
+    """
+    Identity of one catalog fetch. The fetch time (not the per-process
+    version counter) is used so workers sharing a snapshot agree on it; the
+    OS rules digest invalidates cached results when the mapping changes.
+    """
+    return f"{region}@{data.fetched_at:.6f}#{data.image_resolver.rules.digest}"
+
+
+def cache_key(digest, stamps, options):
+    """
+    Key for (workbook digest, catalog stamps, matching options).
+    """
+    families = options.get('families') or ()
+    parts = [digest, *stamps, options.get('mode') or '', ','.join(sorted(f.lower() for f in families))]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def frame_nbytes(*frames):
+    """
+    Approximate memory held by DataFrames (object columns included).
+    """
+    total = 0
+    for df in frames:
+        if df is not None:
+            total += int(df.memory_usage(index=True, deep=True).sum())
+    return total
+
+
+class ResultCache:
+    """
+    Size-bounded LRU of cached values (memory, plus disk when disk_dir is set).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_MB << 20, disk_dir=DEFAULT_CACHE_DIR,
+                 disk_max_bytes=DEFAULT_CACHE_DISK_MB << 20):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key → (value, nbytes, stamps)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        self._swept = None  # stamps the disk tier was last purged against
+        if disk_dir:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logging.warning("Result cache: disk tier needs pyarrow (pip install pyarrow); memory only")
+                self.disk_dir = disk_dir = None
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, stamps=None):
+        """
+        Cached value for key, or None. With stamps (the current
+        catalog_stamp()s), entries built from older fetches are dropped first.
+        """
+        if stamps is not None:
+            self._drop_stale(tuple(stamps))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        stored = self._disk_get(key)
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            value, stamps, nbytes = stored
+            self._insert(key, value, nbytes, stamps)
+            return value
+
+    def put(self, key, value, stamps=(), nbytes=0):
+        """
+        Cache value under key. stamps are the catalog_stamp()s it was built
+        from: entries built from an older fetch of the same region are dropped.
+        """
+        stamps = tuple(stamps)
+        self._drop_stale(stamps)
+        with self._lock:
+            self._insert(key, value, nbytes, stamps)
+        self._disk_put(key, value, stamps, nbytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _insert(self, key, value, nbytes, stamps):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (value, nbytes, stamps)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            self._bytes -= self._entries.popitem(last=False)[1][1]
+
+    def _drop_stale(self, stamps):
+        with self._lock:
+            stale = [k for k, (_, _, old) in self._entries.items() if _is_stale(old, stamps)]
+            for k in stale:
+                self._bytes -= self._entries.pop(k)[1]
+            sweep = self.disk_dir and stamps and stamps != self._swept
+            if sweep:
+                self._swept = stamps
+        for k in stale:
+            self._disk_remove(k)
+        if sweep:
+            # Once per new set of stamps: also entries written by other workers or runs.
+            stale += self._disk_drop_stale(stamps)
+        if stale:
+            logging.info(f"Result cache: dropped {len(stale)} entries for refreshed catalogs")
+
+    # -- disk tier -------------------------------------------------------------
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key)
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, _META), encoding='utf-8') as fh:
+                meta = json.load(fh)
+            value = _decode(meta['value'], lambda i: _read_frame(os.path.join(path, f"{i}.parquet"),
+                                                                  meta['types'][i]))
+            os.utime(os.path.join(path, _META))  # LRU by mtime
+            return value, tuple(meta['stamps']), meta['nbytes']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Result cache: unreadable entry {path}: {e}")
+            self._disk_remove(key)
+            return None
+
+    def _disk_put(self, key, value, stamps, nbytes):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp)
+            frames = []
+            meta = {'stamps': list(stamps), 'nbytes': nbytes, 'value': _encode(value, frames)}
+            meta['types'] = [_column_types(df) for df in frames]
+            for i, df in enumerate(frames):
+                df.to_parquet(os.path.join(tmp, f"{i}.parquet"), engine='pyarrow')
+            with open(os.path.join(tmp, _META), 'w', encoding='utf-8') as fh:
+                json.dump(meta, fh)
+            self._disk_remove(key)
+            os.rename(tmp, path)  # atomic: readers never see a partial entry
+        except Exception as e:
+            logging.warning(f"Result cache: could not write {path}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self._disk_evict()
+
+    def _disk_remove(self, key):
+        if self.disk_dir:
+            shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def _disk_entries(self):
+        """
+        [(key, meta mtime, bytes)] of complete disk entries; anything else
+        that is not an in-progress write (e.g. old pickle files) is removed.
+        """
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.tmp'):
+                continue
+            if not entry.is_dir():
+                _remove(entry.path)
+                continue
+            try:
+                files = list(os.scandir(entry.path))
+                mtime = os.stat(os.path.join(entry.path, _META)).st_mtime
+            except FileNotFoundError:
+                continue
+            entries.append((entry.name, mtime, sum(f.stat().st_size for f in files)))
+        return entries
+
+    def _disk_drop_stale(self, stamps):
+        stale = []
+        for key, _, _ in self._disk_entries():
+            try:
+                with open(os.path.join(self._path(key), _META), encoding='utf-8') as fh:
+                    old = json.load(fh)['stamps']
+            except (OSError, ValueError, KeyError):
+                continue
+            if _is_stale(old, stamps):
+                self._disk_remove(key)
+                stale.append(key)
+        return stale
+
+    def _disk_evict(self):
+        entries = self._disk_entries()
+        total = sum(size for _, _, size in entries)
+        for key, _, size in sorted(entries, key=lambda e: e[1]):
+            if total <= self.disk_max_bytes:
+                break
+            self._disk_remove(key)
+            total -= size
+
+
+def _is_stale(old, stamps):
+    """
+    True if any stamp in old is an older fetch of a region present in stamps.
+    """
+    current = dict(s.rsplit('@', 1) for s in stamps)
+    for s in old:
+        region, fetched = s.rsplit('@', 1)
+        if current.get(region, fetched) != fetched:
+            return True
+    return False
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# ------------------------------------------------------------------------------
+# Disk encoding: DataFrames → parquet files, the rest → JSON
+# ------------------------------------------------------------------------------
+def _record_types():
+    from incremental import Delta
+    from pipeline import ConversionResult
+    return {t.__name__: t for t in (ConversionResult, Delta)}
+
+
+def _encode(value, frames):
+    """
+    JSON-able form of value; DataFrames are appended to frames and referenced by position.
+    """
+    import pandas as pd
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, pd.DataFrame):
+        frames.append(value)
+        return {'frame': len(frames) - 1}
+    if isinstance(value, tuple) and type(value).__name__ in _record_types():
+        return {'record': type(value).__name__, 'fields': [_encode(v, frames) for v in value]}
+    if isinstance(value, (list, tuple)):
+        return {type(value).__name__: [_encode(v, frames) for v in value]}
+    raise TypeError(f"cannot cache a {type(value).__name__}")
+
+
+def _decode(node, read_frame):
+    if not isinstance(node, dict):
+        return node
+    if 'frame' in node:
+        return read_frame(node['frame'])
+    if 'record' in node:
+        return _record_types()[node['record']](*(_decode(v, read_frame) for v in node['fields']))
+    if 'tuple' in node:
+        return tuple(_decode(v, read_frame) for v in node['tuple'])
+    return [_decode(v, read_frame) for v in node['list']]
+
+
+def _column_types(df):
+    """
+    {column: 'none' | 'nan' | 'category'} for the columns parquet does not
+    round-trip: object columns (by the missing value they hold; they come
+    back as strings with NaN and None merged) and categoricals (all-missing
+    ones come back as object).
+    """
+    import pandas as pd
+    out = {}
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            out[str(c)] = 'category'
+        elif df[c].dtype == object:
+            values = df[c].to_numpy()
+            missing = values[pd.isna(values)]
+            out[str(c)] = 'none' if len(missing) and missing[0] is None else 'nan'
+    return out
+
+
+def _read_frame(path, types):
+    import numpy as np
+    import pandas as pd
+    df = pd.read_parquet(path, engine='pyarrow')
+    for c, kind in types.items():
+        if kind == 'category':
+            if not isinstance(df[c].dtype, pd.CategoricalDtype):
+                df[c] = df[c].astype('category')
+            continue
+        values = df[c].astype(object)
+        df[c] = values.where(values.notna(), None if kind == 'none' else np.nan)
+    return df
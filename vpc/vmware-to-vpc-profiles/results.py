@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server-side store for processed conversion results.
+
+Results are kept in memory under a result id (bounded LRU + TTL) so the page
+only ships the summary tables, and the full processed frame is served in
+pages through query_rows().
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+DEFAULT_MAX_RESULTS = int(os.environ.get('CONVERTER_RESULTS_MAX', 32))
+DEFAULT_RESULT_TTL = int(os.environ.get('CONVERTER_RESULT_TTL', 3600))
+
+DEFAULT_PER_PAGE = 100
+MAX_PER_PAGE = 1000
+
+# Query-string filter name → column (case-insensitive substring match).
+FILTERS = {
+    'profile': 'Instance Profile',
+    'note': 'Image Match Note',
+    'os': 'Requested OS',
+    'rule': 'OS Rule',
+}
+
+
+class _Entry:
+    def __init__(self, result):
+        self.result = result
+        self.touched = time.time()
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def order(self, column, ascending):
+        """
+        Row positions sorted by column, computed once per (column, direction).
+        """
+        key = (column, ascending)
+        with self._lock:
+            if key not in self._orders:
+                col = self.result.df[column]
+                try:
+                    idx = col.sort_values(ascending=ascending, kind='stable', na_position='last').index
+                except TypeError:
+                    # Mixed types in a raw vInfo column: sort on the text form.
+                    idx = col.astype(str).sort_values(ascending=ascending, kind='stable').index
+                self._orders[key] = self.result.df.index.get_indexer(idx)
+            return self._orders[key]
+
+
+class ResultStore:
+    """
+    Thread-safe LRU of ConversionResult objects keyed by result id.
+    """
+
+    def __init__(self, max_results=DEFAULT_MAX_RESULTS, ttl=DEFAULT_RESULT_TTL):
+        self.max_results = max_results
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result, result_id=None):
+        result_id = result_id or uuid.uuid4().hex
+        with self._lock:
+            self._entries[result_id] = _Entry(result)
+            self._entries.move_to_end(result_id)
+            self._evict()
+        return result_id
+
+    def get(self, result_id):
+        entry = self._entry(result_id)
+        return entry.result if entry else None
+
+    def __contains__(self, result_id):
+        """
+        True if result_id is stored and not expired (does not refresh it).
+        """
+        with self._lock:
+            entry = self._entries.get(result_id)
+            return entry is not None and time.time() - entry.touched <= self.ttl
+
+    def _entry(self, result_id):
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            if time.time() - entry.touched > self.ttl:
+                del self._entries[result_id]
+                return None
+            entry.touched = time.time()
+            self._entries.move_to_end(result_id)
+            return entry
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        for rid in [rid for rid, e in self._entries.items() if e.touched < cutoff]:
+            del self._entries[rid]
+        while len(self._entries) > self.max_results:
+            self._entries.popitem(last=False)
+
+    def query_rows(self, result_id, page=1, per_page=DEFAULT_PER_PAGE, sort=None, order='asc',
+                   filters=None):
+        """
+        One page of the processed frame (display columns only).
+
+        filters: { 'profile'|'note'|'os'|'rule': text } — case-insensitive substring.
+        Returns None for an unknown/expired id, otherwise a JSON-ready dict:
+          { columns, rows, page, per_page, total, filtered }
+        Raises ValueError for an unknown sort column.
+        """
+        import numpy as np
+        entry = self._entry(result_id)
+        if entry is None:
+            return None
+        df = entry.result.df
+        cols = entry.result.display_cols
+        per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+        page = max(1, int(page))
+
+        if sort:
+            if sort not in cols:
+                raise ValueError(f"Cannot sort by '{sort}'")
+            positions = entry.order(sort, order != 'desc')
+        else:
+            positions = np.arange(len(df))
+
+        mask = _filter_mask(df, filters or {})
+        if mask is not None:
+            positions = positions[mask[positions]]
+
+        start = (page - 1) * per_page
+        page_df = df[cols].iloc[positions[start:start + per_page]]
+        return {
+            'columns': [str(c) for c in cols],
+            # to_json handles NaN → null and numpy scalars in one pass.
+            'rows': json.loads(page_df.to_json(orient='values', date_format='iso')),
+            'page': page,
+            'per_page': per_page,
+            'total': int(len(df)),
+            'filtered': int(len(positions)),
+        }
+
+
+def _filter_mask(df, filters):
+    """
+    Boolean mask over df rows, or None when no filter applies. Matching is
+    done on the distinct values of each column (a categorical's categories),
+    then broadcast with isin().
+    """
+    mask = None
+    for name, text in filters.items():
+        column = FILTERS.get(name)
+        needle = (text or '').strip().lower()
+        if not column or not needle or column not in df.columns:
+            continue
+        col = df[column]
+        distinct = col.cat.categories if hasattr(col, 'cat') else col.dropna().unique()
+        hits = [v for v in distinct if needle in str(v).lower()]
+        m = col.isin(hits).to_numpy()
+        mask = m if mask is None else (mask & m)
+    return mask
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming reader for the RVTools 'vInfo' sheet.
+
+Rows are streamed with openpyxl in read-only mode straight from the upload
+stream (no temporary file), only the requested columns are kept, and they are
+converted into compact typed arrays as they are read: numbers as int32/float64,
+repetitive text as pandas Categoricals. pandas and openpyxl are imported on
+first read.
+"""
+
+import logging
+import math
+import zipfile
+
+VINFO_SHEET = 'vInfo'
+# Leading metadata columns kept for display (VM, Powerstate, Template, ...).
+META_COLS = 8
+
+# Column kinds for the `columns` spec of read_vinfo().
+STR, CAT, INT, FLOAT = 'str', 'category', 'int', 'float'
+_TEXT_KINDS = (STR, CAT)
+
+# Metadata columns with at most this share of distinct values (and only text)
+# are stored as categoricals (Powerstate, Guest state, ...; not VM names).
+META_CATEGORY_RATIO = 0.5
+
+
+def _to_float(v):
+    if v is None or isinstance(v, bool):
+        return math.nan
+    if isinstance(v, (int, float)):
+        return float(v)
+    try:
+        return float(str(v).strip())
+    except ValueError:
+        return math.nan
+
+
+def _to_str(v):
+    return '' if v is None else str(v).strip()
+
+
+def _meta_series(values):
+    import pandas as pd
+    distinct = set(values)
+    if (len(distinct) <= max(1, len(values) * META_CATEGORY_RATIO)
+            and all(isinstance(v, str) or v is None for v in distinct)):
+        return pd.Series(pd.Categorical(values))
+    return pd.Series(values, dtype=object)
+
+
+def _header_names(header, count):
+    """
+    Names of the first `count` columns as pandas.read_excel gives them: blank
+    headers become 'Unnamed: <i>', repeated ones get the first free '.1',
+    '.2', ... suffix (names present elsewhere in the header are not free).
+    """
+    raw = []
+    for i in range(max(count, len(header))):
+        name = header[i] if i < len(header) else None
+        if name is None or (isinstance(name, float) and math.isnan(name)):
+            name = f"Unnamed: {i}"
+        raw.append(name)
+    taken = set(raw)
+    names, next_suffix = [], {}
+    for name in raw[:count]:
+        if name in next_suffix:
+            n = next_suffix[name]
+            while f"{name}.{n}" in taken:
+                n += 1
+            next_suffix[name] = n + 1
+            name = f"{name}.{n}"
+            taken.add(name)
+        else:
+            next_suffix[name] = 1
+        names.append(name)
+    return names
+
+
+def _build_frame(header, meta, projected, columns):
+    import numpy as np
+    import pandas as pd
+    data = {}
+    for name, values in zip(_header_names(header, len(meta)), meta):
+        if name not in columns:
+            data[name] = _meta_series(values)
+    for name, (_, kind) in columns.items():
+        values = projected[name]
+        if kind == STR:
+            data[name] = pd.Series(values, dtype=object)
+        elif kind == CAT:
+            data[name] = pd.Series(pd.Categorical(values))
+        else:
+            arr = np.fromiter((_to_float(v) for v in values), dtype=np.float64, count=len(values))
+            if kind == INT:
+                # Nullable Int32: blank/non numeric stays missing (like
+                # pd.to_numeric(errors='coerce')), values are truncated.
+                missing = np.isnan(arr)
+                arr = pd.arrays.IntegerArray(np.trunc(np.where(missing, 0.0, arr)).astype(np.int32), missing)
+            data[name] = arr
+    return pd.DataFrame(data)
+
+
+def read_vinfo(source, columns, meta_cols=META_COLS, sheet_name=VINFO_SHEET):
+    """
+    Read the vInfo sheet from a path or a seekable binary stream.
+
+    columns: { output_name: (zero_based_column_index, kind) } with kind one of
+    'str' (stripped text, '' when blank), 'category' (same, as a Categorical),
+    'int' (nullable Int32, <NA> when blank/non numeric) or 'float' (float64,
+    NaN when blank/non numeric).
+
+    Returns a DataFrame holding the first `meta_cols` sheet columns (original
+    headers, de-duplicated like pandas; low-cardinality text ones as
+    categoricals) followed by the projected columns in spec order. A metadata
+    column named like a projected one is replaced by it. Fully blank rows are
+    skipped. Unlike read_excel(...).astype(str), blank text cells read as ''
+    rather than 'nan'.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+    try:
+        wb = load_workbook(source, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile):
+        # Legacy .xls: no streaming reader, fall back to pandas.
+        logging.info("Workbook is not .xlsx; falling back to pandas.read_excel")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return _read_vinfo_pandas(source, columns, meta_cols, sheet_name)
+
+    try:
+        if sheet_name not in wb.sheetnames:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        ws = wb[sheet_name]
+        max_col = max([meta_cols] + [idx + 1 for idx, _ in columns.values()])
+
+        rows = ws.iter_rows(values_only=True, max_col=max_col)
+        header = list(next(rows, ()))
+        meta = [[] for _ in range(meta_cols)]
+        projected = {name: [] for name in columns}
+
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue
+            width = len(row)
+            for i in range(meta_cols):
+                meta[i].append(row[i] if i < width else None)
+            for name, (idx, kind) in columns.items():
+                v = row[idx] if idx < width else None
+                projected[name].append(_to_str(v) if kind in _TEXT_KINDS else v)
+    finally:
+        wb.close()
+
+    df = _build_frame(header, meta, projected, columns)
+    logging.info(f"vInfo rows read: {len(df)} (columns kept: {len(df.columns)})")
+    return df
+
+
+def _read_vinfo_pandas(source, columns, meta_cols, sheet_name):
+    import pandas as pd
+    raw = pd.read_excel(source, sheet_name=sheet_name, header=None)
+    header = list(raw.iloc[0]) if len(raw) else []
+    body = raw.iloc[1:].dropna(how='all')
+    body = body.astype(object).where(body.notna(), None)
+
+    def col(i):
+        return list(body.iloc[:, i]) if i < body.shape[1] else [None] * len(body)
+
+    meta = [col(i) for i in range(meta_cols)]
+    projected = {}
+    for name, (idx, kind) in columns.items():
+        projected[name] = [_to_str(v) for v in col(idx)] if kind in _TEXT_KINDS else col(idx)
+    return _build_frame(header, meta, projected, columns)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ProfileIndex / round_memory_array against the scalar reference functions.
+
+  python -m pytest test_profile_matching.py
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from profile_matching import (round_memory, find_best_match, find_cheapest_match, round_memory_array,
+                              profile_family, ProfileIndex, MEM_THRESHOLDS)
+
+FAMILY_RATIOS = {'bx2': 4, 'cx2': 2, 'mx2': 8, 'ux2': 28}
+SEEDS = range(20)
+
+
+def random_profiles(rng):
+    """
+    Sorted (cpus, memory, name) list with gaps, shared CPU counts and a few
+    odd memory sizes, like a real regional catalog.
+    """
+    cpus = sorted(rng.choice([1, 2, 4, 8, 16, 32, 48, 64, 96, 128, 200],
+                             size=int(rng.integers(1, 9)), replace=False).tolist())
+    profiles = set()
+    for fam, ratio in FAMILY_RATIOS.items():
+        for c in cpus:
+            if rng.random() < 0.7:
+                mem = c * ratio + (int(rng.integers(0, 3)) if rng.random() < 0.2 else 0)
+                profiles.add((c, mem, f"{fam}-{c}x{mem}"))
+    return sorted(profiles)
+
+
+def random_prices(rng, profiles):
+    """
+    Prices for most profiles (some unpriced), with deliberate ties.
+    """
+    return {name: float(rng.choice([0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 3.2]) * (1 + rng.random() * (rng.random() < 0.5)))
+            for _, _, name in profiles if rng.random() < 0.8}
+
+
+def requests(rng, profiles, size=300):
+    """
+    (cpus, mem_rounded) arrays mixing random values, exact profile sizes and
+    their neighbours, zero, over-max values and NaN.
+    """
+    pcpu = [p[0] for p in profiles] or [1]
+    pmem = [p[1] for p in profiles] or [1]
+    cpu_pool = sorted(set(pcpu) | {c + d for c in pcpu for d in (-1, 1)} | {0, max(pcpu) * 3})
+    mem_pool = sorted(set(pmem) | {m + d for m in pmem for d in (-1, 1)} | {0, max(pmem) * 3})
+    cpus = rng.choice(np.asarray(cpu_pool, dtype=float), size=size)
+    mem = rng.choice(np.asarray(mem_pool, dtype=float), size=size)
+    cpus[rng.random(size) < 0.05] = np.nan
+    mem[rng.random(size) < 0.05] = np.nan
+    return cpus, mem
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_first_fit_matches_find_best_match(seed):
+    rng = np.random.default_rng(seed)
+    profiles = random_profiles(rng)
+    index = ProfileIndex(profiles)
+    cpus, mem = requests(rng, profiles)
+    expected = [find_best_match(c, m, profiles) for c, m in zip(cpus, mem)]
+    assert index.match(cpus, mem).tolist() == expected
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_cheapest_fit_matches_find_cheapest_match(seed):
+    rng = np.random.default_rng(seed)
+    profiles = random_profiles(rng)
+    prices = random_prices(rng, profiles)
+    index = ProfileIndex(profiles, prices)
+    cpus, mem = requests(rng, profiles)
+    expected = [find_cheapest_match(c, m, profiles, prices) for c, m in zip(cpus, mem)]
+    assert index.match_cheapest(cpus, mem).tolist() == expected
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_family_subset_matches_filtered_list(seed):
+    rng = np.random.default_rng(seed)
+    profiles = random_profiles(rng)
+    prices = random_prices(rng, profiles)
+    families = ['cx2', 'MX2 ']
+    kept = [p for p in profiles if profile_family(p[2]) in ('cx2', 'mx2')]
+    subset = ProfileIndex(profiles, prices).subset(families)
+    cpus, mem = requests(rng, profiles)
+    assert subset.match(cpus, mem).tolist() == [find_best_match(c, m, kept) for c, m in zip(cpus, mem)]
+    assert subset.match_cheapest(cpus, mem).tolist() == [
+        find_cheapest_match(c, m, kept, prices) for c, m in zip(cpus, mem)]
+
+
+def test_no_profiles_is_unknown():
+    index = ProfileIndex([], {})
+    cpus, mem = np.array([1.0, np.nan]), np.array([4.0, 0.0])
+    assert index.match(cpus, mem).tolist() == ['Unknown', 'Unknown']
+    assert index.match_cheapest(cpus, mem).tolist() == ['Unknown', 'Unknown']
+
+
+def test_round_memory_array_matches_round_memory():
+    edges = [t + d for t in MEM_THRESHOLDS for d in (-0.5, 0, 0.5, 1)]
+    values = np.asarray([-1.0, 0.0, math.nan, 1e9] + edges +
+                        np.random.default_rng(0).uniform(0, 70000, 500).tolist())
+    assert round_memory_array(values).tolist() == [round_memory(v) for v in values]
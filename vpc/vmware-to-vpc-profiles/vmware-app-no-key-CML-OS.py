@@ -1,43 +1,95 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from flask import Flask, request, render_template_string
-import pandas as pd
+from flask import (Flask, request, render_template_string, stream_template_string, jsonify,
+                   url_for, send_file, Response, stream_with_context)
+import io
+import json
 import os
 import logging
-import re
-from werkzeug.utils import secure_filename
-from collections import defaultdict
-import math
-
-# IBM Cloud VPC SDK
-from ibm_vpc import VpcV1
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+import tempfile
+import time
+
+# pandas, openpyxl and the IBM SDK are imported on first use (see vpc_client,
+# rvtools, pipeline) so the app imports quickly and without prompting.
+from vpc_catalog import VpcCatalog, DEFAULT_TTL, load_catalog
+from catalog_snapshot import CatalogSnapshot, snapshot_loader
+from gc_pricing import GcPricing, priced_loader
+from vpc_client import VpcClientFactory, LazyService
+from profile_matching import FIRST_FIT, CHEAPEST
+from regions import RegionCatalogs, VPC_REGIONS
+from jobs import JobManager, QueueFull, DONE, FAILED
+from results import ResultStore, FILTERS, DEFAULT_PER_PAGE
+from result_cache import ResultCache, digest_stream, cache_key, catalog_stamp, frame_nbytes
+from exports import FORMATS, iter_csv, write_parquet, write_xlsx
+import metrics
 
 # ------------------------------------------------------------------------------
 # Flask setup
 # ------------------------------------------------------------------------------
 app = Flask(__name__)
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 
 # ------------------------------------------------------------------------------
 # IBM Cloud VPC Setup
 # ------------------------------------------------------------------------------
-SERVICE_URL = os.environ.get('IBM_VPC_URL', 'https://us-south.iaas.cloud.ibm.com/v1')
-API_KEY = os.environ.get('IBM_CLOUD_API_KEY')
-if not API_KEY:
-    try:
-        import getpass
-        API_KEY = getpass.getpass('Enter IBM Cloud API key: ')
-    except Exception:
-        API_KEY = input('Enter IBM Cloud API key: ')
-
-authenticator = IAMAuthenticator(API_KEY)
-vpc_service = VpcV1(version='2025-04-29', authenticator=authenticator)
-vpc_service.set_service_url(SERVICE_URL)
+# IBM_CLOUD_API_KEY / IBM_VPC_URL are read, and the API key prompted for if
+# missing, when the catalog is first loaded, not at import.
+vpc = VpcClientFactory()
+DEFAULT_REGION = vpc.default_region
+
+# Optional on-disk snapshot shared by every worker/batch run using the same
+# file (one API fetch per region and TTL); offline mode never calls the API.
+SNAPSHOT_PATH = os.environ.get('VPC_CATALOG_SNAPSHOT')
+OFFLINE = os.environ.get('VPC_CATALOG_OFFLINE', '').lower() in ('1', 'true', 'yes')
+if OFFLINE and not SNAPSHOT_PATH:
+    raise SystemExit("VPC_CATALOG_OFFLINE requires VPC_CATALOG_SNAPSHOT")
+snapshot = CatalogSnapshot(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+
+
+# Hourly prices from the Global Catalog (the profiles API rarely returns
+# them), refreshed every GC_PRICING_TTL seconds and persisted to
+# GC_PRICING_CACHE if set. Opt-in with GC_PRICING=1: the lookup blocks
+# catalog loads, so pair it with GC_PRICING_CACHE (e.g. prefilled by
+# `gc_pricing.py fetch`) to keep it off the request path.
+GC_PRICING = os.environ.get('GC_PRICING', '').lower() in ('1', 'true', 'yes')
+gc_pricing = GcPricing(offline=OFFLINE) if GC_PRICING else None
+
+
+def catalog_loader(region):
+    if snapshot is None:
+        loader = load_catalog
+    else:
+        loader = snapshot_loader(snapshot, region, max_age=DEFAULT_TTL, offline=OFFLINE)
+    return priced_loader(loader, gc_pricing, region) if gc_pricing else loader
+
+
+# Profiles, prices and images are served from memory and refreshed in the
+# background every VPC_CATALOG_TTL seconds (stale copy kept if a refresh fails).
+catalog = VpcCatalog(LazyService(vpc), ttl=DEFAULT_TTL, loader=catalog_loader(DEFAULT_REGION))
+
+# Extra regions for side-by-side quoting, fetched concurrently on demand.
+region_catalogs = RegionCatalogs(lambda region: LazyService(vpc, region), ttl=DEFAULT_TTL,
+                                 loader_factory=catalog_loader)
+region_catalogs.add(DEFAULT_REGION, catalog)
+
+# Processed frames kept server-side and paged through /results/<id>/rows
+results = ResultStore()
+
+# Re-uploads of the same workbook (same catalogs and options) are served from
+# here (CONVERTER_CACHE_MB in memory, optional CONVERTER_CACHE_DIR on disk).
+result_cache = ResultCache()
+
+# Data table: rows per page fetched by the page's script; the first
+# CONVERTER_INLINE_PAGES pages are streamed with the page, ROW_CHUNK rows at a time.
+PAGE_ROWS = 200
+INLINE_PAGES = int(os.environ.get('CONVERTER_INLINE_PAGES', 1))
+ROW_CHUNK = 100
+
+# Background workers for /jobs uploads (CONVERTER_WORKERS, CONVERTER_QUEUE_DEPTH);
+# all jobs share the catalog above, the result cache, and publish into the result store.
+jobs = JobManager(catalog, results=results, cache=result_cache, region=DEFAULT_REGION)
 
 # ------------------------------------------------------------------------------
 # HTML templates (inline)
@@ -52,7 +104,7 @@ PAGE_TMPL = """
     body { font-family: system-ui, -apple-system, Segoe UI, Roboto, Arial, sans-serif; margin: 24px; }
     h1 { margin-bottom: 8px; }
     .card { background: #fff; border: 1px solid #e5e7eb; border-radius: 12px; padding: 16px; margin-bottom: 24px; box-shadow: 0 1px 2px rgba(0,0,0,0.04); }
-    .summary, .data, .images, .unmatched { border-collapse: collapse; width: 100%; font-size: 14px; }
+    .summary, .data, .images, .unmatched, .regions { border-collapse: collapse; width: 100%; font-size: 14px; }
     table { margin-top: 8px; }
     th, td { border: 1px solid #e5e7eb; padding: 8px; vertical-align: top; }
     th { background: #f9fafb; text-align: left; }
@@ -67,6 +119,9 @@ PAGE_TMPL = """
     .btn:hover { background: #0b1220; }
     input[type=file] { padding: 6px; border: 1px solid #e5e7eb; border-radius: 8px; }
     code { background: #f3f4f6; padding: 2px 6px; border-radius: 6px; }
+    .filters { display: flex; gap: 8px; flex-wrap: wrap; margin-top: 8px; }
+    .filters input { padding: 6px 8px; border: 1px solid #e5e7eb; border-radius: 8px; }
+    .data th.sortable { cursor: pointer; white-space: nowrap; }
   </style>
 </head>
 <body>
@@ -75,10 +130,23 @@ PAGE_TMPL = """
   <div class="card">
     <form class="upload" method="POST" enctype="multipart/form-data">
       <input type="file" name="file" accept=".xlsx,.xls" required />
+      <label class="hint" for="regions">Regions (first is used for the detailed tables; Ctrl/Cmd-click to compare several)</label>
+      <select id="regions" name="regions" multiple size="5">
+        {% for r in vpc_regions %}<option value="{{ r }}" {% if r == default_region %}selected{% endif %}>{{ r }}</option>{% endfor %}
+      </select>
+      <label class="hint" for="mode">Profile selection</label>
+      <select id="mode" name="mode">
+        <option value="first-fit">First fit (smallest CPU, then memory)</option>
+        <option value="cheapest">Cheapest fit (uses profile prices)</option>
+      </select>
+      <input type="text" name="families" placeholder="Profile families, e.g. bx2,cx2 (blank = all)" />
       <button class="btn" type="submit">Process Excel</button>
     </form>
   </div>
 
+  {#- Everything above is sent before the upload is processed. -#}
+  {% set page = load_page() if load_page else {} %}
+  {% set error = error or page.error %}
   {% if error %}
     <div class="card">
       <h3 class="bad">Error</h3>
@@ -86,421 +154,515 @@ PAGE_TMPL = """
     </div>
   {% endif %}
 
-  {% if summary_table %}
+  {% if page.summary_table %}
   <div class="grid">
+    {% if page.region_table %}
+    <div class="card">
+      <h3>Region Comparison</h3>
+      <p class="hint">Same VMs matched against each region's profiles, prices and public images.</p>
+      {{ page.region_table | safe }}
+      {% if page.region_costs_table %}
+      <p class="hint">Total price per instance profile and region.</p>
+      {{ page.region_costs_table | safe }}
+      {% endif %}
+    </div>
+    {% endif %}
+
+    {% if page.delta_counts_table %}
+    <div class="card">
+      <h3>Changes Since Previous Export</h3>
+      <p class="hint">VMs matched by name against the previous result; only added and changed rows were re-processed.</p>
+      {{ page.delta_counts_table | safe }}
+      {% if page.delta_profiles_table %}
+      <p class="hint">VMs and cost per instance profile, before and after.</p>
+      {{ page.delta_profiles_table | safe }}
+      {% endif %}
+      {% if page.delta_changes_table %}
+      <p class="hint">Added, removed and changed VMs{% if page.delta_changes_more %} (first rows; {{ page.delta_changes_more }} more in the <a href="{{ page.delta_url }}">JSON delta</a>){% endif %}.</p>
+      {{ page.delta_changes_table | safe }}
+      {% endif %}
+    </div>
+    {% endif %}
+
+    {% if page.savings_table %}
+    <div class="card">
+      <h3>Cheapest-Fit Savings</h3>
+      <p class="hint">Cheapest priced profile per VM compared with the first profile that fits.</p>
+      {{ page.savings_table | safe }}
+    </div>
+    {% endif %}
+
     <div class="card">
       <h3>Profile Cost Summary</h3>
       <p class="hint">Totals use profile pricing from the VPC API (when provided).</p>
-      {{ summary_table | safe }}
+      {{ page.summary_table | safe }}
     </div>
 
     <div class="card">
       <h3>OS Image Coverage</h3>
       <p class="hint">How many VMs mapped to each public image (family/version).</p>
-      {{ image_table | safe }}
+      {{ page.image_table | safe }}
     </div>
 
-    {% if unmatched_table %}
+    {% if page.unmatched_table %}
     <div class="card">
       <h3>Unmatched / Unsupported OS</h3>
       <p class="hint">Rows whose OS had no suitable public image, or were 32-bit.</p>
-      {{ unmatched_table | safe }}
+      {{ page.unmatched_table | safe }}
     </div>
     {% endif %}
 
     <div class="card">
       <h3>Full Processed Data</h3>
-      <p class="hint">Includes CPUs, memory, selected VPC profile, price (if available), and mapped image (name + id + note).</p>
-      {{ data_table | safe }}
+      <p class="hint">Includes CPUs, memory, selected VPC profile, price (if available), and mapped image (name + id + note).
+        Click a column header to sort.
+        Download: {% for fmt, url in page.export_urls.items() %}<a href="{{ url }}">{{ fmt | upper }}</a>{% if not loop.last %} · {% endif %}{% endfor %}</p>
+      <div class="filters">
+        <input data-filter="profile" placeholder="Instance Profile" />
+        <input data-filter="note" placeholder="Image Match Note" />
+        <input data-filter="os" placeholder="Requested OS" />
+        <input data-filter="rule" placeholder="OS Rule" />
+      </div>
+      <p class="hint" id="rows-info"></p>
+      <table class="data" id="data-table">
+        <thead>{% if page.columns %}<tr>{% for c in page.columns %}<th>{{ c }}</th>{% endfor %}</tr>{% endif %}</thead>
+        <tbody>{% for chunk in page.row_chunks %}{{ chunk | safe }}{% endfor %}</tbody>
+      </table>
+      <button class="btn" id="rows-more" type="button" hidden>Load more</button>
+    </div>
+
+    <div class="card">
+      <h3>Compare a Newer Export</h3>
+      <p class="hint">Upload a later RVTools export of the same vCenter: unchanged VMs keep this result, and the changes are listed.</p>
+      <form class="upload" method="POST" action="{{ url_for('upload_file') }}" enctype="multipart/form-data">
+        <input type="file" name="file" accept=".xlsx,.xls" required />
+        <input type="hidden" name="previous" value="{{ page.result_id }}" />
+        <input type="hidden" name="mode" value="{{ page.result_mode }}" />
+        <input type="hidden" name="families" value="{{ page.result_families }}" />
+        <button class="btn" type="submit">Compare</button>
+      </form>
     </div>
   </div>
+  <script>
+  (function () {
+    var rowsUrl = {{ page.rows_url | tojson }};
+    var pageRows = {{ page.page_rows | tojson }};
+    var totalRows = {{ page.total_rows | tojson }};
+    var table = document.getElementById('data-table');
+    var info = document.getElementById('rows-info');
+    var more = document.getElementById('rows-more');
+    var state = { page: 0, sort: '', order: 'asc', filters: {}, loading: false, done: false };
+
+    function params() {
+      var p = new URLSearchParams({ page: state.page + 1, per_page: pageRows });
+      if (state.sort) { p.set('sort', state.sort); p.set('order', state.order); }
+      Object.keys(state.filters).forEach(function (k) { if (state.filters[k]) p.set(k, state.filters[k]); });
+      return p;
+    }
+
+    function sortable(th, c) {
+      th.className = 'sortable';
+      th.onclick = function () {
+        state.order = (state.sort === c && state.order === 'asc') ? 'desc' : 'asc';
+        state.sort = c;
+        reload();
+      };
+    }
+
+    function header(columns) {
+      if (table.tHead.rows.length) return;
+      var tr = table.tHead.insertRow();
+      columns.forEach(function (c) {
+        var th = document.createElement('th');
+        th.textContent = c;
+        sortable(th, c);
+        tr.appendChild(th);
+      });
+    }
+
+    function showInfo(shown, filtered, total) {
+      info.textContent = 'Showing ' + shown + ' of ' + filtered +
+        (filtered !== total ? ' (filtered from ' + total + ')' : '') + ' rows';
+    }
+
+    function load() {
+      if (state.loading || state.done) return;
+      state.loading = true;
+      fetch(rowsUrl + '?' + params()).then(function (r) { return r.json(); }).then(function (data) {
+        if (data.error) { info.textContent = data.error; state.done = true; return; }
+        header(data.columns);
+        var body = table.tBodies[0];
+        data.rows.forEach(function (row) {
+          var tr = body.insertRow();
+          row.forEach(function (v) { tr.insertCell().textContent = v === null ? '' : v; });
+        });
+        state.page = data.page;
+        state.done = data.page * data.per_page >= data.filtered;
+        showInfo(body.rows.length, data.filtered, data.total);
+        more.hidden = state.done;
+      }).finally(function () { state.loading = false; });
+    }
+
+    function reload() {
+      table.tBodies[0].innerHTML = '';
+      state.page = 0;
+      state.done = false;
+      load();
+    }
+
+    var timer;
+    document.querySelectorAll('.filters input').forEach(function (input) {
+      input.addEventListener('input', function () {
+        state.filters[input.dataset.filter] = input.value;
+        clearTimeout(timer);
+        timer = setTimeout(reload, 300);
+      });
+    });
+    more.onclick = load;
+    // Fetch the next page as the "Load more" button scrolls into view.
+    if ('IntersectionObserver' in window) {
+      new IntersectionObserver(function (entries) {
+        if (entries[0].isIntersecting) load();
+      }).observe(more);
+    }
+    // The first page(s) of rows are streamed with the page; continue after them.
+    var inline = table.tBodies[0].rows.length;
+    Array.prototype.forEach.call(table.tHead.querySelectorAll('th'), function (th) {
+      sortable(th, th.textContent);
+    });
+    if (inline) {
+      state.page = Math.floor(inline / pageRows);
+      state.done = inline >= totalRows;
+      showInfo(inline, totalRows, totalRows);
+      more.hidden = state.done;
+    } else {
+      load();
+    }
+  })();
+  </script>
+  {% endif %}
+  {% if timing %}{% set t = timing() %}
+  <!-- Server-Timing: {{ t.header | safe }} -->
+  <script>
+  (function () {
+    // Stages that ran after the headers were sent, as marks for the dev tools.
+    var spans = {{ t.spans | tojson }};
+    window.serverTiming = spans;
+    if (window.performance && performance.mark) {
+      spans.forEach(function (s) {
+        try { performance.mark('server:' + s.name, {detail: s}); } catch (e) { /* old browsers */ }
+      });
+    }
+  })();
+  </script>
   {% endif %}
 </body>
 </html>
 """
 
 # ------------------------------------------------------------------------------
-# ONE-TO-ONE OS → TARGET FAMILY/MAJOR MAPPING (exact label match)
-# Each entry maps a VMware OS label (as in Excel col I) to a target:
-#   {'family': <vpc_family>, 'major': <int>, 'note': '...'}
-# For unsupported 32-bit, use {'unsupported': True, 'note': 'unsupported: 32-bit OS'}
+# Flask route
 # ------------------------------------------------------------------------------
-OS_TO_TARGET = {
-    "CentOS 4/5 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS→CentOS 7"},
-    "CentOS 4/5/6 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS→CentOS 7"},
-    "CentOS 4/5/6/7 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS 7"},
-    "CentOS 6 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS→CentOS 7"},
-    "CentOS 7 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS 7"},
-    "CentOS 7 (64-bit)": {"family": "centos", "major": 7, "note": "mapped: CentOS→CentOS 7"},
-    "Debian GNU/Linux 6 (64-bit)": {"family": "debian", "major": 12, "note": "mapped: Debian 12"},
-    "Microsoft Windows 10 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Microsoft Windows 10 (64-bit)": {"family": "windows", "major": 2022, "note": "mapped: client→Windows 2022"},
-    "Microsoft Windows 11 (64-bit)": {"family": "windows", "major": 2022, "note": "mapped: client→Windows 2022"},
-    "Microsoft Windows 7 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Microsoft Windows NT": {"unsupported": True, "note": "unsupported: legacy OS"},
-    "Microsoft Windows Server 2003 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Microsoft Windows Server 2003 Standard (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Microsoft Windows Server 2003 Standard (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2003→2019"},
-    "Microsoft Windows Server 2003 Web Edition (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Microsoft Windows Server 2008 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Microsoft Windows Server 2008 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2008→2019"},
-    "Microsoft Windows Server 2008 R2 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2008 R2→2019"},
-    "Microsoft Windows Server 2012 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2012→2019"},
-    "Microsoft Windows Server 2012 R2 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2012 R2→2019"},
-    "Microsoft Windows Server 2016 (64-bit)": {"family": "windows", "major": 2016, "note": "mapped: 2016"},
-    "Microsoft Windows Server 2019 (64-bit)": {"family": "windows", "major": 2019, "note": "mapped: 2019"},
-    "Microsoft Windows Server 2022 (64-bit)": {"family": "windows", "major": 2022, "note": "mapped: 2022"},
-    "Microsoft Windows Server 2025 (64-bit)": {"family": "windows", "major": 2022, "note": "mapped: 2025→2022"},
-    "Microsoft Windows XP Professional (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Oracle Linux 4/5 (64-bit)": {"family": "redhat", "major": 9, "note": "mapped: Oracle→RHEL 9"},
-    "Oracle Linux 4/5/6 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: Oracle→RHEL 9"},
-    "Oracle Linux 6 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: Oracle→redhat 9"},
-    "Oracle Linux 7 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: Oracle→redhat 9"},
-    "Oracle Linux 8 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: Oracle→redhat 9"},
-    "Oracle Linux 9 (64-bit)": {"family": "redhat", "major": 9, "note": "mapped: Oracle→Rocky 9"},
-    "Other (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Other 2.6.x Linux (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Other 2.6.x Linux (64-bit)": {"family": "ubuntu", "major": 22, "note": "mapped: generic→Ubuntu 22.04 LTS"},
-    "Other Linux (64-bit)": {"family": "ubuntu", "major": 22, "note": "mapped: generic→Ubuntu 22.04 LTS"},
-    "Red Hat Enterprise Linux 4 (32-bit)": {"unsupported": True, "note": "unsupported: 32-bit OS"},
-    "Red Hat Enterprise Linux 5 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: RHEL 5→RHEL 8"},
-    "Red Hat Enterprise Linux 6 (64-bit)": {"family": "redhat", "major": 8, "note": "mapped: RHEL 6→RHEL 8"},
-    "Rocky Linux (64-bit)": {"family": "rocky", "major": 9, "note": "mapped: Rocky 9"},
-    "SUSE Linux Enterprise 12 (64-bit)": {"family": "sles", "major": 12, "note": "mapped: SLES 12"},
-    "Ubuntu Linux (64-bit)": {"family": "ubuntu", "major": 22, "note": "mapped: Ubuntu 22.04 LTS"},
-}
+@app.context_processor
+def inject_regions():
+    return {'vpc_regions': VPC_REGIONS, 'default_region': DEFAULT_REGION}
 
-# ------------------------------------------------------------------------------
-# Helpers: instance profiles and prices
-# ------------------------------------------------------------------------------
-def get_vpc_profiles():
+
+def matching_options(form):
     """
-    Return list of tuples (cpus, memory_gb, name) for available instance profiles,
-    sorted ascending, excluding the 'bz2' family.
+    Profile selection options from the upload form: mode + family allow-list.
     """
-    profiles_list = []
-    try:
-        response = vpc_service.list_instance_profiles()
-        result = response.get_result() or {}
-        for profile in result.get('profiles', []):
-            name = profile.get('name', '')
-            m = re.search(r'-(\d+)x(\d+)', name)
-            if m:
-                cpus = int(m.group(1))
-                mem = int(m.group(2))
-                if 'bz2' in name.lower():
-                    continue
-                profiles_list.append((cpus, mem, name))
-    except Exception as e:
-        logging.error(f"Error fetching instance profiles: {e}")
+    mode = form.get('mode', FIRST_FIT)
+    families = [f.strip() for f in form.get('families', '').split(',') if f.strip()]
+    return {'mode': mode if mode in (FIRST_FIT, CHEAPEST) else FIRST_FIT,
+            'families': families or None}
 
-    profiles_list.sort()
-    logging.info(f"Profiles retrieved (excl. bz2): {len(profiles_list)}")
-    return profiles_list
 
-
-def get_vpc_prices():
+def previous_result(form):
     """
-    Attempt to get per-profile price from the profiles endpoint if present.
-    Returns { profile_name: price_float }.
-    Note: Pricing may not be returned by the API in all accounts/regions.
+    Stored result named by the form's 'previous' field (None when not given).
+    Raises LookupError when it has expired.
     """
-    price_dict = {}
-    try:
-        response = vpc_service.list_instance_profiles()
-        result = response.get_result() or {}
-        for profile in result.get('profiles', []):
-            name = profile.get('name', '')
-            price = None
-            if isinstance(profile.get('price'), dict):
-                v = profile['price'].get('value')
-                if v is not None:
-                    try:
-                        price = float(v)
-                    except:
-                        price = None
-            if price is not None and 'bz2' not in name.lower():
-                price_dict[name] = price
-    except Exception as e:
-        logging.warning(f"Pricing not available from API: {e}")
-    logging.info(f"Pricing entries found: {len(price_dict)}")
-    return price_dict
+    previous_id = (form.get('previous') or '').strip()
+    if not previous_id:
+        return None
+    previous = results.get(previous_id)
+    if previous is None:
+        raise LookupError(f"Previous result {previous_id} is unknown or expired; upload without it.")
+    return previous
+
+
+@app.route('/', methods=['GET', 'POST'])
+def upload_file():
+    if request.method == 'GET':
+        return stream_page()
+
+    # POST
+    file = request.files.get('file')
+    if not file:
+        return render_template_string(PAGE_TMPL, error="No file uploaded.")
+
+    selected = [r for r in request.form.getlist('regions') if r in VPC_REGIONS] or [DEFAULT_REGION]
+    metrics.UPLOAD_BYTES.observe(request.content_length or 0, route='upload')
+    # Uploaded files are closed when this view returns, before the page streams.
+    stream = io.BytesIO(file.read())
+
+    def process():
+        # Runs while the page streams, once its head and form have been sent.
+        from pipeline import run_pipeline, compare_regions
+        from incremental import run_incremental
+        try:
+            # All selected regions load concurrently; the first drives the detailed tables.
+            with metrics.span('catalog', desc=','.join(selected)):
+                region_data = region_catalogs.fetch(selected)
+            primary = region_data[selected[0]]
+            if isinstance(primary, Exception):
+                raise primary
+
+            options = matching_options(request.form)
+            previous = previous_result(request.form)
+            # Identical workbook + catalogs + options → cached result, no re-processing.
+            # A result diffed against a previous one is specific to it: not cached.
+            stamps = [catalog_stamp(r, cat) for r, cat in region_data.items()
+                      if not isinstance(cat, Exception)]
+            started = time.perf_counter()
+            key = cache_key(digest_stream(stream), stamps, options)
+            cached = result_cache.get(key, stamps) if previous is None else None
+            metrics.add_span('cache', time.perf_counter() - started, 'hit' if cached is not None else 'miss')
+            if cached is not None:
+                result, comparison = cached
+            else:
+                if previous is None:
+                    result = run_pipeline(stream, primary, **options)
+                else:
+                    result = run_incremental(stream, previous, primary, **options)
+                comparison = None
+                if len(selected) > 1:
+                    with metrics.span('compare-regions', metrics.STAGE_SECONDS, stage='compare-regions'):
+                        comparison = compare_regions(result.df, region_data, **options)
+                if previous is None:
+                    result_cache.put(key, (result, comparison), stamps, frame_nbytes(result.df))
+            return result_tables(results.put(result), result, comparison)
+
+        except Exception as e:
+            logging.exception("Processing error")
+            return {'error': str(e)}
+
+    return stream_page(process)
+
 
 # ------------------------------------------------------------------------------
-# Memory rounding & profile matching
+# Job API (large uploads): POST /jobs → id; GET /jobs/<id> → progress;
+# GET /jobs/<id>/result → finished tables
 # ------------------------------------------------------------------------------
-def round_memory(mem):
-    """
-    VMware memory (MB?) → rounded VPC profile GB steps (as per original logic).
-    Adjust if your input is already in GB.
-    """
-    thresholds = [128, 1024, 2048, 4096, 6136, 8192, 12288, 16384, 24576, 32768]
-    rounded_values = [0, 1, 2, 4, 6, 8, 12, 16, 24, 32]
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    file = request.files.get('file')
+    if not file:
+        return jsonify(error="No file uploaded."), 400
+    data = file.read()
+    metrics.UPLOAD_BYTES.observe(len(data), route='jobs')
     try:
-        val = float(mem)
-    except:
-        val = 0.0
-    for i, t in enumerate(thresholds):
-        if val <= t:
-            return rounded_values[i]
-    return 32
-
-def find_best_match(cpus, mem_rounded, profiles_list):
-    """
-    First profile with CPUs >= requested and Memory >= requested (both rounded).
-    """
-    for pcpu, pmem, pname in profiles_list:
-        if pcpu >= cpus and pmem >= mem_rounded:
-            return pname
-    return "Unknown"
+        job = jobs.submit(data, filename=file.filename or '',
+                          options=matching_options(request.form),
+                          previous=previous_result(request.form))
+    except LookupError as e:
+        return jsonify(error=str(e)), 404
+    except QueueFull as e:
+        return jsonify(error=str(e)), 503, {'Retry-After': '30'}
+    return jsonify(
+        id=job.id,
+        status=job.status,
+        status_url=url_for('job_status', job_id=job.id),
+        result_url=url_for('job_result', job_id=job.id),
+    ), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify(error="Unknown job id."), 404
+    if job.status == DONE and not jobs.has_result(job):
+        return jsonify({**job.to_dict(), 'error': "Result expired; upload the workbook again."}), 410
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify(error="Unknown job id."), 404
+    if job.status == FAILED:
+        return render_template_string(PAGE_TMPL, error=job.error), 500
+    if job.status != DONE:
+        return jsonify(job.to_dict()), 409
+    result = jobs.result(job)
+    if result is None:
+        return jsonify(error="Result expired; upload the workbook again."), 410
+    return stream_page(lambda: result_tables(job.id, result))
+
 
 # ------------------------------------------------------------------------------
-# Image discovery
+# Results: summary page + paginated rows (?page, per_page, sort, order, profile, note, os)
 # ------------------------------------------------------------------------------
-def get_vpc_images():
+def stream_page(load_page=None, **context):
     """
-    Index public, available images by normalized family and major version:
-      images_idx[family][major] -> [image_rec, ...]
-    image_rec = { id, name, os_name, os_family, os_version, arch, major }
+    PAGE_TMPL streamed as it renders (stream_template_string wraps the
+    generator in stream_with_context): the head and upload form are sent at
+    once, load_page() runs when the template reaches the result cards and
+    must return their fragments (see result_tables), and the data table rows
+    follow in chunks. The whole page is never held as one string. The
+    headers go out before the stages run, so their spans are written at the
+    end of the page instead (see page_timing).
     """
-    images_idx = defaultdict(lambda: defaultdict(list))
-    images_all = []
+    response = Response(stream_template_string(PAGE_TMPL, load_page=load_page, timing=page_timing,
+                                               **context),
+                        mimetype='text/html')
+    # Ask reverse proxies (nginx) not to buffer the stream.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-    try:
-        resp = vpc_service.list_images(limit=100)
-        while True:
-            result = resp.get_result() or {}
-            for img in result.get('images', []):
-                if img.get('visibility') != 'public' or img.get('status') != 'available':
-                    continue
-                os_info = img.get('operating_system') or {}
-                os_family = (os_info.get('family') or '').lower().strip()
-                os_name   = (os_info.get('name') or '').lower().strip()
-                os_ver    = (os_info.get('version') or '').lower().strip()
-                arch      = (os_info.get('architecture') or '').lower().strip()
-
-                # Derive "major" version (year for Windows; first number for Linux)
-                major = None
-                m = re.search(r'(\d{4})', os_ver)  # windows years
-                if not m:
-                    m = re.search(r'(\d+)', os_ver or os_name)
-                if m:
-                    try:
-                        major = int(m.group(1))
-                    except:
-                        major = None
-
-                rec = {
-                    'id': img.get('id'),
-                    'name': img.get('name'),
-                    'os_name': os_name,
-                    'os_family': os_family,
-                    'os_version': os_ver,
-                    'arch': arch,
-                    'major': major
-                }
-                images_all.append(rec)
-                if os_family and major is not None:
-                    images_idx[os_family][major].append(rec)
-
-            # pagination
-            if result.get('next') and result['next'].get('start'):
-                resp = vpc_service.list_images(limit=100, start=result['next']['start'])
-            else:
-                break
-    except Exception as e:
-        logging.error(f"Error fetching images: {e}")
 
-    logging.info(f"Indexed images: total={len(images_all)}; families={list(images_idx.keys())}")
-    return images_idx, images_all
+def page_timing():
+    """
+    Spans of the whole streamed request so far (with 'total'): the
+    Server-Timing value for an HTML comment and the spans for a script.
+    """
+    spans = list(request.environ.get('converter.spans') or [])
+    spans.append(('total', time.perf_counter() - request.environ['converter.started'], None))
+    return {
+        'header': metrics.server_timing(spans),
+        'spans': [{'name': name, 'dur': round(seconds * 1e3, 1), 'desc': desc and str(desc)}
+                  for name, seconds, desc in spans],
+    }
+
 
-# ------------------------------------------------------------------------------
-# Mapping selection using the ONE-TO-ONE table
-# ------------------------------------------------------------------------------
-def _nearest_version_match(images_idx_family, target_major):
+def result_tables(result_id, result, comparison=None):
     """
-    Find nearest major version available (bias upwards on ties).
+    Template values for one result: card fragments, URLs and the generator
+    of the first INLINE_PAGES pages of data rows.
     """
-    if not images_idx_family:
-        return None, None
-    majors = sorted(images_idx_family.keys())
-    if target_major is None:
-        mv = majors[-1]
-        return mv, images_idx_family[mv][0]
-    best = None
-    best_dist = math.inf
-    for v in majors:
-        d = abs(v - target_major)
-        if d < best_dist or (d == best_dist and (best is None or v > best)):
-            best = v
-            best_dist = d
-    return best, images_idx_family[best][0] if best is not None else (None, None)
-
-def choose_image_for_target(target, images_idx):
+    from pipeline import render_tables, iter_table_rows
+    with metrics.span('render', metrics.STAGE_SECONDS, stage='render'):
+        page = render_tables(result)
+        if comparison is not None:
+            region_summary, profile_costs = comparison
+            page['region_table'] = region_summary.to_html(classes='regions', index=False, na_rep='')
+            if profile_costs is not None:
+                page['region_costs_table'] = profile_costs.to_html(
+                    classes='regions', index=False, na_rep='—', float_format=lambda x: f"${x:.2f}"
+                )
+    context = result.context or (None, None, FIRST_FIT, ())
+    page.update(
+        result_id=result_id,
+        result_mode=context[2],
+        result_families=','.join(context[3]),
+        delta_url=url_for('result_delta', result_id=result_id),
+        rows_url=url_for('result_rows', result_id=result_id),
+        export_urls={fmt: url_for('result_export', result_id=result_id, fmt=fmt) for fmt in FORMATS},
+        columns=[str(c) for c in result.display_cols],
+        row_chunks=iter_table_rows(result, INLINE_PAGES * PAGE_ROWS, ROW_CHUNK),
+        page_rows=PAGE_ROWS,
+        total_rows=len(result.df),
+    )
+    return page
+
+
+@app.route('/results/<result_id>/rows', methods=['GET'])
+def result_rows(result_id):
+    try:
+        page = results.query_rows(
+            result_id,
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', DEFAULT_PER_PAGE, type=int),
+            sort=request.args.get('sort'),
+            order=request.args.get('order', 'asc'),
+            filters={k: request.args.get(k) for k in FILTERS},
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if page is None:
+        return jsonify(error="Unknown or expired result id."), 404
+    return jsonify(page)
+
+
+@app.route('/results/<result_id>/delta', methods=['GET'])
+def result_delta(result_id):
     """
-    Given a target {'family','major','note'} choose an image from images_idx.
-    Returns (image_rec or None, match_note).
+    Changes against the previous result (results uploaded with 'previous' only).
     """
-    fam = (target.get('family') or '').lower().strip()
-    major = target.get('major')
-    base_note = target.get('note', 'mapped')
-
-    fam_idx = images_idx.get(fam)
-    if not fam_idx:
-        return None, f"{base_note}; no images for family '{fam}' in region"
-
-    # exact major first
-    if major in fam_idx and fam_idx[major]:
-        return fam_idx[major][0], f"{base_note}; mapped exact"
-    # nearest major in same family
-    nearest_v, img = _nearest_version_match(fam_idx, major)
-    if img:
-        return img, f"{base_note}; mapped nearest ({nearest_v})"
-    return None, f"{base_note}; no image match in family"
-
-def map_vmw_label_to_target(os_label):
+    result = results.get(result_id)
+    if result is None:
+        return jsonify(error="Unknown or expired result id."), 404
+    if result.delta is None:
+        return jsonify(error="Result was not compared with a previous one."), 404
+    # to_json handles NaN → null and numpy scalars in one pass.
+    return jsonify({name: json.loads(table.to_json(orient='records'))
+                    for name, table in result.delta._asdict().items()})
+
+
+@app.route('/results/<result_id>/export.<fmt>', methods=['GET'])
+def result_export(result_id, fmt):
     """
-    Exact label mapping. If not found, return None to mark as unmapped.
+    Download the processed frame (csv, parquet or xlsx) without re-running the pipeline.
     """
-    key = (os_label or "").strip()
-    return OS_TO_TARGET.get(key)
-
-# ------------------------------------------------------------------------------
-# Flask route
-# ------------------------------------------------------------------------------
-@app.route('/', methods=['GET', 'POST'])
-def upload_file():
-    if request.method == 'GET':
-        return render_template_string(PAGE_TMPL)
-
-    # POST
-    file = request.files.get('file')
-    if not file:
-        return render_template_string(PAGE_TMPL, error="No file uploaded.")
+    result = results.get(result_id)
+    if result is None:
+        return jsonify(error="Unknown or expired result id."), 404
+    if fmt not in FORMATS:
+        return jsonify(error=f"Unsupported format '{fmt}'."), 400
+    download_name = f"vpc-mapping-{result_id[:8]}.{fmt}"
+
+    if fmt == 'csv':
+        return Response(
+            stream_with_context(iter_csv(result)),
+            mimetype=FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{download_name}"'},
+        )
 
+    # Binary formats are written to a temp file (deleted on close) and streamed from disk.
+    tmp = tempfile.TemporaryFile()
     try:
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-
-        # Load Excel (sheet 'vInfo')
-        df = pd.read_excel(filepath, sheet_name='vInfo', engine='openpyxl')
-
-        # Extract columns:
-        # OS name from Column I (index 8)
-        df.loc[:, 'Requested OS'] = df.iloc[:, 8].astype(str).str.strip()
+        (write_parquet if fmt == 'parquet' else write_xlsx)(result, tmp)
+    except Exception as e:
+        tmp.close()
+        logging.exception("Export error")
+        return jsonify(error=str(e)), 500
+    tmp.seek(0)
+    return send_file(tmp, mimetype=FORMATS[fmt], as_attachment=True, download_name=download_name)
 
-        # CPUs from Column L (index 11), Memory from Column M (index 12)
-        df.loc[:, 'CPUs'] = pd.to_numeric(df.iloc[:, 11], errors='coerce').fillna(0).astype(int)
-        df.loc[:, 'Memory'] = pd.to_numeric(df.iloc[:, 12], errors='coerce')  # keep numeric; may be MB or GB
-        df.loc[:, 'Mem Rounded'] = df['Memory'].apply(round_memory).fillna(0).astype(int)
 
-        # Fetch profiles and (if available) prices
-        vpc_profiles = get_vpc_profiles()
-        vpc_prices = get_vpc_prices()
+# ------------------------------------------------------------------------------
+# Timing: Server-Timing header on every response, Prometheus /metrics
+# ------------------------------------------------------------------------------
+@app.before_request
+def start_timing():
+    request.environ['converter.started'] = time.perf_counter()
+    request.environ['converter.spans'] = metrics.start_spans()
 
-        # Match instance profiles
-        df.loc[:, 'Instance Profile'] = df.apply(
-            lambda r: find_best_match(r['CPUs'], r['Mem Rounded'], vpc_profiles), axis=1
-        )
 
-        # Map prices
-        df.loc[:, 'VPC Price ($)'] = df['Instance Profile'].map(vpc_prices)
-
-        # Fetch images index once
-        images_idx, _ = get_vpc_images()
-
-        # Map OS → image using strict one-to-one dictionary
-        def map_os_label(os_str):
-            target = map_vmw_label_to_target(os_str)
-            if not target:
-                # Strict behavior: no mapping configured
-                return pd.Series({
-                    'Target Family': None,
-                    'Target Major': None,
-                    'Image Name': None,
-                    'Image ID': None,
-                    'Image Match Note': "no mapping configured for label"
-                })
-
-            if target.get('unsupported'):
-                return pd.Series({
-                    'Target Family': None,
-                    'Target Major': None,
-                    'Image Name': None,
-                    'Image ID': None,
-                    'Image Match Note': target.get('note', 'unsupported')
-                })
-
-            img, note = choose_image_for_target(target, images_idx)
-            if img:
-                return pd.Series({
-                    'Target Family': target.get('family'),
-                    'Target Major': target.get('major'),
-                    'Image Name': img['name'],
-                    'Image ID': img['id'],
-                    'Image Match Note': note
-                })
-            else:
-                return pd.Series({
-                    'Target Family': target.get('family'),
-                    'Target Major': target.get('major'),
-                    'Image Name': None,
-                    'Image ID': None,
-                    'Image Match Note': note
-                })
-
-        mapped = df['Requested OS'].apply(map_os_label)
-        df = pd.concat([df, mapped], axis=1)
-
-        # Summaries
-        summary_df = df.groupby('Instance Profile', dropna=False).agg(
-            Number_Listed=('Instance Profile', 'count'),
-            Total_Price=('VPC Price ($)', 'sum')
-        ).reset_index()
-        summary_df['Total_Price'] = summary_df['Total_Price'].apply(
-            lambda x: f"${x:.2f}" if pd.notna(x) else "$0.00"
-        )
+@app.after_request
+def add_server_timing(response):
+    spans = request.environ.get('converter.spans')
+    if spans is not None:
+        total = time.perf_counter() - request.environ['converter.started']
+        response.headers['Server-Timing'] = metrics.server_timing(spans + [('total', total, None)])
+    return response
 
-        image_summary = df.groupby(
-            ['Target Family', 'Target Major', 'Image Name'], dropna=False
-        ).size().reset_index(name='Count').sort_values(['Target Family','Target Major','Image Name'])
-
-        unmatched_df = df[df['Image ID'].isna()].groupby('Requested OS').size().reset_index(name='Count')
-        unmatched_html = unmatched_df.to_html(classes='unmatched', index=False, escape=False) if len(unmatched_df) else None
-
-        # Display tables (keep original columns visible + our computed ones)
-        display_cols = []
-        base_cols = list(df.columns[:8])  # keep initial metadata cols (0..7) if useful
-        for c in base_cols:
-            if c not in display_cols:
-                display_cols.append(c)
-        for c in ['Requested OS', 'CPUs', 'Memory', 'Mem Rounded',
-                  'Instance Profile', 'VPC Price ($)',
-                  'Target Family', 'Target Major', 'Image Name', 'Image ID', 'Image Match Note']:
-            if c in df.columns and c not in display_cols:
-                display_cols.append(c)
-
-        data_table_html = df[display_cols].to_html(classes='data', index=False, escape=False)
-        summary_html = summary_df.to_html(classes='summary', index=False, escape=False)
-        image_html = image_summary.to_html(classes='images', index=False, escape=False)
-
-        return render_template_string(
-            PAGE_TMPL,
-            summary_table=summary_html,
-            data_table=data_table_html,
-            image_table=image_html,
-            unmatched_table=unmatched_html
-        )
 
-    except Exception as e:
-        logging.exception("Processing error")
-        return render_template_string(PAGE_TMPL, error=str(e))
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
 # ------------------------------------------------------------------------------
 # Main
 # ------------------------------------------------------------------------------
 if __name__ == '__main__':
+    try:
+        catalog.start()
+    except Exception as e:
+        logging.warning(f"Catalog warm-up failed, will retry on first upload: {e}")
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5001)),
             debug=True, use_reloader=False)
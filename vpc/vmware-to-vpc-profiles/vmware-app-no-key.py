@@ -1,34 +1,22 @@
 from flask import Flask, request, render_template, send_file
-import pandas as pd
 import os
 import logging
 import re
-from werkzeug.utils import secure_filename
-from ibm_vpc import VpcV1
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+from rvtools import read_vinfo, INT, FLOAT
+from vpc_client import VpcClientFactory, VpcConfig
 
 app = Flask(__name__)
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
-# IBM Cloud VPC Setup (runtime key: env var or console input)
+# IBM Cloud VPC Setup (runtime key: env var or console input on first upload;
+# the SDK client is built lazily, nothing is prompted for at import)
 SERVICE_URL = 'https://us-south.iaas.cloud.ibm.com/v1'
-API_KEY = os.environ.get('IBM_CLOUD_API_KEY')
-if not API_KEY:
-    try:
-        import getpass
-        API_KEY = getpass.getpass('Enter IBM Cloud API key: ')
-    except Exception:
-        API_KEY = input('Enter IBM Cloud API key: ')
-authenticator = IAMAuthenticator(API_KEY)
-vpc_service = VpcV1(version='2025-04-29', authenticator=authenticator)
-vpc_service.set_service_url(SERVICE_URL)
+vpc = VpcClientFactory(VpcConfig(api_key=os.environ.get('IBM_CLOUD_API_KEY'), service_url=SERVICE_URL))
 
 def get_vpc_profiles():
-    response = vpc_service.list_instance_profiles()
+    response = vpc.service().list_instance_profiles()
     profiles_list = []
     if response.get_result():
         for profile in response.get_result()['profiles']:
@@ -48,7 +36,7 @@ def get_vpc_profiles():
     return profiles_list
 
 def get_vpc_prices():
-    response = vpc_service.list_instance_profiles()
+    response = vpc.service().list_instance_profiles()
     price_dict = {}
     if response.get_result():
         for profile in response.get_result()['profiles']:
@@ -86,20 +74,12 @@ def find_best_match(cpus, mem_rounded, profiles_list):
 @app.route('/', methods=['GET', 'POST'])
 def upload_file():
     if request.method == 'POST':
+        import pandas as pd
         file = request.files['file']
         if file:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
-            
-            # Load Excel
-            df = pd.read_excel(filepath, sheet_name='vInfo')
-            
-            # Keep Excel headers as read; do NOT drop the first data row.
-            
-            # Extract CPU and Memory from specified columns (Column O and P)
-            df.loc[:, 'CPUs'] = pd.to_numeric(df.iloc[:, 14], errors='coerce')  # Column O (index 14)
-            df.loc[:, 'Memory'] = pd.to_numeric(df.iloc[:, 15], errors='coerce')  # Column P (index 15)
+            # Stream sheet 'vInfo' from the upload; keep Excel headers as read and
+            # only the columns we use: CPU and Memory (Column O and P)
+            df = read_vinfo(file.stream, {'CPUs': (14, INT), 'Memory': (15, FLOAT)})
             
             df.loc[:, 'Mem Rounded'] = df['Memory'].apply(round_memory)
             
@@ -136,4 +116,5 @@ def upload_file():
     return render_template('upload.html')
 
 if __name__ == '__main__':
+    vpc.authenticator  # ask for the API key (if needed) before serving
     app.run(debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IBM Cloud VPC catalog helpers for the VMware → VPC converter.
+
+Fetches instance profiles, per-profile prices and the public image index from
+the VPC API, and keeps them in an in-process cache (VpcCatalog) that is
+refreshed in the background so uploads never wait on API round-trips.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import metrics
+from os_mapping import ImageResolver
+from profile_matching import ProfileIndex
+
+# Seconds a fetched catalog is considered fresh.
+DEFAULT_TTL = int(os.environ.get('VPC_CATALOG_TTL', 3600))
+
+# Seconds before retrying a failed refresh (doubling per failure, capped at the TTL).
+RETRY_DELAY = int(os.environ.get('VPC_CATALOG_RETRY', 30))
+
+# ------------------------------------------------------------------------------
+# Raw API access (raise on failure; callers decide how to degrade)
+# ------------------------------------------------------------------------------
+def _list_instance_profiles(vpc_service):
+    with metrics.span('vpc-profiles', metrics.VPC_API_SECONDS, call='list_instance_profiles'):
+        response = vpc_service.list_instance_profiles()
+    result = response.get_result() or {}
+    return result.get('profiles', [])
+
+
+def _list_images(vpc_service):
+    """
+    Yield every image record, following 'next.start' pagination.
+    Each page call is timed; the total API time and page count are recorded
+    as one 'vpc-images' span once the last page is read.
+    """
+    pages, api_seconds = 0, 0.0
+
+    def fetch(**kwargs):
+        nonlocal pages, api_seconds
+        started = time.perf_counter()
+        resp = vpc_service.list_images(limit=100, **kwargs)
+        elapsed = time.perf_counter() - started
+        metrics.VPC_API_SECONDS.observe(elapsed, call='list_images')
+        pages += 1
+        api_seconds += elapsed
+        return resp
+
+    resp = fetch()
+    while True:
+        result = resp.get_result() or {}
+        for img in result.get('images', []):
+            yield img
+        if result.get('next') and result['next'].get('start'):
+            resp = fetch(start=result['next']['start'])
+        else:
+            break
+    metrics.IMAGE_PAGES.observe(pages)
+    metrics.add_span('vpc-images', api_seconds, f"{pages} pages")
+    logging.info(f"Images listed: {pages} pages in {api_seconds:.2f}s")
+
+# ------------------------------------------------------------------------------
+# Instance profiles and prices
+# ------------------------------------------------------------------------------
+def get_vpc_profiles(vpc_service, raw_profiles=None):
+    """
+    Return list of tuples (cpus, memory_gb, name) for available instance profiles,
+    sorted ascending, excluding the 'bz2' family.
+    Pass raw_profiles (from list_instance_profiles) to avoid a second API call.
+    """
+    profiles_list = []
+    try:
+        if raw_profiles is None:
+            raw_profiles = _list_instance_profiles(vpc_service)
+        for profile in raw_profiles:
+            name = profile.get('name', '')
+            m = re.search(r'-(\d+)x(\d+)', name)
+            if m:
+                cpus = int(m.group(1))
+                mem = int(m.group(2))
+                if 'bz2' in name.lower():
+                    continue
+                profiles_list.append((cpus, mem, name))
+    except Exception as e:
+        logging.error(f"Error fetching instance profiles: {e}")
+
+    profiles_list.sort()
+    logging.info(f"Profiles retrieved (excl. bz2): {len(profiles_list)}")
+    return profiles_list
+
+
+def get_vpc_prices(vpc_service, raw_profiles=None):
+    """
+    Attempt to get per-profile price from the profiles endpoint if present.
+    Returns { profile_name: price_float }.
+    Note: Pricing may not be returned by the API in all accounts/regions.
+    """
+    price_dict = {}
+    try:
+        if raw_profiles is None:
+            raw_profiles = _list_instance_profiles(vpc_service)
+        for profile in raw_profiles:
+            name = profile.get('name', '')
+            price = None
+            if isinstance(profile.get('price'), dict):
+                v = profile['price'].get('value')
+                if v is not None:
+                    try:
+                        price = float(v)
+                    except (TypeError, ValueError):
+                        price = None
+            if price is not None and 'bz2' not in name.lower():
+                price_dict[name] = price
+    except Exception as e:
+        logging.warning(f"Pricing not available from API: {e}")
+    logging.info(f"Pricing entries found: {len(price_dict)}")
+    return price_dict
+
+# ------------------------------------------------------------------------------
+# Image discovery
+# ------------------------------------------------------------------------------
+def _image_record(img):
+    """
+    Normalize a public, available image into an image_rec, or None to skip it.
+    """
+    if img.get('visibility') != 'public' or img.get('status') != 'available':
+        return None
+    os_info = img.get('operating_system') or {}
+    os_family = (os_info.get('family') or '').lower().strip()
+    os_name   = (os_info.get('name') or '').lower().strip()
+    os_ver    = (os_info.get('version') or '').lower().strip()
+    arch      = (os_info.get('architecture') or '').lower().strip()
+
+    # Derive "major" version (year for Windows; first number for Linux)
+    major = None
+    m = re.search(r'(\d{4})', os_ver)  # windows years
+    if not m:
+        m = re.search(r'(\d+)', os_ver or os_name)
+    if m:
+        try:
+            major = int(m.group(1))
+        except ValueError:
+            major = None
+
+    return {
+        'id': img.get('id'),
+        'name': img.get('name'),
+        'os_name': os_name,
+        'os_family': os_family,
+        'os_version': os_ver,
+        'arch': arch,
+        'major': major
+    }
+
+
+def _index_images(images):
+    images_all = [rec for rec in map(_image_record, images) if rec is not None]
+    return index_image_records(images_all), images_all
+
+
+def index_image_records(images_all):
+    """
+    images_idx[family][major] -> [image_rec, ...] from normalized image records.
+    """
+    images_idx = defaultdict(lambda: defaultdict(list))
+    for rec in images_all:
+        if rec['os_family'] and rec['major'] is not None:
+            images_idx[rec['os_family']][rec['major']].append(rec)
+    # Plain dicts: safe to share read-only between threads and to pickle.
+    return {fam: dict(majors) for fam, majors in images_idx.items()}
+
+
+def get_vpc_images(vpc_service):
+    """
+    Index public, available images by normalized family and major version:
+      images_idx[family][major] -> [image_rec, ...]
+    image_rec = { id, name, os_name, os_family, os_version, arch, major }
+    """
+    images = []
+    try:
+        for img in _list_images(vpc_service):
+            images.append(img)
+    except Exception as e:
+        logging.error(f"Error fetching images: {e}")
+
+    images_idx, images_all = _index_images(images)
+    logging.info(f"Indexed images: total={len(images_all)}; families={list(images_idx.keys())}")
+    return images_idx, images_all
+
+# ------------------------------------------------------------------------------
+# In-process catalog cache
+# ------------------------------------------------------------------------------
+CatalogData = namedtuple(
+    'CatalogData',
+    ['profiles', 'profile_index', 'prices', 'images_idx', 'image_resolver', 'images_all',
+     'fetched_at', 'version']
+)
+
+
+def catalog_digest(data):
+    """
+    Digest of what matching depends on (profiles, prices, image index), so
+    results from two fetches with the same contents can be told apart from
+    results built against a changed catalog.
+    """
+    images = sorted((str(fam), str(major), [rec.get('id') for rec in recs])
+                    for fam, by_major in data.images_idx.items() for major, recs in by_major.items())
+    payload = json.dumps([data.profiles, data.prices, images], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def make_catalog_data(profiles, prices, images_idx, images_all, fetched_at, version):
+    """
+    CatalogData with its derived lookup structures (first-fit ProfileIndex,
+    memoizing ImageResolver) built once.
+    """
+    return CatalogData(profiles, ProfileIndex(profiles, prices), prices, images_idx,
+                       ImageResolver(images_idx), images_all, fetched_at, version)
+
+
+def load_catalog(vpc_service, version=1):
+    """
+    Fetch profiles, prices and the image index in one pass (a single
+    list_instance_profiles call feeds both profiles and prices) and build the
+    lookup structures once per load.
+    Raises if the API is unreachable or returns no usable profiles, so a
+    refresh never replaces good data with an empty catalog.
+    """
+    raw_profiles = _list_instance_profiles(vpc_service)
+    profiles = get_vpc_profiles(vpc_service, raw_profiles)
+    if not profiles:
+        raise RuntimeError("VPC API returned no usable instance profiles")
+    prices = get_vpc_prices(vpc_service, raw_profiles)
+
+    images_idx, images_all = _index_images(_list_images(vpc_service))
+    logging.info(f"Indexed images: total={len(images_all)}; families={list(images_idx.keys())}")
+
+    return make_catalog_data(profiles, prices, images_idx, images_all, time.time(), version)
+
+
+class VpcCatalog:
+    """
+    Serves the VPC catalog from memory.
+
+    The first get() loads synchronously; afterwards a daemon thread refreshes
+    the data every `ttl` seconds (without it, a get() on stale data starts one
+    out-of-band refresh). If a refresh fails the previous copy keeps being
+    served, the failure is logged and the refresh is retried after
+    `retry_delay` seconds, doubling per consecutive failure up to `ttl`.
+    """
+
+    def __init__(self, vpc_service, ttl=DEFAULT_TTL, background=True, loader=load_catalog,
+                 retry_delay=RETRY_DELAY):
+        self.vpc_service = vpc_service
+        self.ttl = ttl
+        self.background = background
+        self.retry_delay = retry_delay
+        self._loader = loader
+        self._data = None
+        self._version = 0
+        self._refresh_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -- public API ------------------------------------------------------------
+    def get(self):
+        """
+        Return the current CatalogData (possibly stale while a refresh runs).
+        """
+        data = self._data
+        if data is None:
+            with self._refresh_lock:
+                if self._data is None:
+                    self._data = self._load()
+                    self._ensure_thread()
+                data = self._data
+        elif self.is_stale(data) and not self._refresher_alive():
+            # No refresher thread: refresh out of band, serve stale meanwhile.
+            self._refresh_out_of_band()
+        return data
+
+    def start(self):
+        """
+        Warm the cache and start the background refresher (again after stop()).
+        """
+        self._stop.clear()
+        self.get()
+        self._ensure_thread()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop the background refresher; get() then refreshes out of band.
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if not thread.is_alive():
+                self._thread = None
+
+    def refresh(self):
+        """
+        Reload the catalog. Returns True on success; on failure the stale copy
+        is kept. Concurrent calls collapse into the one already in flight.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            self._data = self._load()
+            self._failures = 0
+            return True
+        except Exception as e:
+            self._failures += 1
+            self._retry_at = time.time() + self._retry_delay()
+            logging.warning(f"Catalog refresh failed (retry in {self._retry_delay():.0f}s), "
+                            f"serving stale copy: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def is_stale(self, data=None):
+        data = data or self._data
+        return data is None or (time.time() - data.fetched_at) > self.ttl
+
+    @property
+    def version(self):
+        return self._data.version if self._data else 0
+
+    # -- internals -------------------------------------------------------------
+    def _load(self):
+        started = time.time()
+        data = self._loader(self.vpc_service, version=self._version + 1)
+        self._version = data.version
+        logging.info(f"Catalog v{data.version} loaded in {time.time() - started:.2f}s")
+        return data
+
+    def _retry_delay(self):
+        return min(self.ttl, self.retry_delay * 2 ** max(0, self._failures - 1))
+
+    def _refresh_out_of_band(self):
+        """
+        Start one refresh thread unless one is running or a failed refresh is backing off.
+        """
+        with self._pending_lock:
+            if self._pending or time.time() < self._retry_at:
+                return
+            self._pending = True
+        threading.Thread(target=self._refresh_pending, name='vpc-catalog-refresh', daemon=True).start()
+
+    def _refresh_pending(self):
+        try:
+            self.refresh()
+        finally:
+            self._pending = False
+
+    def _refresher_alive(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive() and not self._stop.is_set()
+
+    def _ensure_thread(self):
+        if not self.background or self._data is None or self._refresher_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='vpc-catalog-refresh', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        delay = self.ttl
+        while not self._stop.wait(delay):
+            delay = self.ttl if self.refresh() else self._retry_delay()
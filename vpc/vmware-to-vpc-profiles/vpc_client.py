@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lazy IBM Cloud VPC client factory for the converter apps.
+
+Nothing happens at import: the API key is read (or prompted for), the IBM SDK
+is imported and the IAMAuthenticator / VpcV1 clients are built on first use.
+So the apps can be imported by a WSGI server, a batch tool or a benchmark
+without blocking on stdin or paying the SDK import cost up front.
+
+  vpc = VpcClientFactory()                    # config from the environment
+  vpc = VpcClientFactory(VpcConfig(api_key='...', service_url=region_url('eu-de')))
+  vpc.service()                               # default-region VpcV1 (cached)
+  vpc('jp-tok')                               # per-region client (RegionCatalogs factory)
+"""
+
+import os
+import sys
+import threading
+from collections import namedtuple
+
+from regions import region_url, region_from_url
+
+DEFAULT_SERVICE_URL = 'https://us-south.iaas.cloud.ibm.com/v1'
+API_VERSION = '2025-04-29'
+
+VpcConfig = namedtuple('VpcConfig', ['api_key', 'service_url', 'version'],
+                       defaults=(None, DEFAULT_SERVICE_URL, API_VERSION))
+
+
+def config_from_env(service_url=None):
+    """
+    VpcConfig from IBM_CLOUD_API_KEY / IBM_VPC_URL (api_key None → prompt on first use).
+    """
+    return VpcConfig(
+        api_key=os.environ.get('IBM_CLOUD_API_KEY'),
+        service_url=service_url or os.environ.get('IBM_VPC_URL', DEFAULT_SERVICE_URL),
+    )
+
+
+def prompt_api_key():
+    """
+    Ask for the API key on the console; refuses when there is no terminal
+    (e.g. under a WSGI server) instead of blocking on stdin.
+    """
+    if not sys.stdin or not sys.stdin.isatty():
+        raise RuntimeError("IBM_CLOUD_API_KEY is not set and there is no terminal to prompt on")
+    try:
+        import getpass
+        return getpass.getpass('Enter IBM Cloud API key: ')
+    except Exception:
+        return input('Enter IBM Cloud API key: ')
+
+
+class VpcClientFactory:
+    """
+    Builds the authenticator and VPC clients on first use. All clients share
+    one IAMAuthenticator (one IAM token); each keeps its own pooled HTTP session.
+
+    config: VpcConfig (default: config_from_env()).
+    key_prompt: called when config.api_key is empty (default: prompt_api_key).
+    """
+
+    def __init__(self, config=None, key_prompt=prompt_api_key):
+        self.config = config or config_from_env()
+        self.key_prompt = key_prompt
+        self._authenticator = None
+        self._services = {}
+        self._lock = threading.Lock()
+
+    @property
+    def default_region(self):
+        return region_from_url(self.config.service_url)
+
+    @property
+    def authenticator(self):
+        with self._lock:
+            if self._authenticator is None:
+                from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+                api_key = self.config.api_key or self.key_prompt()
+                self._authenticator = IAMAuthenticator(api_key)
+            return self._authenticator
+
+    def service(self, region=None):
+        """
+        VpcV1 client for a region (default: config.service_url), cached per region.
+        """
+        url = region_url(region) if region else self.config.service_url
+        with self._lock:
+            service = self._services.get(url)
+        if service is None:
+            from ibm_vpc import VpcV1
+            service = VpcV1(version=self.config.version, authenticator=self.authenticator)
+            service.set_service_url(url)
+            with self._lock:
+                service = self._services.setdefault(url, service)
+        return service
+
+    def __call__(self, region=None):
+        return self.service(region)
+
+
+class LazyService:
+    """
+    Stand-in for a VpcV1 client that is only built when first called, so a
+    VpcCatalog can be created at import time without credentials (and, with
+    an offline snapshot loader, never needs them).
+
+    factory: callable(region) → VpcV1, e.g. a VpcClientFactory.
+    """
+
+    def __init__(self, factory, region=None):
+        self._factory = factory
+        self._region = region
+
+    def __getattr__(self, name):
+        return getattr(self._factory(self._region), name)